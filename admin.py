@@ -0,0 +1,156 @@
+# admin.py
+
+import asyncio, time
+from users import is_admin
+from metrics import summary
+from refgraph import get_referral_graph
+from notify import get_notifier
+from store import get_store
+from ledger import get_ledger
+from analytics import DAY, combined_view, get_analytics
+from rankindex import get_rank_index
+from pool import get_pool
+from evol import EVOL_TIERS
+
+async def show_stats(update, context):
+    if not is_admin(update):
+        await update.message.reply_text("Kamu bukan admin.")
+        return
+    lines = ["📈 **Bot Stats**"]
+    processor = context.application.update_processor
+    if hasattr(processor, "stats"):
+        s = processor.stats()
+        lines.append(
+            f"\n⚙️ **Updates:** {s['running']}/{s['concurrency']} jalan, {s['waiting']} menunggu, "
+            f"{s['keys']} user aktif\n"
+            f"Selesai {s['processed']:,}, gagal {s['failed']:,}\n"
+            f"Queue wait: avg {s['wait_avg_ms']:.1f} ms, max {s['wait_max_ms']:.1f} ms")
+    worker = context.bot_data.get("worker")
+    if worker is not None:
+        lines.append(f"Worker #{worker}")
+    monitor = context.bot_data.get("loop_monitor")
+    if monitor is not None:
+        m = monitor.stats()
+        lines.append(
+            f"Loop lag: p99 {m['p99_ms']:.1f} ms, maks {m['max_ms']:.1f} ms, "
+            f"macet {m['blocked']:,}x (detail: /lag)")
+    flood = context.bot_data.get("flood")
+    if flood is not None:
+        f = flood.stats()
+        top = sorted(f["routes"].items(), key=lambda item: -item[1])[:5]
+        lines.append(
+            f"\n🚧 **Flood control:** {f['passed']:,} lolos, {f['dropped']:,} dibuang, {f['tracked']:,} key\n"
+            + "\n".join(f"{route} {reason}: {count:,}" for (route, reason), count in top))
+    store = get_store()
+    if hasattr(store, "nbytes"):
+        lines.append(f"\n🗃 **User table:** {store.count():,} user, kolom {store.nbytes() / 2**20:.1f} MB")
+    ledger = get_ledger()
+    if ledger is not None:
+        g = ledger.stats
+        lines.append(
+            f"\n📒 **Ledger:** seq {ledger.seq:,}, {ledger.pending():,} belum fsync\n"
+            f"Fsync {g['syncs']:,}x, grup maks {g['max_group']:,}, "
+            f"latency {g['last_sync_ms']:.1f} ms (maks {g['max_sync_ms']:.1f} ms)")
+    r = get_referral_graph().stats()
+    flagged = ", ".join(f"{reason} {count}" for reason, count in r["flagged"].items()) or "-"
+    lines.append(
+        f"\n👥 **Referral:** {r['edges']:,} edge, {r['referrers']:,} referrer (maks {r['max_referrals']:,})\n"
+        f"Depth: maks {r['max_depth']}, rata-rata {r['avg_depth']:.2f}\n"
+        f"Ditandai: {flagged}")
+    notifier = get_notifier()
+    if notifier is not None:
+        n = notifier.stats
+        lines.append(
+            f"\n⏰ **Notifikasi box:** {notifier.pending():,} terjadwal\n"
+            f"Terkirim {n['sent']:,}, basi {n['stale']:,}, blokir {n['blocked']:,}, gagal {n['failed']:,}")
+    transport = context.bot_data.get("api_transport")
+    if transport is not None:
+        t = transport.stats()
+        waiting = ", ".join(f"{name} {count:,}" for name, count in t["waiting"].items())
+        lines.append(
+            f"\n📡 **Bot API:** {t['inflight']}/{t['max_inflight']} jalan, antre {waiting}\n"
+            f"Edit digabung: {t['coalesced']:,}\n```")
+        for name, e in sorted(transport.endpoints.items(), key=lambda item: -item[1].count)[:6]:
+            lines.append(
+                f"{name:<22} {e.count:>8,} err {e.errors:<4} "
+                f"{e.latency.quantile(0.5) * 1000:>6.1f}/{e.latency.quantile(0.99) * 1000:<7.1f} "
+                f"antre p99 {e.wait.quantile(0.99) * 1000:.1f}")
+        lines.append("```")
+    routes = summary()
+    if routes:
+        lines.append("\n⏱ **Handler** (ms: p50/p99, rata-rata storage/render/api/lain)\n```")
+        for r in routes:
+            lines.append(
+                f"{r['route']:<16} {r['count']:>7,} err {r['errors']:<4} "
+                f"{r['p50_ms']:>6.1f}/{r['p99_ms']:<7.1f} "
+                f"{r['storage_ms']:.2f}/{r['render_ms']:.2f}/{r['api_ms']:.2f}/{r['other_ms']:.2f}")
+        lines.append("```")
+    await update.message.reply_text("\n".join(lines), parse_mode='Markdown')
+
+def _span(seconds):
+    return f"{seconds // 3600}j" if seconds >= 3600 else f"{seconds // 60}m"
+
+def _duration(seconds):
+    seconds = int(seconds)
+    if seconds >= DAY:
+        return f"{seconds // DAY} hari {seconds % DAY // 3600}j"
+    return f"{seconds // 3600}j {seconds % 3600 // 60}m"
+
+def render_analytics(burn, days, windows, now=None):
+    """Teks /analytics dari hasil view(); semua angka sudah jadi, tanpa scan user"""
+    now = now or time.time()
+    index = get_rank_index()
+    total = len(index) or 1
+    lines = [f"📊 **Analytics**\n\n👥 **User per evol** ({len(index):,} user)\n```"]
+    for tier in EVOL_TIERS:
+        count = index.count_between(tier.min_points, tier.max_points)
+        lines.append(f"Evol {tier.level} {tier.name:<11} {count:>10,} {count / total * 100:5.1f}%")
+    lines.append("```")
+
+    # Perkiraan habis memakai window terpendek yang >= 1 jam supaya tidak terlalu bising
+    rate_at = next((i for i, w in enumerate(windows) if w >= 3600), len(windows) - 1)
+    pool = get_pool()
+    refill = pool.next_refill()
+    lines.append(f"🔥 **Burn pool** ({' / '.join(map(_span, windows))}, sisa, habis)\n```")
+    for level, totals in sorted(burn.items()):
+        remaining = pool.remaining(level)
+        rate = totals[rate_at] / windows[rate_at]
+        if not rate:
+            eta = "-"
+        elif refill is not None and now + remaining / rate >= refill:
+            eta = "aman"
+        else:
+            eta = _duration(remaining / rate)
+        lines.append(f"E{level} {' / '.join(f'{t:,}' for t in totals)}  sisa {remaining:,}  {eta}")
+    lines.append("```")
+
+    today_key, today = next(reversed(days.items()))
+    week = today.active
+    for day in days.values():
+        week = week.union(day.active)
+    promotions = ", ".join(f"E{level} {count:,}" for level, count in sorted(today.promotions.items())) or "-"
+    credits = ", ".join(f"{reason} {points:,}" for reason, points in today.credits.most_common()) or "-"
+    lines.append(
+        f"📅 **Hari ini** ({today_key} UTC)\n"
+        f"Aktif ~{today.active.estimate():,} user ({len(days)} hari ~{week.estimate():,}), klaim {today.claims:,}\n"
+        f"Naik evol: {promotions}\n"
+        f"Kredit: {credits}")
+    lines.append("\n📈 **Harian** (aktif, klaim, burn)\n```")
+    for key, day in days.items():
+        lines.append(f"{key} {day.active.estimate():>9,} {day.claims:>9,} {sum(day.burn.values()):>10,}")
+    lines.append("```")
+    return "\n".join(lines)
+
+async def show_analytics(update, context):
+    if not is_admin(update):
+        await update.message.reply_text("Kamu bukan admin.")
+        return
+    analytics = get_analytics()
+    if analytics is None:
+        await update.message.reply_text("Analytics tidak aktif.")
+        return
+    if context.bot_data.get("worker") is not None:
+        burn, days = await asyncio.to_thread(combined_view, analytics)
+    else:
+        burn, days = analytics.view()
+    await update.message.reply_text(render_analytics(burn, days, analytics.windows), parse_mode='Markdown')
@@ -0,0 +1,293 @@
+# analytics.py
+
+import asyncio, base64, glob, json, math, os, threading, time
+from collections import Counter
+from hashlib import blake2b
+from evol import get_evol_level
+from config import (POOL_PER_EVOL, ANALYTICS_DIR, ANALYTICS_SAVE_INTERVAL, ANALYTICS_DAYS, ANALYTICS_BURN_WINDOWS,
+    ANALYTICS_HLL_PRECISION)
+
+DAY = 86400
+REPORT_DAYS = 7
+MAIN_STREAM = "main"
+
+class HyperLogLog:
+    """Perkiraan jumlah user unik: 2^p register 1 byte, error standar ~1.04/sqrt(2^p)
+
+    Jumlah 2^-register dan register nol dijaga berjalan sehingga estimate O(1);
+    dua sketch digabung dengan max per register (union).
+    """
+
+    __slots__ = ("p", "registers", "_zeros", "_inverse")
+
+    def __init__(self, p=ANALYTICS_HLL_PRECISION, registers=None):
+        self.p = p
+        self.registers = bytearray(registers) if registers is not None else bytearray(1 << p)
+        self._zeros = None  # dihitung malas: sketch hari lama jarang dibaca
+
+    def _recount(self):
+        self._zeros = self.registers.count(0)
+        self._inverse = math.fsum(2.0 ** -r for r in self.registers)
+
+    def add(self, key):
+        if self._zeros is None:
+            self._recount()
+        h = int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), "big")
+        bits = 64 - self.p
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        old = self.registers[index]
+        if rank > old:
+            self.registers[index] = rank
+            self._inverse += 2.0 ** -rank - 2.0 ** -old
+            if old == 0:
+                self._zeros -= 1
+
+    def estimate(self):
+        if self._zeros is None:
+            self._recount()
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / self._inverse
+        if estimate <= 2.5 * m and self._zeros:
+            estimate = m * math.log(m / self._zeros)  # linear counting untuk angka kecil
+        return round(estimate)
+
+    def union(self, other):
+        return HyperLogLog(self.p, bytes(map(max, self.registers, other.registers)))
+
+class WindowCounter:
+    """Jumlah dalam window geser: ring slot dengan total berjalan, add dan total O(1) amortized"""
+
+    __slots__ = ("width", "slots", "current", "sum")
+
+    def __init__(self, window, slots=60):
+        self.width = window / slots
+        self.slots = [0] * slots
+        self.current = 0  # nomor slot absolut terakhir (waktu // width)
+        self.sum = 0
+
+    def _advance(self, now):
+        slot = int(now // self.width)
+        gap = slot - self.current
+        if gap <= 0:
+            return
+        size = len(self.slots)
+        if gap >= size:
+            self.slots = [0] * size
+            self.sum = 0
+        else:
+            for i in range(self.current + 1, slot + 1):
+                self.sum -= self.slots[i % size]
+                self.slots[i % size] = 0
+        self.current = slot
+
+    def add(self, amount, now):
+        self._advance(now)
+        self.slots[self.current % len(self.slots)] += amount
+        self.sum += amount
+
+    def total(self, now):
+        self._advance(now)
+        return self.sum
+
+    def state(self):
+        return [self.current, self.slots]
+
+    def restore(self, state):
+        current, slots = state
+        if len(slots) == len(self.slots):
+            self.current, self.slots, self.sum = current, list(slots), sum(slots)
+
+class Day:
+    """Counter satu hari (UTC): kredit per alasan, klaim, burn pool, naik evol, user aktif"""
+
+    __slots__ = ("credits", "claims", "burn", "promotions", "active")
+
+    def __init__(self, precision=ANALYTICS_HLL_PRECISION):
+        self.credits = Counter()  # alasan -> poin
+        self.claims = 0
+        self.burn = Counter()  # level pool -> GXR
+        self.promotions = Counter()  # level tujuan -> user yang naik ke sana
+        self.active = HyperLogLog(precision)
+
+    def merge(self, other):
+        day = Day(self.active.p)
+        day.credits = self.credits + other.credits
+        day.claims = self.claims + other.claims
+        day.burn = self.burn + other.burn
+        day.promotions = self.promotions + other.promotions
+        day.active = self.active.union(other.active)
+        return day
+
+    def state(self):
+        return {
+            "credits": self.credits,
+            "claims": self.claims,
+            "burn": self.burn,
+            "promotions": self.promotions,
+            "active": base64.b64encode(self.active.registers).decode(),
+        }
+
+    @classmethod
+    def from_state(cls, data):
+        day = cls()
+        day.credits = Counter(data["credits"])
+        day.claims = data["claims"]
+        day.burn = Counter({int(level): amount for level, amount in data["burn"].items()})
+        day.promotions = Counter({int(level): count for level, count in data["promotions"].items()})
+        registers = base64.b64decode(data["active"])
+        day.active = HyperLogLog(len(registers).bit_length() - 1, registers)
+        return day
+
+class Analytics:
+    """Analytics admin yang diperbarui saat kredit poin, bukan dengan scan user
+
+    Burn pool per level dalam beberapa window geser, plus satu Day per hari
+    (ANALYTICS_DAYS terakhir). Sebaran user per evol dibaca dari rank index
+    yang sudah diperbarui per kredit. Disimpan ke satu file JSON per proses
+    (temp file + fsync + rename) supaya tren bertahan setelah restart.
+    """
+
+    def __init__(self, path, windows=ANALYTICS_BURN_WINDOWS, keep_days=ANALYTICS_DAYS,
+                 precision=ANALYTICS_HLL_PRECISION):
+        self.path = path
+        self.windows = tuple(windows)
+        self.keep_days = keep_days
+        self.precision = precision
+        self._lock = threading.Lock()
+        self.burn = {level: [WindowCounter(w) for w in self.windows] for level in POOL_PER_EVOL}
+        self.days = {}
+        self._today = None
+        self._today_start = 0.0
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        if data.get("windows") == list(self.windows):
+            for level, states in data["burn"].items():
+                for counter, state in zip(self.burn.get(int(level), ()), states):
+                    counter.restore(state)
+        self.days = {key: Day.from_state(day) for key, day in data["days"].items()}
+
+    def _day(self, now):
+        if self._today is not None and self._today_start <= now < self._today_start + DAY:
+            return self._today
+        start = now - now % DAY
+        key = time.strftime("%Y-%m-%d", time.gmtime(start))
+        day = self.days.get(key)
+        if day is None:
+            day = self.days[key] = Day(self.precision)
+            for old in sorted(self.days)[:-self.keep_days]:
+                del self.days[old]
+        self._today, self._today_start = day, start
+        return day
+
+    def track(self, user_id, old_points, new_points, reason, pool=None, now=None):
+        """Satu kredit poin: O(1), dipanggil dari credit_points"""
+        now = now or time.time()
+        promoted = get_evol_level(new_points)
+        if promoted == get_evol_level(old_points):
+            promoted = None
+        with self._lock:
+            day = self._day(now)
+            day.credits[reason] += new_points - old_points
+            day.active.add(user_id)
+            if reason == "claim":
+                day.claims += 1
+            if promoted is not None:
+                day.promotions[promoted] += 1
+            if pool is not None:
+                level, amount = pool
+                day.burn[level] += amount
+                for counter in self.burn.get(level, ()):
+                    counter.add(amount, now)
+            self._dirty = True
+
+    def view(self, now=None, days=REPORT_DAYS):
+        """(burn per level per window, {tanggal: Day}) untuk laporan; Day hari ini disalin"""
+        now = now or time.time()
+        with self._lock:
+            self._day(now)
+            burn = {level: [c.total(now) for c in counters] for level, counters in self.burn.items()}
+            recent = {key: self.days[key] for key in sorted(self.days)[-days:]}
+            today = max(recent)
+            recent[today] = recent[today].merge(Day(self.precision))
+        return burn, recent
+
+    def save(self):
+        """Simpan state kalau ada perubahan sejak penyimpanan terakhir"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            data = {
+                "saved": time.time(),
+                "windows": list(self.windows),
+                "burn": {level: [c.state() for c in counters] for level, counters in self.burn.items()},
+                "days": {key: day.state() for key, day in self.days.items()},
+            }
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            with self._lock:
+                self._dirty = True
+            raise
+        return True
+
+    async def run(self, stop_event, interval=ANALYTICS_SAVE_INTERVAL):
+        """Background task: simpan berkala, sekali lagi saat berhenti"""
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await asyncio.to_thread(self.save)
+            except Exception as e:
+                print(f"❌ Gagal menyimpan analytics: {e}")
+
+def combined_view(analytics, now=None):
+    """view() proses ini digabung dengan file analytics proses lain di direktori yang sama
+
+    Mode multi-worker: tiap worker hanya melihat kreditnya sendiri; data worker
+    lain terlambat paling lama ANALYTICS_SAVE_INTERVAL.
+    """
+    now = now or time.time()
+    burn, days = analytics.view(now)
+    for path in glob.glob(os.path.join(os.path.dirname(analytics.path), "*.json")):
+        if os.path.abspath(path) == os.path.abspath(analytics.path):
+            continue
+        try:
+            other_burn, other_days = Analytics(path).view(now)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ File analytics {path} dilewati: {e}")
+            continue
+        for level, totals in other_burn.items():
+            burn[level] = [a + b for a, b in zip(burn[level], totals)]
+        for key, day in other_days.items():
+            days[key] = days[key].merge(day) if key in days else day
+    return burn, dict(sorted(days.items())[-REPORT_DAYS:])
+
+_analytics = None
+
+def init_analytics(stream=MAIN_STREAM, directory=ANALYTICS_DIR):
+    global _analytics
+    _analytics = Analytics(os.path.join(directory, f"{stream}.json"))
+    return _analytics
+
+def get_analytics():
+    return _analytics
+
+def track(user_id, old_points, new_points, reason, pool=None):
+    if _analytics is not None:
+        _analytics.track(user_id, old_points, new_points, reason, pool)
@@ -0,0 +1,49 @@
+# benchmarks/concurrency.py
+#
+# Tembakkan klaim ganda yang saling bersilangan lewat PerUserUpdateProcessor
+# dan pastikan tiap user hanya dikreditkan satu kali.
+# Jalankan dari root repo: python -m benchmarks.concurrency [jumlah_user] [klaim_per_user]
+# Versi kecil yang jalan di CI: tests/test_processor.py
+
+import asyncio, os, random, sys, tempfile, time
+from types import SimpleNamespace
+
+from config import CLAIM_REWARD
+from processor import PerUserUpdateProcessor
+from store import get_store
+from users import claim_reward
+
+class FakeMessage:
+    async def reply_text(self, text, **kwargs):
+        # Simulasi round-trip Bot API supaya handler benar-benar saling bersilangan
+        await asyncio.sleep(random.uniform(0, 0.005))
+
+def fake_update(user_id):
+    user = SimpleNamespace(id=user_id)
+    return SimpleNamespace(effective_user=user, effective_chat=user, message=FakeMessage())
+
+async def run(users, claims):
+    processor = PerUserUpdateProcessor(concurrency=16, max_pending=users * claims)
+    updates = [fake_update(uid) for uid in range(1, users + 1) for _ in range(claims)]
+    random.shuffle(updates)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        processor.process_update(update, claim_reward(update, None)) for update in updates
+    ))
+    elapsed = time.perf_counter() - started
+
+    store = get_store()
+    wrong = [uid for uid in range(1, users + 1) if store.get(str(uid))["points"] != CLAIM_REWARD]
+    stats = processor.stats()
+    print(f"updates        : {len(updates):,} ({users:,} user x {claims} klaim)")
+    print(f"throughput     : {len(updates) / elapsed:,.0f} update/s")
+    print(f"queue wait     : avg {stats['wait_avg_ms']:.2f} ms, max {stats['wait_max_ms']:.2f} ms")
+    print(f"double credit  : {len(wrong)} user")
+    return not wrong
+
+if __name__ == "__main__":
+    os.chdir(tempfile.mkdtemp(prefix="gxr_bench_"))  # store di data/ relatif, jangan sentuh data asli
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    claims = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    sys.exit(0 if asyncio.run(run(users, claims)) else 1)
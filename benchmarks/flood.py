@@ -0,0 +1,81 @@
+# benchmarks/flood.py
+#
+# Latensi user normal saat beberapa user membanjiri tombol inline, dengan
+# dan tanpa flood control. Bot API tiruan dengan round-trip 20 ms.
+# Jalankan dari root repo: python -m benchmarks.flood [abuser] [spam_per_abuser] [user_normal]
+
+import asyncio, os, random, shutil, sys, tempfile, time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+workdir = tempfile.mkdtemp(prefix="gxr_flood_")
+os.symlink(os.path.join(REPO, "assets"), os.path.join(workdir, "assets"))
+os.chdir(workdir)
+os.environ.setdefault("METRICS_PORT", "0")
+
+from telegram import Update
+from telegram.ext import TypeHandler
+from benchmarks.stubapi import StubRequest, callback_update
+from main import build_application
+from router import callback_data
+
+NORMAL_SCREENS = [callback_data("main"), callback_data("farming"), callback_data("tasks", "original"),
+                  callback_data("leaderboard", 2), callback_data("completed")]
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def run(abusers, spam, normal, flood):
+    request = StubRequest(latency=0.02)
+    application = build_application(request=request)
+    if not flood:
+        application.handlers.pop(-1, None)
+    done = {}
+
+    async def record(update, context):
+        done[update.update_id] = time.perf_counter()
+
+    application.add_handler(TypeHandler(Update, record), group=99)
+    rng = random.Random(1)
+    updates = []
+    for i in range(abusers):
+        user_id = 500000 + i
+        updates += [callback_update(len(updates), user_id, callback_data("leaderboard", rng.randint(1, 7)), 1)
+                    for _ in range(spam)]
+    normal_ids = []
+    for i in range(normal):
+        for screen in NORMAL_SCREENS:
+            normal_ids.append(len(updates))
+            updates.append(callback_update(len(updates), 100000 + i, screen, message_id=len(updates)))
+    rng.shuffle(updates)
+
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        queued = {}
+        started = time.perf_counter()
+        for data in updates:
+            queued[data["update_id"]] = time.perf_counter()
+            await application.update_queue.put(Update.de_json(data, application.bot))
+        while any(uid not in done for uid in normal_ids):
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        await application.stop()
+        await application.post_shutdown(application)
+    latencies = [done[uid] - queued[uid] for uid in normal_ids]
+    flood_stats = application.bot_data.get("flood").stats() if flood else {"dropped": 0}
+    print(f"flood control {'ON ' if flood else 'OFF'}: user normal p50 {percentile(latencies, 0.5) * 1000:7.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms, selesai {elapsed:.2f} s, "
+          f"dibuang {flood_stats['dropped']:,}, panggilan API {sum(request.calls.values()):,}")
+
+async def main(abusers, spam, normal):
+    print(f"{abusers} abuser x {spam} callback, {normal} user normal x {len(NORMAL_SCREENS)} layar")
+    await run(abusers, spam, normal, flood=False)
+    await run(abusers, spam, normal, flood=True)
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:4]]
+    try:
+        asyncio.run(main(*(args + [20, 200, 200][len(args):])))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,255 @@
+# benchmarks/handlers.py
+#
+# Benchmark handler asli (claim, rank, leaderboard, tasks, referral, export)
+# dengan dataset user sintetis dan Bot API tiruan. Tiap ukuran dataset jalan
+# di subprocess sendiri supaya peak RSS dan state global tidak tercampur.
+# Hasil disimpan sebagai JSON (default di direktori temp, --out untuk path lain);
+# --compare menandai regresi terhadap hasil lama.
+#
+# Jalankan dari root repo:
+#   python -m benchmarks.handlers [--sizes 10000,100000,1000000] [--iterations 1000]
+#                                 [--out hasil.json] [--compare hasil_lama.json]
+
+import argparse, asyncio, json, os, platform, random, resource, shutil, subprocess, sys, tempfile, time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_DIR = os.path.join(tempfile.gettempdir(), "gxr_datasets")
+RESULTS_DIR = os.path.join(tempfile.gettempdir(), "gxr_bench_results")  # default --out, di luar repo
+SEED = 42
+
+# Sebaran user per evol: mayoritas di tier bawah, makin tinggi makin sedikit
+TIER_SHARES = (0.40, 0.33, 0.12, 0.07, 0.045, 0.025, 0.01)
+TOP_POINTS = 250000
+TASK_TYPES = ("original", "partnership", "collaborator")
+REGRESSION_THRESHOLD = 0.20
+
+def generate_points(total, rng):
+    from evol import EVOL_TIERS
+    for _ in range(total):
+        tier = rng.choices(EVOL_TIERS, TIER_SHARES)[0]
+        high = tier.max_points or TOP_POINTS
+        yield rng.randrange(tier.min_points, high)
+
+def build_dataset(total):
+    """users_<total>.db dengan poin tersebar di semua evol; dibuat sekali lalu dipakai ulang"""
+    from store import SqliteUserStore
+    path = os.path.join(DATASET_DIR, f"users_{total}.db")
+    if os.path.exists(path):
+        return path
+    os.makedirs(DATASET_DIR, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(tmp_path + suffix):
+            os.remove(tmp_path + suffix)
+    store = SqliteUserStore(tmp_path)
+    rng = random.Random(SEED)
+    rows = []
+    for i, points in enumerate(generate_points(total, rng)):
+        user_id = str(100000000 + i)
+        rows.append((user_id, {"points": points, "username": f"user{user_id}"}))
+        if len(rows) >= 50000:
+            store.put_many(rows)
+            rows = []
+    store.put_many(rows)
+    store.set_meta("json_migrated", 0)
+    store._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    store.close()
+    os.replace(tmp_path, path)
+    return path
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def scenarios(total, iterations, rng):
+    """(nama, handler, list update JSON) per handler yang diukur"""
+    from benchmarks.stubapi import command_update, callback_update
+    from commands import router
+    from config import ADMIN_IDS
+    from export import export_csv
+    from referral import apply_referral
+    from router import callback_data
+    from users import claim_reward
+
+    count = min(iterations, total // 2)
+    users = [100000000 + i for i in rng.sample(range(total), count * 2)]
+    claimers, referred = users[:count], users[count:]
+
+    def random_user():
+        return 100000000 + rng.randrange(total)
+
+    admin = int(next(iter(ADMIN_IDS)))
+    return [
+        ("claim", claim_reward,
+         [command_update(i, uid, "/claim") for i, uid in enumerate(claimers)]),
+        ("rank", router.dispatch,
+         [callback_update(i, random_user(), callback_data("rank")) for i in range(iterations)]),
+        ("leaderboard", router.dispatch,
+         [callback_update(i, random_user(), callback_data("leaderboard", rng.randint(1, 7)), message_id=i)
+          for i in range(iterations)]),
+        ("tasks", router.dispatch,
+         [callback_update(i, random_user(), callback_data("tasks", rng.choice(TASK_TYPES))) for i in range(iterations)]),
+        ("referral", apply_referral,
+         [command_update(i, uid, f"/usecode REF{random_user()}") for i, uid in enumerate(referred)]),
+        ("export", export_csv, [command_update(0, admin, "/exportcsv")]),
+    ]
+
+async def run_dataset(total, iterations):
+    """Jalankan semua skenario untuk satu dataset (dipanggil di subprocess)"""
+    from telegram import Update
+    from telegram.ext import CallbackContext
+    from benchmarks.stubapi import StubRequest
+    from main import build_application
+    from metrics import instrumented, summary
+    from rankindex import get_rank_index
+    from store import get_store, flush_store
+    import metrics
+
+    results = {"users": total, "setup": {}, "handlers": {}}
+    started = time.perf_counter()
+    get_store()
+    results["setup"]["open_s"] = time.perf_counter() - started
+    started = time.perf_counter()
+    get_rank_index()
+    results["setup"]["rank_index_s"] = time.perf_counter() - started
+    results["setup"]["rss_mb"] = peak_rss_mb()
+
+    application = build_application(request=StubRequest())
+    rng = random.Random(SEED)
+    async with application:
+        for name, handler, updates in scenarios(total, iterations, rng):
+            metrics.routes.clear()
+            wrapped = instrumented(handler, name)
+            is_command = "message" in updates[0]
+            latencies, errors = [], 0
+            started = time.perf_counter()
+            for data in updates:
+                update = Update.de_json(data, application.bot)
+                context = CallbackContext.from_update(update, application)
+                if is_command:
+                    context.args = update.message.text.split()[1:]
+                begin = time.perf_counter()
+                try:
+                    await wrapped(update, context)
+                except Exception as e:
+                    errors += 1
+                    print(f"❌ {name}: {e}", file=sys.stderr)
+                latencies.append(time.perf_counter() - begin)
+            elapsed = time.perf_counter() - started
+            phases = summary()[0]
+            results["handlers"][name] = {
+                "iterations": len(latencies),
+                "errors": errors,
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "mean_ms": sum(latencies) / len(latencies) * 1000,
+                "ops_s": len(latencies) / elapsed,
+                **{key: phases[key] for key in ("storage_ms", "render_ms", "api_ms", "other_ms")},
+                "peak_rss_mb": peak_rss_mb(),
+            }
+    flush_store()
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+def run_worker(total, iterations):
+    dataset = build_dataset(total)
+    workdir = tempfile.mkdtemp(prefix=f"gxr_handlers_{total}_")
+    os.makedirs(os.path.join(workdir, "data"))
+    shutil.copy(dataset, os.path.join(workdir, "data", "users.db"))
+    os.symlink(os.path.join(REPO, "assets"), os.path.join(workdir, "assets"))
+    os.chdir(workdir)
+    try:
+        results = asyncio.run(run_dataset(total, iterations))
+    finally:
+        os.chdir(REPO)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(results))
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def print_results(results):
+    for size, data in results["datasets"].items():
+        setup = data["setup"]
+        print(f"\n== {int(size):,} user (index {setup['rank_index_s']:.2f} s, peak RSS {data['peak_rss_mb']:.0f} MB)")
+        print(f"{'handler':<12} {'n':>6} {'p50 ms':>8} {'p99 ms':>8} {'ops/s':>9}  storage/render/api/lain ms")
+        for name, h in data["handlers"].items():
+            print(f"{name:<12} {h['iterations']:>6} {h['p50_ms']:>8.2f} {h['p99_ms']:>8.2f} {h['ops_s']:>9,.0f}  "
+                  f"{h['storage_ms']:.2f}/{h['render_ms']:.2f}/{h['api_ms']:.2f}/{h['other_ms']:.2f}"
+                  + (f"  ({h['errors']} error)" if h["errors"] else ""))
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Cetak perubahan p50/p99/ops terhadap baseline; kembalikan jumlah regresi"""
+    regressions = 0
+    print(f"\n== Dibanding {baseline['meta']['revision']} ({baseline['meta']['date']})")
+    for size, data in results["datasets"].items():
+        old = baseline["datasets"].get(size)
+        if old is None:
+            continue
+        for name, h in data["handlers"].items():
+            before = old["handlers"].get(name)
+            if before is None:
+                continue
+            p50 = h["p50_ms"] / before["p50_ms"] - 1 if before["p50_ms"] else 0.0
+            p99 = h["p99_ms"] / before["p99_ms"] - 1 if before["p99_ms"] else 0.0
+            ops = h["ops_s"] / before["ops_s"] - 1 if before["ops_s"] else 0.0
+            # p99 dari beberapa ratus sampel terlalu berisik untuk jadi patokan regresi
+            worse = p50 > threshold or ops < -threshold
+            regressions += worse
+            print(f"{int(size):>9,} {name:<12} p50 {before['p50_ms']:.2f}->{h['p50_ms']:.2f} ms ({p50:+.0%})  "
+                  f"p99 {p99:+.0%}  ops/s {ops:+.0%}" + ("  ⚠️ REGRESI" if worse else ""))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark handler GXR dengan dataset sintetis")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--out")
+    parser.add_argument("--compare")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.iterations)
+        return
+
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "iterations": args.iterations,
+        },
+        "datasets": {},
+    }
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"⏳ {size:,} user...", file=sys.stderr)
+        process = subprocess.run(
+            [sys.executable, "-m", "benchmarks.handlers", "--worker", str(size), "--iterations", str(args.iterations)],
+            cwd=REPO, stdout=subprocess.PIPE, text=True, check=True)
+        results["datasets"][str(size)] = json.loads(process.stdout.strip().splitlines()[-1])
+
+    print_results(results)
+    out = args.out or os.path.join(RESULTS_DIR, f"handlers-{results['meta']['revision']}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Hasil disimpan di {out}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if compare(results, baseline):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# benchmarks/metrics.py
+#
+# Overhead instrumentasi per update: handler kosong dengan dan tanpa wrapper
+# metrics, plus biaya satu span timed() (storage/render/api).
+# Jalankan dari root repo: python -m benchmarks.metrics [iterasi]
+
+import asyncio, sys, time
+from metrics import instrumented, timed, STORAGE, RENDER
+
+@timed(STORAGE)
+def fake_storage():
+    pass
+
+@timed(RENDER)
+def fake_render():
+    fake_storage()
+
+async def handler(update, context):
+    fake_render()
+
+async def bare(update, context):
+    pass
+
+async def per_call(callback, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await callback(None, None)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+async def main(iterations):
+    baseline = await per_call(bare, iterations)
+    wrapped = await per_call(instrumented(bare, "bench"), iterations)
+    spans = await per_call(instrumented(handler, "bench_spans"), iterations)
+    plain_spans = await per_call(handler, iterations)
+    print(f"iterasi              : {iterations:,}")
+    print(f"wrapper per update   : {wrapped - baseline:.2f} µs")
+    print(f"2 span bersarang     : {spans - wrapped:.2f} µs (di dalam update)")
+    print(f"span tanpa update    : {plain_spans - baseline:.2f} µs (mis. background task)")
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000))
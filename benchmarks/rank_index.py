@@ -0,0 +1,46 @@
+# benchmarks/rank_index.py
+#
+# Bandingkan RankIndex dengan sort penuh yang dulu dipakai show_rank_navigation.
+# Jalankan dari root repo: python -m benchmarks.rank_index [jumlah_user]
+
+import random, sys, time
+from rankindex import RankIndex
+
+def sort_rank(users, user_id):
+    all_users = [(uid, points) for uid, points in users.items()]
+    all_users.sort(key=lambda x: x[1], reverse=True)
+    return next((i+1 for i, (uid, _) in enumerate(all_users) if uid == user_id), "Unranked")
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+def main(total=1_000_000):
+    rng = random.Random(42)
+    users = {str(100000000 + i): int(rng.paretovariate(1.2) * 250) for i in range(total)}
+    sample = rng.sample(list(users), 1000)
+
+    started = time.perf_counter()
+    index = RankIndex()
+    index.build(users.items())
+    build = time.perf_counter() - started
+
+    sort_lookup = timed(lambda: sort_rank(users, sample[0]), 3)
+    lookups = iter(sample * 100)
+    index_lookup = timed(lambda: index.rank(next(lookups)), 10000)
+    updates = iter(sample * 100)
+    index_update = timed(lambda: index.update(next(updates), rng.randrange(200000)), 10000)
+    around = timed(lambda: index.around(sample[1], 5), 1000)
+
+    print(f"users           : {total:,}")
+    print(f"index build     : {build * 1000:10.1f} ms (sekali saat startup)")
+    print(f"full sort rank  : {sort_lookup * 1e6:10.1f} us / lookup")
+    print(f"index rank      : {index_lookup * 1e6:10.1f} us / lookup")
+    print(f"index update    : {index_update * 1e6:10.1f} us / update")
+    print(f"index around(5) : {around * 1e6:10.1f} us / query")
+    print(f"speedup         : {sort_lookup / index_lookup:10.0f}x")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,133 @@
+# benchmarks/stubapi.py
+#
+# Bot API tiruan dan pembuat update palsu untuk benchmark tanpa jaringan.
+# StubApiServer menyajikan Bot API tiruan yang sama lewat HTTP lokal sungguhan.
+
+import asyncio, itertools, json, time
+from collections import Counter
+from functools import partial
+from urllib.parse import parse_qsl
+from telegram.request import BaseRequest
+from httpserver import HttpServer, json_response
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "GXR Stub", "username": "gxr_stub_bot"}
+
+class StubRequest(BaseRequest):
+    """BaseRequest tanpa jaringan: setiap method Bot API dibalas hasil tiruan
+
+    latency mensimulasikan round-trip ke Telegram (detik, default 0).
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _message(self, params, photo=False):
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id", 0) or 0), "type": "private"},
+            "from": BOT_USER,
+        }
+        if photo:
+            message["photo"] = [{"file_id": "stub-photo", "file_unique_id": "stub", "width": 1, "height": 1}]
+            message["caption"] = params.get("caption")
+        else:
+            message["text"] = params.get("text", "")
+        return message
+
+    def result(self, method, params):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return []
+        if method == "sendPhoto":
+            return self._message(params, photo=True)
+        if method.startswith("send") or method.startswith("edit"):
+            return self._message(params)
+        return True
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        name = url.rsplit("/", 1)[-1]
+        self.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        params = request_data.parameters if request_data is not None else {}
+        return 200, json.dumps({"ok": True, "result": self.result(name, params)}).encode()
+
+STUB_METHODS = ("getMe", "getUpdates", "deleteWebhook", "setWebhook", "sendMessage", "sendPhoto", "sendDocument",
+                "editMessageText", "editMessageCaption", "editMessageReplyMarkup", "deleteMessage",
+                "answerCallbackQuery")
+
+class StubApiServer(HttpServer):
+    """Bot API tiruan di http://host:port/bot<token>/<method> untuk mengukur transport httpx
+
+    Arahkan base_url bot (atau BOT_API_URL) ke http://host:port. Balasan sama
+    dengan StubRequest, setelah latency detik. Satu koneksi melayani satu request
+    sekaligus, seperti HTTP/1.1 tanpa pipelining.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, token="stub", latency=0.0):
+        super().__init__(host, port)
+        self.stub = StubRequest(latency)
+        for method in STUB_METHODS:
+            self.route("POST", f"/bot{token}/{method}", partial(self._method, method))
+
+    @property
+    def url(self):
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def _method(self, method, request):
+        self.stub.calls[method] += 1
+        params = {}
+        if request.headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+            params = dict(parse_qsl(request.body.decode()))
+        if self.stub.latency:
+            await asyncio.sleep(self.stub.latency)
+        return json_response(200, {"ok": True, "result": self.stub.result(method, params)})
+
+def _user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+
+def command_update(update_id, user_id, text):
+    """Update message berisi command, misalnya '/claim'"""
+    command = text.split()[0]
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": _user(user_id),
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        },
+    }
+
+def callback_update(update_id, user_id, data, message_id=1):
+    """Update callback_query dari tombol inline dengan callback_data data"""
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": _user(user_id),
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": BOT_USER,
+                "text": "menu",
+            },
+        },
+    }
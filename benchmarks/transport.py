@@ -0,0 +1,75 @@
+# benchmarks/transport.py
+#
+# Latensi jawaban callback dan balasan handler saat broadcast membanjiri
+# transport Bot API: pool httpx polos (FIFO) dibanding ScheduledRequest
+# (prioritas + edit digabung). Bot API tiruan lewat HTTP lokal, round-trip 30 ms.
+# Jalankan dari root repo: python -m benchmarks.transport [bulk] [interaktif] [koneksi]
+
+import asyncio, sys, time
+from telegram import Bot
+from telegram.request import HTTPXRequest
+from benchmarks.stubapi import StubApiServer
+from transport import ScheduledRequest, bulk
+
+TOKEN = "stub"
+EDITED_MESSAGES = 10
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+async def run(scheduled, bulk_sends, interactive, connections, server):
+    request = HTTPXRequest(connection_pool_size=connections, pool_timeout=None, read_timeout=60)
+    if scheduled:
+        request = ScheduledRequest(request, max_inflight=connections)
+    bot = Bot(TOKEN, base_url=f"{server.url}/bot", request=request)
+    await bot.initialize()
+    server.stub.calls.clear()
+    latency = {"callback": [], "interactive": [], "edit": [], "bulk": []}
+
+    async def timed(kind, call):
+        started = time.perf_counter()
+        await call
+        latency[kind].append(time.perf_counter() - started)
+
+    async def broadcast():
+        with bulk():
+            await asyncio.gather(*(timed("bulk", bot.send_message(chat_id=i, text="broadcast"))
+                                   for i in range(bulk_sends)))
+
+    async def user(i):
+        # Satu tap tombol: jawab callback, edit layar, lalu satu balasan
+        await asyncio.sleep(i * 0.005)
+        await asyncio.gather(
+            timed("callback", bot.answer_callback_query(str(i))),
+            timed("edit", bot.edit_message_text(f"layar {i}", chat_id=1, message_id=i % EDITED_MESSAGES)),
+            timed("interactive", bot.send_message(chat_id=i, text="balasan")))
+
+    started = time.perf_counter()
+    bulk_task = asyncio.create_task(broadcast())
+    await asyncio.sleep(0.05)  # broadcast sudah mengisi antrean sebelum user datang
+    await asyncio.gather(*(user(i) for i in range(interactive)))
+    users_s = time.perf_counter() - started
+    await bulk_task
+    total_s = time.perf_counter() - started
+    await bot.shutdown()
+    return latency, users_s, total_s, sum(server.stub.calls.values())
+
+async def main(bulk_sends, interactive, connections):
+    server = StubApiServer(token=TOKEN, latency=0.03)
+    await server.start()
+    print(f"{bulk_sends:,} bulk + {interactive:,} user (callback + edit + balasan), {connections} koneksi, RTT 30 ms")
+    print(f"{'':<11}{'callback p50/p99':>18}{'edit p50/p99':>16}{'balasan p50/p99':>18}{'bulk p99':>10}"
+          f"{'user s':>8}{'total s':>9}{'request':>9}")
+    for scheduled in (False, True):
+        latency, users_s, total_s, requests = await run(scheduled, bulk_sends, interactive, connections, server)
+        ms = {kind: (percentile(s, 0.5) * 1000, percentile(s, 0.99) * 1000) for kind, s in latency.items()}
+        print(f"{'scheduled' if scheduled else 'pool':<11}"
+              f"{ms['callback'][0]:>9.0f}/{ms['callback'][1]:<8.0f}{ms['edit'][0]:>8.0f}/{ms['edit'][1]:<7.0f}"
+              f"{ms['interactive'][0]:>9.0f}/{ms['interactive'][1]:<8.0f}{ms['bulk'][1]:>10.0f}"
+              f"{users_s:>8.2f}{total_s:>9.2f}{requests:>9,}")
+    await server.stop()
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    asyncio.run(main(*(args + [2000, 200, 16][len(args):])))
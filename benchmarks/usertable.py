@@ -0,0 +1,65 @@
+# benchmarks/usertable.py
+#
+# Memori dan kecepatan scan seluruh tabel user: row dict per user (bentuk lama
+# users.json / load_users) dibanding ColumnarUserTable. Dataset sama dengan
+# benchmarks.handlers; tiap mode jalan di subprocess sendiri supaya RSS bersih.
+# Jalankan dari root repo: python -m benchmarks.usertable [jumlah_user]
+
+import json, os, subprocess, sys, time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("dict", "columnar")
+
+def rss_mb():
+    # RSS saat ini (bukan peak) supaya sisa load tidak ikut terhitung
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+def measure(mode, path):
+    import rankindex, store as store_module
+    from export import iter_export_rows
+    from store import JsonUserStore, SqliteUserStore
+    from usertable import ColumnarUserTable
+
+    store = SqliteUserStore(path)
+    before = rss_mb()
+    started = time.perf_counter()
+    if mode == "dict":
+        table = JsonUserStore(f"{path}.json")  # tidak ada: dict kosong, diisi dari SQLite
+        table._users = dict(store.scan())
+    else:
+        table = ColumnarUserTable(store)
+    load_s = time.perf_counter() - started
+    result = {"load_s": load_s, "rss_mb": rss_mb() - before, "users": table.count()}
+    since = time.time() - 6 * 3600
+    store_module._store = table
+    result["scan_s"] = timed(lambda: sum(1 for _ in table.scan()))
+    result["claimed_since_s"] = timed(lambda: sum(1 for _ in table.claimed_since(since)))
+    result["rank_build_s"] = timed(lambda: rankindex._build_from_store())
+    result["export_s"] = timed(lambda: sum(1 for _ in iter_export_rows(table)))
+    return result
+
+def main(total):
+    from benchmarks.handlers import build_dataset
+    path = build_dataset(total)
+    results = {}
+    for mode in MODES:
+        out = subprocess.run([sys.executable, "-m", "benchmarks.usertable", "--child", mode, path],
+                             cwd=REPO, capture_output=True, text=True, check=True).stdout
+        results[mode] = json.loads(out.splitlines()[-1])
+    print(f"{total:,} user")
+    print(f"{'':<10}{'RSS MB':>9}{'B/user':>8}{'load s':>8}{'scan s':>8}{'klaim s':>9}{'rank s':>8}{'export s':>10}")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['rss_mb']:>9.0f}{r['rss_mb'] * 2**20 / r['users']:>8.0f}{r['load_s']:>8.2f}"
+              f"{r['scan_s']:>8.2f}{r['claimed_since_s']:>9.3f}{r['rank_build_s']:>8.2f}{r['export_s']:>10.2f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        print(json.dumps(measure(sys.argv[2], sys.argv[3])))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
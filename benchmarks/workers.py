@@ -0,0 +1,55 @@
+# benchmarks/workers.py
+#
+# Throughput mode multi-worker: sumber update palsu -> Supervisor -> N worker
+# dengan Bot API tiruan (tanpa jaringan). Tiap jumlah worker memakai data baru.
+# Jalankan dari root repo: python -m benchmarks.workers [jumlah_update] [worker,...] [jumlah_user]
+
+import asyncio, os, random, sys, tempfile, time
+from benchmarks.stubapi import StubRequest, command_update, callback_update
+from supervisor import Supervisor
+
+REPO = os.getcwd()
+COMMANDS = ["/start", "/claim", "/rank", "/referral"]
+CALLBACKS = ["farming", "rank", "back_main", "completed_task"]
+
+async def fake_source(total, users, batch=100):
+    rng = random.Random(1)
+    for start in range(1, total + 1, batch):
+        updates = []
+        for update_id in range(start, min(start + batch, total + 1)):
+            user_id = rng.randint(1, users)
+            if rng.random() < 0.5:
+                updates.append(command_update(update_id, user_id, rng.choice(COMMANDS)))
+            else:
+                updates.append(callback_update(update_id, user_id, rng.choice(CALLBACKS)))
+        yield updates
+
+async def measure(workers, total, users):
+    workdir = tempfile.mkdtemp(prefix=f"gxr_workers_{workers}_")
+    os.symlink(os.path.join(REPO, "assets"), os.path.join(workdir, "assets"))
+    os.chdir(workdir)
+    supervisor = Supervisor(workers, request_factory=StubRequest)
+    await supervisor.start()
+    started = time.perf_counter()
+    await supervisor.run(fake_source(total, users))
+    while supervisor.processed() < total:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await supervisor.stop()
+    return total / elapsed
+
+async def main(total, worker_counts, users):
+    print(f"update: {total:,}, user: {users:,}, CPU: {os.cpu_count()}")
+    baseline = None
+    for workers in worker_counts:
+        rate = await measure(workers, total, users)
+        baseline = baseline or rate
+        print(f"{workers:>2} worker : {rate:>9,.0f} update/s  (x{rate / baseline:.2f})")
+    if max(worker_counts) > (os.cpu_count() or 1):
+        print("⚠️ Worker lebih banyak dari CPU: skala tidak akan linear di mesin ini")
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    worker_counts = [int(n) for n in sys.argv[2].split(",")] if len(sys.argv) > 2 else [1, 2, 4]
+    users = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    asyncio.run(main(total, worker_counts, users))
@@ -0,0 +1,189 @@
+# broadcast.py
+
+import asyncio, os, sqlite3, threading, time
+from config import BROADCAST_RATE, BROADCAST_PROGRESS_INTERVAL, BROADCAST_CHECKPOINT_EVERY
+from ratelimit import TokenBucket
+from notify import send_bulk
+from store import get_store, flush_store
+from users import is_admin
+
+BROADCAST_DB = "data/broadcast.db"
+RECIPIENT_CHUNK = 500
+QUEUE_POLL_INTERVAL = 5.0   # Job bisa di-submit worker lain (mode multi-worker)
+
+class BroadcastQueue:
+    """Antrean broadcast persisten; cursor = user_id terakhir yang sudah diproses
+
+    checkpoint dipanggil dari thread (asyncio.to_thread), jadi koneksi dijaga lock.
+    """
+
+    def __init__(self, path=BROADCAST_DB):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            admin_chat INTEGER NOT NULL,
+            status_message INTEGER,
+            status TEXT NOT NULL DEFAULT 'queued',
+            cursor TEXT,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            blocked INTEGER NOT NULL DEFAULT 0,
+            created REAL NOT NULL,
+            started REAL,
+            finished REAL
+        )""")
+
+    def enqueue(self, text, admin_chat, status_message=None):
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO broadcasts (text, admin_chat, status_message, created) VALUES (?, ?, ?, ?)",
+                (text, admin_chat, status_message, time.time()))
+            return cur.lastrowid
+
+    def next_job(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, text, admin_chat, status_message, cursor, sent, failed, blocked, started "
+                "FROM broadcasts WHERE status IN ('running', 'queued') ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            return None
+        keys = ("id", "text", "admin_chat", "status_message", "cursor", "sent", "failed", "blocked", "started")
+        return dict(zip(keys, row))
+
+    def checkpoint(self, job, status="running"):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE broadcasts SET status = ?, cursor = ?, sent = ?, failed = ?, blocked = ?, "
+                "started = ?, finished = ? WHERE id = ?",
+                (status, job["cursor"], job["sent"], job["failed"], job["blocked"], job["started"],
+                 time.time() if status == "done" else None, job["id"]))
+
+    def pending(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM broadcasts WHERE status IN ('running', 'queued')").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class Broadcaster:
+    """Kirim broadcast dengan token bucket global, retry, dan resume dari checkpoint
+
+    Rate broadcast sengaja di bawah batas global Telegram (~30 msg/s) dan
+    pengiriman ditahan sebentar selama masih ada update interaktif yang
+    menunggu diproses, sehingga trafik user selalu didahulukan.
+    """
+
+    def __init__(self, application, queue=None, rate=BROADCAST_RATE):
+        self.application = application
+        self.queue = queue or BroadcastQueue()
+        self.bucket = TokenBucket(rate, capacity=rate)
+        self._wakeup = asyncio.Event()
+        self.current = None
+
+    def submit(self, text, admin_chat, status_message=None):
+        job_id = self.queue.enqueue(text, admin_chat, status_message)
+        self._wakeup.set()
+        return job_id
+
+    async def _report(self, job, final=False):
+        if not job["status_message"]:
+            return
+        elapsed = max(time.time() - job["started"], 1e-6)
+        done = job["sent"] + job["failed"] + job["blocked"]
+        text = (
+            f"📣 Broadcast #{job['id']} {'selesai ✅' if final else 'berjalan...'}\n"
+            f"Terkirim: {job['sent']:,} | Gagal: {job['failed']:,} | Blokir: {job['blocked']:,}\n"
+            f"Throughput: {done / elapsed:.1f} msg/s"
+        )
+        try:
+            await self.application.bot.edit_message_text(
+                text, chat_id=job["admin_chat"], message_id=job["status_message"])
+        except Exception:
+            pass
+
+    async def _checkpoint(self, job, status="running"):
+        # Salinan: job terus berubah di event loop selama commit SQLite jalan di thread
+        await asyncio.to_thread(self.queue.checkpoint, dict(job), status)
+
+    async def _deliver(self, job, stop_event):
+        """Kirim ke semua penerima setelah cursor; checkpoint tiap BROADCAST_CHECKPOINT_EVERY
+        penerima atau BROADCAST_PROGRESS_INTERVAL detik (crash = paling banyak sebanyak itu terkirim ulang)"""
+        job["started"] = job["started"] or time.time()
+        self.current = job
+        last_report = last_checkpoint = time.monotonic()
+        unsaved = 0
+        # Penerima dibaca urut user_id dari store, jadi user baru di cache di-flush dulu
+        await asyncio.to_thread(flush_store)
+        store = get_store()
+        while not stop_event.is_set():
+            chunk = []
+            for user_id, _ in store.scan(after=job["cursor"] or ""):
+                chunk.append(user_id)
+                if len(chunk) >= RECIPIENT_CHUNK:
+                    break
+            if not chunk:
+                break
+            for user_id in chunk:
+                if stop_event.is_set():
+                    break
+                if user_id.isdigit():
+                    job[await send_bulk(self.application, self.bucket, int(user_id), job["text"])] += 1
+                job["cursor"] = user_id
+                unsaved += 1
+                now = time.monotonic()
+                if unsaved >= BROADCAST_CHECKPOINT_EVERY or now - last_checkpoint >= BROADCAST_PROGRESS_INTERVAL:
+                    await self._checkpoint(job)
+                    unsaved, last_checkpoint = 0, now
+                if now - last_report >= BROADCAST_PROGRESS_INTERVAL:
+                    last_report = now
+                    await self._report(job)
+        if stop_event.is_set():
+            if unsaved:
+                await self._checkpoint(job)
+            return False
+        await self._checkpoint(job, status="done")
+        await self._report(job, final=True)
+        self.current = None
+        return True
+
+    async def run(self, stop_event):
+        """Background task: proses antrean broadcast satu per satu, lanjut setelah restart"""
+        while not stop_event.is_set():
+            job = self.queue.next_job()
+            if job is None:
+                self._wakeup.clear()
+                waiter = asyncio.create_task(self._wakeup.wait())
+                stopper = asyncio.create_task(stop_event.wait())
+                await asyncio.wait({waiter, stopper}, timeout=QUEUE_POLL_INTERVAL,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                stopper.cancel()
+                continue
+            try:
+                await self._deliver(job, stop_event)
+            except Exception as e:
+                print(f"❌ Broadcast #{job['id']} error: {e}")
+                await asyncio.sleep(5)
+        self.queue.close()
+
+async def broadcast(update, context):
+    if not is_admin(update):
+        await update.message.reply_text("Kamu bukan admin.")
+        return
+    parts = update.message.text.split(None, 1)
+    if len(parts) < 2:
+        await update.message.reply_text("Gunakan format: /broadcast <pesan>")
+        return
+    broadcaster = context.bot_data.get("broadcaster")
+    if broadcaster is None:
+        await update.message.reply_text("Broadcaster belum siap.")
+        return
+    status = await update.message.reply_text("📣 Broadcast masuk antrean...")
+    job_id = broadcaster.submit(parts[1], update.effective_chat.id, status.message_id)
+    await status.edit_text(f"📣 Broadcast #{job_id} masuk antrean ({get_store().count():,} user).")
@@ -0,0 +1,211 @@
+# cache.py
+
+import asyncio, threading, time
+from abc import abstractmethod
+from collections import OrderedDict
+from store import USER_FIELDS, UserStore, new_user, _check_fields
+
+class WriteBehind(UserStore):
+    """Basis write-behind: perubahan dikumpulkan di RAM lalu di-flush per batch ke store"""
+
+    def __init__(self, store, flush_interval=2.0, flush_batch=500):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = None
+        self._stopped = False
+        self._before_flush = None
+        self._stats = {
+            "flushes": 0,
+            "flushed_rows": 0,
+            "flush_errors": 0,
+            "last_batch": 0,
+            "max_batch": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+        }
+
+    def _mark(self, key):
+        self._dirty.add(key)
+        if len(self._dirty) >= self.flush_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    def set_before_flush(self, hook):
+        """hook() dipanggil setelah batch diambil dan sebelum ditulis (mis. fsync ledger poin)"""
+        self._before_flush = hook
+
+    @abstractmethod
+    def _batch(self, keys):
+        """[(user_id, row)] untuk key dirty; dipanggil dengan lock dipegang"""
+
+    def _flushed(self, keys):
+        pass
+
+    def flush(self):
+        """Tulis semua user dirty ke store dalam satu batch"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty:
+                    return 0
+                keys, self._dirty = self._dirty, set()
+                batch = self._batch(keys)
+            started = time.perf_counter()
+            try:
+                if self._before_flush is not None:
+                    self._before_flush()
+                self.store.put_many(batch)
+            except Exception:
+                with self._lock:
+                    self._dirty.update(keys)
+                    self._stats["flush_errors"] += 1
+                raise
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._flushed(keys)
+                stats = self._stats
+                stats["flushes"] += 1
+                stats["flushed_rows"] += len(batch)
+                stats["last_batch"] = len(batch)
+                stats["max_batch"] = max(stats["max_batch"], len(batch))
+                stats["last_flush_ms"] = elapsed
+                stats["max_flush_ms"] = max(stats["max_flush_ms"], elapsed)
+            return len(batch)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, dirty=len(self._dirty), cached=self.count())
+
+    async def run_flusher(self):
+        """Background task: flush tiap flush_interval atau saat dirty >= flush_batch"""
+        self._wakeup = asyncio.Event()
+        while not self._stopped:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"❌ Flush user cache gagal: {e}")
+
+    def stop(self):
+        self._stopped = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def close(self):
+        self.stop()
+        self.flush()
+        self.store.close()
+
+class UserCache(WriteBehind):
+    """Write-behind cache: baca dari RAM, user yang berubah di-flush per batch"""
+
+    def __init__(self, store, flush_interval=2.0, flush_batch=500, max_rows=100000):
+        super().__init__(store, flush_interval, flush_batch)
+        self.max_rows = max_rows
+        self._rows = OrderedDict()
+        self._new = set()
+
+    def _load(self, user_id):
+        row = self._rows.get(user_id)
+        if row is not None:
+            self._rows.move_to_end(user_id)
+            return row
+        row = self.store.get(user_id)
+        if row is None:
+            return None
+        self._rows[user_id] = row
+        self._evict()
+        return row
+
+    def _evict(self):
+        # Hanya row yang bersih yang boleh dibuang dari RAM
+        if len(self._rows) <= self.max_rows:
+            return
+        for user_id in list(self._rows):
+            if len(self._rows) <= self.max_rows:
+                break
+            if user_id not in self._dirty:
+                del self._rows[user_id]
+
+    def get(self, user_id, default=None):
+        with self._lock:
+            row = self._load(user_id)
+            return dict(row) if row is not None else default
+
+    def update(self, user_id, **fields):
+        if not fields:
+            return
+        _check_fields(fields)
+        with self._lock:
+            row = self._load(user_id)
+            if row is None:
+                row = self._rows[user_id] = new_user()
+                self._new.add(user_id)
+            row.update(fields)
+            self._mark(user_id)
+
+    def increment(self, user_id, field, delta):
+        _check_fields((field,))
+        with self._lock:
+            row = self._load(user_id)
+            if row is None:
+                row = self._rows[user_id] = new_user()
+                self._new.add(user_id)
+            row[field] = row.get(field, 0) + delta
+            self._mark(user_id)
+            return row[field]
+
+    def put_many(self, rows):
+        for user_id, user in rows:
+            self.update(user_id, **{k: v for k, v in user.items() if k in USER_FIELDS})
+
+    def scan(self, after=None):
+        # Dengan after, user baru yang belum di-flush menyusul setelah flush berikutnya
+        with self._lock:
+            pending = set(self._new) if after is None else set()
+        for user_id, row in self.store.scan(after):
+            if user_id in pending:
+                continue
+            with self._lock:
+                cached = self._rows.get(user_id)
+                if cached is not None:
+                    row = dict(cached)
+            yield user_id, row
+        for user_id in pending:
+            with self._lock:
+                cached = self._rows.get(user_id)
+                row = dict(cached) if cached is not None else None
+            if row is not None:
+                yield user_id, row
+
+    def count(self):
+        with self._lock:
+            return self.store.count() + len(self._new)
+
+    def claimed_since(self, since):
+        # Row dirty belum ada di store; nilai di RAM yang dipakai
+        with self._lock:
+            dirty = {uid: self._rows[uid].get("last_claim", 0) for uid in self._dirty}
+        for user_id, last_claim in self.store.claimed_since(since):
+            if user_id not in dirty:
+                yield user_id, last_claim
+        for user_id, last_claim in dirty.items():
+            if last_claim > since:
+                yield user_id, last_claim
+
+    def _batch(self, keys):
+        return [(uid, dict(self._rows[uid])) for uid in keys]
+
+    def _flushed(self, keys):
+        self._new.difference_update(keys)
+        self._evict()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, dirty=len(self._dirty), cached=len(self._rows))
@@ -3,10 +3,23 @@
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CommandHandler, CallbackQueryHandler
-from users import claim_reward, get_user_status, connect_wallet, export_csv
-from referral import show_referral_code, apply_referral
-from tasks import show_tasks, show_completed_tasks
-from ranking import show_rank_navigation, show_leaderboard
+from users import claim_reward, claim_now, get_user_status, connect_wallet, cache_stats, box_status
+from export import export_csv
+from admin import show_stats, show_analytics
+from broadcast import broadcast
+from referral import show_referral_code, apply_referral, show_referral_top
+from tasks import (TASK_CATALOG, TASKS_BY_ID, show_tasks, show_completed_tasks, show_completed_category, complete_task,
+    show_pending_tasks, approve_task, reject_task, legacy_complete_params)
+from ranking import show_rank_navigation, show_leaderboard, show_my_position
+from refgraph import get_referral_graph
+from store import get_store, new_user
+from render import Screen, static_screen, edit_screen, remember
+from metrics import instrument_handlers
+from flood import install as install_flood_control
+from loopmon import show_lag, run_profile
+from router import CallbackRouter, callback_data, int_range, one_of
+from evol import MAX_EVOL
+from config import CLAIM_REWARD, METRICS_ENABLED, FLOOD_ENABLED
 
 def register_handlers(application):
     application.add_handler(CommandHandler("start", start))
@@ -16,85 +29,60 @@ def register_handlers(application):
     application.add_handler(CommandHandler("referral", show_referral_code))
     application.add_handler(CommandHandler("exportcsv", export_csv))
     application.add_handler(CommandHandler("usecode", apply_referral))
-    application.add_handler(CallbackQueryHandler(handle_callback))
-
-async def start(update, context):
-    keyboard = [
-        [
-            InlineKeyboardButton("🚜 Farming", callback_data="farming"),
-            InlineKeyboardButton("✅ Completed Task", callback_data="completed_task")
-        ],
-        [
-            InlineKeyboardButton("🏆 Rank", callback_data="rank"),
-            InlineKeyboardButton("💳 Wallet Connect", callback_data="wallet_connect")
-        ]
+    application.add_handler(CommandHandler("reftop", show_referral_top))
+    application.add_handler(CommandHandler("cachestats", cache_stats))
+    application.add_handler(CommandHandler("stats", show_stats))
+    application.add_handler(CommandHandler("analytics", show_analytics))
+    application.add_handler(CommandHandler("broadcast", broadcast))
+    application.add_handler(CommandHandler("pendingtasks", show_pending_tasks))
+    application.add_handler(CommandHandler("approvetask", approve_task))
+    application.add_handler(CommandHandler("rejecttask", reject_task))
+    application.add_handler(CommandHandler("lag", show_lag))
+    application.add_handler(CommandHandler("profile", run_profile))
+    application.add_handler(CallbackQueryHandler(router.dispatch))
+    router.install(application)
+    if METRICS_ENABLED:
+        instrument_handlers(application, {router.dispatch: router.metrics_route})
+    if FLOOD_ENABLED:
+        # Setelah instrument_handlers: update yang dibuang tidak masuk metrik handler
+        install_flood_control(application, router.metrics_route)
+
+MAIN_MENU_MARKUP = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("🚜 Farming", callback_data=callback_data("farming")),
+        InlineKeyboardButton("✅ Completed Task", callback_data=callback_data("completed"))
+    ],
+    [
+        InlineKeyboardButton("🏆 Rank", callback_data=callback_data("rank")),
+        InlineKeyboardButton("💳 Wallet Connect", callback_data=callback_data("wallet"))
     ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    welcome_text = """🚀 **Selamat datang di GXR Airdrop Bot!**
+])
+
+@static_screen
+def welcome_screen():
+    return Screen("""🚀 **Selamat datang di GXR Airdrop Bot!**
 
 🎮 Pilih menu di bawah untuk memulai petualangan evolusimu!
 
 📊 **Status:** Ready to evolve
-💎 **Sistem:** Evol 1-7 Active"""
-    
-    await update.message.reply_text(welcome_text, reply_markup=reply_markup, parse_mode='Markdown')
-
-async def handle_callback(update, context):
-    query = update.callback_query
-    await query.answer()
-    
-    if query.data == "farming":
-        await show_farming_menu(query, context)
-    elif query.data == "completed_task":
-        await show_completed_tasks(query, context)
-    elif query.data == "rank":
-        await show_rank_navigation(query, context)
-    elif query.data == "wallet_connect":
-        await show_wallet_menu(query, context)
-    elif query.data.startswith("task_"):
-        await show_tasks(query, context)
-    elif query.data.startswith("evol_"):
-        await show_rank_navigation(query, context)
-    elif query.data == "back_main":
-        await back_to_main_menu(query, context)
-
-async def show_farming_menu(query, context):
-    user_id = str(query.from_user.id)
-    
-    # Simulasi status farming
-    farming_status = "🟢 Box Penuh - Siap Klaim!"
-    next_claim = "6 jam"
-    
-    keyboard = [
-        [InlineKeyboardButton("🎯 Original Task", callback_data="task_original")],
-        [InlineKeyboardButton("🤝 Partnership Task", callback_data="task_partnership")],
-        [InlineKeyboardButton("👥 Collaborator Task", callback_data="task_collaborator")],
-        [InlineKeyboardButton("💎 Claim Reward", callback_data="claim_now")],
-        [InlineKeyboardButton("🏠 Back to Home", callback_data="back_main")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    farming_text = f"""🚜 **FARMING DASHBOARD**
+💎 **Sistem:** Evol 1-7 Active""", MAIN_MENU_MARKUP)
 
-📦 **Status Box:** {farming_status}
-⏰ **Next Claim:** {next_claim}
-💰 **Reward Ready:** 250 GXR Points
+@static_screen
+def main_menu_screen():
+    return Screen("""🚀 **GXR Airdrop Bot - Main Menu**
 
-🎯 **Available Tasks:**
-━━━━━━━━━━━━━━━━━━━━━━━━
-Pilih kategori task di bawah untuk memulai farming!"""
+🎮 Pilih menu di bawah untuk melanjutkan!
 
-    await query.edit_message_text(farming_text, reply_markup=reply_markup, parse_mode='Markdown')
+📊 **Status:** Ready to evolve
+💎 **Sistem:** Evol 1-7 Active""", MAIN_MENU_MARKUP)
 
-async def show_wallet_menu(query, context):
+@static_screen
+def wallet_screen():
     keyboard = [
-        [InlineKeyboardButton("🔜 Coming Soon", callback_data="wallet_soon")],
-        [InlineKeyboardButton("🏠 Back to Home", callback_data="back_main")]
+        [InlineKeyboardButton("🔜 Coming Soon", callback_data=callback_data("wallet_soon"))],
+        [InlineKeyboardButton("🏠 Back to Home", callback_data=callback_data("main"))]
     ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    wallet_text = """💳 **WALLET CONNECTION**
+    return Screen("""💳 **WALLET CONNECTION**
 
 🚧 **Status:** Coming Soon
 
@@ -113,28 +101,69 @@ async def show_wallet_menu(query, context):
 • Trezor Wallet
 
 🔔 **Launching Soon!** 
-Semua fitur wallet sedang dalam tahap persiapan dan akan segera diluncurkan!"""
+Semua fitur wallet sedang dalam tahap persiapan dan akan segera diluncurkan!""", InlineKeyboardMarkup(keyboard))
 
-    await query.edit_message_text(wallet_text, reply_markup=reply_markup, parse_mode='Markdown')
+FARMING_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🎯 Original Task", callback_data=callback_data("tasks", "original"))],
+    [InlineKeyboardButton("🤝 Partnership Task", callback_data=callback_data("tasks", "partnership"))],
+    [InlineKeyboardButton("👥 Collaborator Task", callback_data=callback_data("tasks", "collaborator"))],
+    [InlineKeyboardButton("💎 Claim Reward", callback_data=callback_data("claim"))],
+    [InlineKeyboardButton("🏠 Back to Home", callback_data=callback_data("main"))]
+])
 
-async def back_to_main_menu(query, context):
-    keyboard = [
-        [
-            InlineKeyboardButton("🚜 Farming", callback_data="farming"),
-            InlineKeyboardButton("✅ Completed Task", callback_data="completed_task")
-        ],
-        [
-            InlineKeyboardButton("🏆 Rank", callback_data="rank"), 
-            InlineKeyboardButton("💳 Wallet Connect", callback_data="wallet_connect")
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    welcome_text = """🚀 **GXR Airdrop Bot - Main Menu**
+FARMING_TEMPLATE = """🚜 **FARMING DASHBOARD**
 
-🎮 Pilih menu di bawah untuk melanjutkan!
+📦 **Status Box:** {farming_status}
+⏰ **Next Claim:** {next_claim}
+💰 **Reward Ready:** {reward} GXR Points
+👥 **Referral:** {referrals} teman
 
-📊 **Status:** Ready to evolve
-💎 **Sistem:** Evol 1-7 Active"""
-    
-    await query.edit_message_text(welcome_text, reply_markup=reply_markup, parse_mode='Markdown')
+🎯 **Available Tasks:**
+━━━━━━━━━━━━━━━━━━━━━━━━
+Pilih kategori task di bawah untuk memulai farming!"""
+
+async def start(update, context):
+    screen = welcome_screen()
+    message = await update.message.reply_text(screen.text, reply_markup=screen.markup, parse_mode='Markdown')
+    remember(message, screen.text, screen.markup)
+
+async def show_farming_menu(query, context):
+    user_id = str(query.from_user.id)
+    remaining, filled = box_status(get_store().get(user_id) or new_user())
+    if remaining:
+        remaining = int(remaining)
+        farming_status = f"🟡 Mengisi... {filled:.0f}%"
+        next_claim = f"{remaining // 3600} jam {remaining % 3600 // 60} menit"
+    else:
+        farming_status = "🟢 Box Penuh - Siap Klaim!"
+        next_claim = "Sekarang"
+
+    farming_text = FARMING_TEMPLATE.format(farming_status=farming_status, next_claim=next_claim, reward=CLAIM_REWARD,
+                                           referrals=get_referral_graph().count(user_id))
+    await edit_screen(query, farming_text, FARMING_MARKUP)
+
+async def show_wallet_menu(query, context):
+    screen = wallet_screen()
+    await edit_screen(query, screen.text, screen.markup)
+
+async def back_to_main_menu(query, context):
+    screen = main_menu_screen()
+    await edit_screen(query, screen.text, screen.markup)
+
+# Tabel route callback. concurrency = lane sendiri di update processor supaya
+# layar berat (rank, leaderboard) tidak menahan menu statis dan klaim.
+router = CallbackRouter()
+router.route("main", back_to_main_menu, cache="static", concurrency=64)
+router.route("wallet", show_wallet_menu, cache="static", concurrency=64)
+router.route("wallet_soon", answer="🔜 Wallet connect segera hadir!")
+router.route("farming", show_farming_menu, concurrency=64)
+router.route("claim", claim_now, answers=True, concurrency=16)
+router.route("tasks", show_tasks, params=(one_of(TASK_CATALOG),), concurrency=16)
+router.route("complete", complete_task, params=(one_of(TASK_CATALOG), int_range(0, max(TASKS_BY_ID))), concurrency=16)
+router.legacy("complete", legacy_complete_params)
+router.route("completed", show_completed_tasks, concurrency=16)
+router.route("completed_type", show_completed_category, params=(one_of(TASK_CATALOG),), concurrency=16)
+router.route("rank", show_rank_navigation, concurrency=8)
+router.route("evol", show_rank_navigation, params=(int_range(1, MAX_EVOL),), concurrency=8)
+router.route("position", show_my_position, concurrency=8)
+router.route("leaderboard", show_leaderboard, params=(int_range(1, MAX_EVOL),), cache=5.0, concurrency=8)
@@ -8,6 +8,11 @@ CLAIM_INTERVAL_HOURS = 6
 CLAIM_REWARD = 250
 REFERRAL_REWARD = 50
 
+# Task: reward hanya setelah terverifikasi. Task "channel" dicek lewat getChatMember (bot harus
+# admin di channel, kosong = review admin), task lain tanpa cek otomatis masuk antrean /pendingtasks
+TASK_CHANNEL = ""          # mis. "@GXROfficial"
+TASK_REVIEW_PAGE = 20      # Submission per halaman /pendingtasks
+
 POOL_PER_EVOL = {
     1: 2500000,
     2: 5000000,
@@ -17,3 +22,127 @@ POOL_PER_EVOL = {
     6: 1500000000,
     7: 2000000000,
 }
+POOL_REFILL_HOURS = 24      # Pool evol di-reset tiap N jam (0 = tidak pernah)
+POOL_FLUSH_INTERVAL = 5.0   # Detik antar penyimpanan pemakaian pool
+
+# Backend penyimpanan user: "sqlite" (default) atau "json" (legacy)
+USER_STORE_BACKEND = "sqlite"
+
+# Write-behind cache user: flush tiap N detik atau saat jumlah user dirty mencapai batch
+USER_CACHE_ENABLED = True
+USER_CACHE_FLUSH_INTERVAL = 2.0
+USER_CACHE_FLUSH_BATCH = 500
+USER_CACHE_MAX_ROWS = 100000
+# Tabel kolom: semua user di RAM sebagai array (~100 byte/user), menggantikan cache row dict.
+# User baru ditampung di dict overflow dan digabung ke index terurut tiap N user.
+USER_TABLE_COLUMNAR = True
+USER_TABLE_OVERFLOW = 50000
+
+# Ledger poin append-only (JSON lines di LEDGER_DIR): fsync per grup, snapshot + compaction berkala
+LEDGER_ENABLED = True
+LEDGER_DIR = "data/ledger"
+LEDGER_FSYNC_INTERVAL = 0.1      # Jeda maksimum sebelum event di-fsync
+LEDGER_GROUP_MAX = 1000          # Atau lebih cepat kalau event tertunda sebanyak ini
+LEDGER_SEGMENT_BYTES = 64 * 2**20
+LEDGER_SNAPSHOT_INTERVAL = 3600  # Detik antar snapshot saldo
+LEDGER_SNAPSHOT_EVENTS = 500000  # Atau lebih cepat setelah event sebanyak ini
+LEDGER_ARCHIVE = True            # Segmen yang tercakup snapshot dipindah ke archive/ (False = dihapus)
+
+# Analytics admin (/analytics): counter diperbarui saat poin dikredit, disimpan berkala di ANALYTICS_DIR
+ANALYTICS_ENABLED = True
+ANALYTICS_DIR = "data/analytics"
+ANALYTICS_SAVE_INTERVAL = 60.0
+ANALYTICS_DAYS = 30                          # Hari histori harian yang disimpan
+ANALYTICS_BURN_WINDOWS = (300, 3600, 86400)  # Window burn rate pool (detik)
+ANALYTICS_HLL_PRECISION = 14                 # 2^14 register per hari (16 KB), error ~0.8%
+
+ADMIN_IDS = {"123456789"}  # Ganti dengan Telegram ID admin
+
+# Jumlah pesan terakhir yang diingat hash-nya untuk melewati edit identik
+RENDER_CACHE_SIZE = 50000
+
+# /exportcsv: kompres gzip dan pecah file di bawah batas upload bot Telegram (50 MB)
+EXPORT_GZIP = True
+EXPORT_PART_MAX_BYTES = 45 * 1024 * 1024
+
+# Mode penerimaan update: "polling" atau "webhook"
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")  # kosong = tidak memanggil setWebhook (tes lokal)
+WEBHOOK_LISTEN = "0.0.0.0"
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = "/telegram"
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")  # kosong = secret acak per proses (replay lokal butuh diisi)
+WEBHOOK_QUEUE_SIZE = 1000       # Update yang boleh antre sebelum dibalas 429
+WEBHOOK_MAX_CONNECTIONS = 40
+
+# Update diproses konkuren antar user (berurutan per user)
+UPDATE_CONCURRENCY = 32     # Handler yang boleh jalan bersamaan
+UPDATE_MAX_PENDING = 1024   # Update yang boleh menunggu sebelum fetcher ikut menunggu
+
+# Flood control per user di depan handler: (rate per detik, burst) per route metrik
+FLOOD_ENABLED = True
+FLOOD_DEFAULT = (2.0, 8)        # Route lain berbagi satu bucket per user
+FLOOD_ROUTES = {
+    "/claim": (0.5, 3),
+    "/usecode": (0.2, 3),
+    "cb:claim": (0.5, 3),
+    "cb:rank": (1.0, 4),
+    "cb:evol": (1.0, 4),
+    "cb:leaderboard": (1.0, 4),
+}
+FLOOD_COALESCE_WINDOW = 1.0     # Detik; callback identik (user, data, pesan) di dalamnya dibuang
+
+# Broadcast: di bawah batas global Telegram ~30 msg/s supaya trafik interaktif tetap lancar
+BROADCAST_RATE = 25
+BROADCAST_PROGRESS_INTERVAL = 5.0
+BROADCAST_CHECKPOINT_EVERY = 100   # Cursor disimpan tiap N penerima (atau tiap PROGRESS_INTERVAL)
+BROADCAST_MAX_RETRIES = 3
+
+# Notifikasi "box penuh": timing wheel dari last_claim, dikirim lewat token bucket broadcast
+NOTIFY_ENABLED = True
+NOTIFY_RESOLUTION = 1.0           # Detik per slot wheel
+NOTIFY_CONCURRENCY = 8            # Pengirim paralel (total tetap dibatasi BROADCAST_RATE)
+NOTIFY_SYNC_INTERVAL = 15.0       # Multi-worker: klaim dari worker lain dibaca dari SQLite tiap N detik
+NOTIFY_SYNC_OVERLAP = 5.0         # Detik klaim yang dibaca ulang tiap sync (commit worker lain yang terlambat)
+NOTIFY_CHECKPOINT_INTERVAL = 10.0
+
+# Multi-worker: satu proses ingest membagi update ke N worker berdasarkan hash user_id
+BOT_WORKERS = int(os.environ.get("BOT_WORKERS", "1"))  # 1 = mode satu proses
+BOT_API_URL = os.environ.get("BOT_API_URL", "")        # kosong = api.telegram.org (isi untuk Bot API lokal)
+WORKER_QUEUE_BATCHES = 64       # Batch update yang boleh antre per worker
+WORKER_START_TIMEOUT = 120.0    # Detik menunggu worker baru siap (rolling restart)
+WORKER_DRAIN_TIMEOUT = 30.0     # Detik menunggu worker menyelesaikan antrean saat stop
+WORKER_RANK_REFRESH = 30.0      # Rank index worker dibangun ulang tiap N detik
+
+# Transport Bot API keluar: pool koneksi httpx, timeout, dan antrean prioritas di depannya
+API_POOL_SIZE = 256
+API_HTTP2 = True                # Butuh paket h2 (pip install "httpx[http2]"); tanpa itu tetap HTTP/1.1
+API_CONNECT_TIMEOUT = 5.0
+API_READ_TIMEOUT = 10.0
+API_WRITE_TIMEOUT = 10.0
+API_POOL_TIMEOUT = 3.0          # Detik menunggu koneksi bebas dari pool
+API_SCHEDULER_ENABLED = True
+API_MAX_INFLIGHT = 128          # Request serentak; sisanya antre: jawab callback > balasan handler > bulk
+
+# Referral: edge user -> referrer di SQLite, scan penyalahgunaan berkala di thread
+REFERRAL_TOP_N = 10
+REFERRAL_SCAN_INTERVAL = 300.0      # Detik antar scan cycle/burst/farm (worker: sekaligus refresh graf)
+REFERRAL_BURST = 10                 # Referral per referrer dalam REFERRAL_BURST_WINDOW yang dianggap burst
+REFERRAL_BURST_WINDOW = 600.0
+REFERRAL_FARM_MIN_SIZE = 25         # Pohon referral minimal sebesar ini diperiksa sebagai farm
+REFERRAL_FARM_INACTIVE_RATIO = 0.8  # Farm: porsi anggota yang belum pernah klaim/task
+REFERRAL_FARM_SAMPLE = 200          # Anggota yang dicek per pohon
+
+# Metrik per handler (count, error, histogram latensi storage/render/api)
+METRICS_ENABLED = True
+METRICS_LISTEN = "127.0.0.1"
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9100"))  # 0 = tanpa endpoint /metrics; worker N memakai port + 1 + N
+
+# Monitor event loop: lag diukur tiap interval, loop yang macet lebih dari threshold dicatat beserta stack
+LOOP_MONITOR_ENABLED = True
+LOOP_LAG_INTERVAL = 0.1
+LOOP_BLOCK_THRESHOLD = 0.1
+LOOP_BLOCK_HISTORY = 500        # Blokade terakhir yang disimpan untuk laporan
+LOOP_REPORT_WINDOW = 3600.0     # Laporan /lag hanya dari blokade dalam N detik terakhir
+PROFILE_MAX_SECONDS = 60        # Batas durasi /profile
+PROFILE_SAMPLE_INTERVAL = 0.005
@@ -1,18 +1,90 @@
 # evol.py
 
+from bisect import bisect_right
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy opsional, hanya untuk klasifikasi massal
+    np = None
+
+class EvolTier(namedtuple("EvolTier", "level name badge cap min_points max_points")):
+    __slots__ = ()
+
+    @property
+    def title(self):
+        return f"Evol {self.level} – {self.name}"
+
+    @property
+    def range_text(self):
+        if self.max_points is None:
+            return f"{self.min_points:,}+"
+        return f"{self.min_points:,}-{self.max_points - 1:,}"
+
+# (nama, batas bawah poin, cap GXR per klaim) per evol, urut dari Evol 1
+_TIER_TABLE = [
+    ("Rookie", 0, 5),
+    ("Charger", 50, 10),
+    ("Breaker", 15000, 15),
+    ("Phantom", 30000, 20),
+    ("Overdrive", 50000, 25),
+    ("Genesis", 80000, 30),
+    ("Final Form", 120000, 50),
+]
+
+EVOL_TIERS = tuple(
+    EvolTier(
+        level=i + 1,
+        name=name,
+        badge=f"assets/evol_{i + 1}.png",
+        cap=cap,
+        min_points=min_points,
+        max_points=_TIER_TABLE[i + 1][1] if i + 1 < len(_TIER_TABLE) else None,
+    )
+    for i, (name, min_points, cap) in enumerate(_TIER_TABLE)
+)
+EVOL_MIN_POINTS = [tier.min_points for tier in EVOL_TIERS]
+MAX_EVOL = len(EVOL_TIERS)
+
+def get_tier(points):
+    """EvolTier untuk jumlah poin, O(log k)"""
+    return EVOL_TIERS[max(0, bisect_right(EVOL_MIN_POINTS, points) - 1)]
+
+def get_tier_by_level(level):
+    return EVOL_TIERS[level - 1]
+
+def get_evol_level(points):
+    return get_tier(points).level
+
+def get_evol_bounds(level):
+    """(min_points, max_points) untuk satu evol, max None untuk evol terakhir"""
+    tier = EVOL_TIERS[level - 1]
+    return tier.min_points, tier.max_points
+
 def get_evol_info(points):
-    if points < 50:
-        return "Evol 1 – Rookie", "assets/evol_1.png", 5
-    elif points < 15000:
-        return "Evol 2 – Charger", "assets/evol_2.png", 10
-    elif points < 30000:
-        return "Evol 3 – Breaker", "assets/evol_3.png", 15
-    elif points < 50000:
-        return "Evol 4 – Phantom", "assets/evol_4.png", 20
-    elif points < 80000:
-        return "Evol 5 – Overdrive", "assets/evol_5.png", 25
-    elif points < 120000:
-        return "Evol 6 – Genesis", "assets/evol_6.png", 30
-    else:
-        return "Evol 7 – Final Form", "assets/evol_7.png", 50
-      
+    tier = get_tier(points)
+    return tier.title, tier.badge, tier.cap
+
+def classify_points(points):
+    """Petakan banyak poin sekaligus ke level evol (array numpy kalau tersedia)"""
+    if np is not None:
+        levels = np.searchsorted(np.asarray(EVOL_MIN_POINTS), np.asarray(points), side="right")
+        return np.maximum(levels, 1)
+    return [get_evol_level(p) for p in points]
+
+def tier_histogram(points):
+    """Jumlah user per level evol, index 0 = Evol 1"""
+    levels = classify_points(points)
+    if np is not None:
+        return np.bincount(levels, minlength=MAX_EVOL + 1)[1:].tolist()
+    counts = [0] * MAX_EVOL
+    for level in levels:
+        counts[level - 1] += 1
+    return counts
+
+def progress_text(current_level):
+    """Daftar evol dengan penanda progress, dipakai di layar rank"""
+    return "\n".join(
+        f"{'🟢' if current_level >= tier.level else '⚪'} Evol {tier.level} - {tier.name} ({tier.range_text})"
+        for tier in EVOL_TIERS
+    )
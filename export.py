@@ -0,0 +1,161 @@
+# export.py
+
+import asyncio, csv, gzip, io, os, time
+from datetime import datetime, timezone
+from itertools import islice
+from config import EXPORT_GZIP, EXPORT_PART_MAX_BYTES
+from evol import classify_points
+from store import get_store
+from users import is_admin
+
+EXPORT_DIR = "data/export"
+EXPORT_HEADER = ["User ID", "Points", "Wallet", "Evol", "Last Claim"]
+EXPORT_CHUNK = 1000
+PROGRESS_INTERVAL = 3.0
+
+_running = False
+
+def _claim_time(last_claim):
+    return datetime.fromtimestamp(last_claim, timezone.utc).isoformat() if last_claim else ""
+
+def iter_export_rows(store):
+    """Stream baris CSV dari user store, tier dihitung per chunk sekaligus"""
+    if hasattr(store, "export_rows"):
+        # Tabel kolom sudah menyimpan tier
+        for uid, points, wallet, tier, last_claim in store.export_rows():
+            yield [uid, points, wallet, tier, _claim_time(last_claim)]
+        return
+    users = iter(store.scan())
+    while True:
+        chunk = list(islice(users, EXPORT_CHUNK))
+        if not chunk:
+            return
+        levels = classify_points([u.get("points", 0) for _, u in chunk])
+        for (uid, u), level in zip(chunk, levels):
+            yield [
+                uid,
+                u.get("points", 0),
+                u.get("wallet", ""),
+                int(level),
+                _claim_time(u.get("last_claim") or 0),
+            ]
+
+class PartWriter:
+    """CSV writer yang memecah output jadi beberapa file di bawah batas ukuran"""
+
+    def __init__(self, prefix, compress=EXPORT_GZIP, max_bytes=EXPORT_PART_MAX_BYTES):
+        self.prefix = prefix
+        self.compress = compress
+        self.max_bytes = max_bytes
+        self.paths = []
+        self._raw = None
+        self._text = None
+        self._writer = None
+
+    def _open(self):
+        path = f"{self.prefix}_part{len(self.paths) + 1}.csv" + (".gz" if self.compress else "")
+        self.paths.append(path)
+        self._raw = open(path, "wb")
+        stream = gzip.GzipFile(fileobj=self._raw, mode="wb") if self.compress else self._raw
+        self._text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+        self._writer = csv.writer(self._text)
+        self._writer.writerow(EXPORT_HEADER)
+
+    def _size(self):
+        self._text.flush()
+        return self._raw.tell()
+
+    def writerow(self, row):
+        if self._writer is None:
+            self._open()
+        self._writer.writerow(row)
+
+    def maybe_rotate(self):
+        # Dicek per chunk; sisakan ruang untuk satu chunk + trailer gzip
+        if self._writer is not None and self._size() >= self.max_bytes:
+            self.close()
+
+    def finish(self):
+        # Export kosong tetap menghasilkan satu file berisi header
+        if not self.paths:
+            self._open()
+        self.close()
+        return self.paths
+
+    def close(self):
+        if self._text is not None:
+            self._text.close()
+            if self.compress:
+                self._raw.close()
+            self._raw = self._text = self._writer = None
+
+def write_export(prefix, progress):
+    """Jalan di worker thread: tulis semua user ke file part, kembalikan daftar path"""
+    writer = PartWriter(prefix, max_bytes=int(EXPORT_PART_MAX_BYTES * 0.95))
+    rows = 0
+    try:
+        for row in iter_export_rows(get_store()):
+            writer.writerow(row)
+            rows += 1
+            if rows % EXPORT_CHUNK == 0:
+                progress["rows"] = rows
+                writer.maybe_rotate()
+    except Exception:
+        writer.close()
+        raise
+    progress["rows"] = rows
+    return writer.finish()
+
+async def _report_progress(message, progress, total, done):
+    last = None
+    while not done.is_set():
+        try:
+            await asyncio.wait_for(done.wait(), timeout=PROGRESS_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        text = f"📤 Export berjalan... {progress['rows']:,}/{total:,} user"
+        if text != last and not done.is_set():
+            last = text
+            try:
+                await message.edit_text(text)
+            except Exception:
+                pass
+
+async def export_csv(update, context):
+    global _running
+    if not is_admin(update):
+        await update.message.reply_text("Kamu bukan admin.")
+        return
+    if _running:
+        await update.message.reply_text("⏳ Export lain masih berjalan.")
+        return
+
+    _running = True
+    try:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        total = get_store().count()
+        status = await update.message.reply_text(f"📤 Export dimulai untuk {total:,} user...")
+        progress = {"rows": 0}
+        done = asyncio.Event()
+        reporter = asyncio.create_task(_report_progress(status, progress, total, done))
+        started = time.monotonic()
+        prefix = os.path.join(EXPORT_DIR, f"export_{int(time.time())}")
+        try:
+            paths = await asyncio.to_thread(write_export, prefix, progress)
+        finally:
+            done.set()
+            await reporter
+
+        await status.edit_text(
+            f"✅ Export selesai: {progress['rows']:,} user, {len(paths)} file, "
+            f"{time.monotonic() - started:.1f} detik")
+        try:
+            for path in paths:
+                with open(path, "rb") as f:
+                    await update.message.reply_document(
+                        document=f, filename=os.path.basename(path), write_timeout=300)
+        finally:
+            for path in paths:
+                os.remove(path)
+    finally:
+        _running = False
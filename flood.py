@@ -0,0 +1,148 @@
+# flood.py
+
+import asyncio, time
+from collections import Counter
+from telegram import Update
+from telegram.error import TelegramError
+from telegram.ext import ApplicationHandlerStop, TypeHandler
+from config import ADMIN_IDS, FLOOD_DEFAULT, FLOOD_ROUTES, FLOOD_COALESCE_WINDOW
+
+THROTTLED_TEXT = "⏳ Pelan-pelan, tunggu sebentar lalu coba lagi."
+DEFAULT_ROUTE = "default"
+
+class ExpiringMap:
+    """Dict dua generasi: entri yang tidak ditulis ulang hilang sendiri setelah 1-2 x ttl
+
+    Tiap ttl detik generasi lama dibuang utuh, jadi tidak ada sweep per entri
+    dan memori hanya sebanding dengan user yang aktif dalam 2 x ttl terakhir.
+    """
+
+    __slots__ = ("ttl", "_current", "_previous", "_rotated")
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._current = {}
+        self._previous = {}
+        self._rotated = time.monotonic()
+
+    def _rotate(self, now):
+        elapsed = now - self._rotated
+        if elapsed >= self.ttl:
+            self._previous = self._current if elapsed < 2 * self.ttl else {}
+            self._current = {}
+            self._rotated = now
+
+    def get(self, key, now):
+        self._rotate(now)
+        value = self._current.get(key)
+        return self._previous.get(key) if value is None else value
+
+    def set(self, key, value):
+        self._current[key] = value
+
+    def __len__(self):
+        return len(self._current) + len(self._previous)
+
+class RouteLimit:
+    """Token bucket per user versi GCRA: satu float (theoretical arrival time) per user"""
+
+    __slots__ = ("interval", "tolerance", "users")
+
+    def __init__(self, rate, burst):
+        self.interval = 1.0 / rate
+        self.tolerance = self.interval * (burst - 1)
+        # Setelah burst / rate detik tanpa request bucket user pasti penuh lagi
+        self.users = ExpiringMap(self.interval * burst)
+
+    def allow(self, user_id, now):
+        tat = self.users.get(user_id, now)
+        if tat is None or tat < now:
+            tat = now
+        if tat - now > self.tolerance:
+            return False
+        self.users.set(user_id, tat + self.interval)
+        return True
+
+class FloodControl:
+    """Throttle per user sebelum handler (TypeHandler di group -1)
+
+    Callback identik (user, data, pesan) dalam FLOOD_COALESCE_WINDOW dan update
+    yang melebihi bucket route-nya dihentikan dengan ApplicationHandlerStop;
+    callback dijawab toast tanpa menunggu, command dibuang diam-diam.
+    """
+
+    def __init__(self, callback_route, routes=FLOOD_ROUTES, default=FLOOD_DEFAULT,
+                 coalesce_window=FLOOD_COALESCE_WINDOW, exempt=ADMIN_IDS):
+        self.callback_route = callback_route
+        self.limits = {route: RouteLimit(*params) for route, params in routes.items()}
+        self.limits[DEFAULT_ROUTE] = RouteLimit(*default)
+        self.recent = ExpiringMap(coalesce_window)
+        self.coalesce_window = coalesce_window
+        self.exempt = exempt
+        self.passed = 0
+        self.dropped = Counter()  # (route, "coalesced" | "throttled") -> jumlah
+        self._answers = set()
+
+    def route_of(self, update):
+        if update.callback_query is not None:
+            return self.callback_route(update)
+        message = update.message
+        if message is not None and message.text and message.text.startswith("/"):
+            return message.text.split()[0].split("@")[0].lower()
+        return DEFAULT_ROUTE
+
+    def _coalesce(self, user_id, query, now):
+        message_id = query.message.message_id if query.message is not None else query.inline_message_id
+        key = (user_id, query.data, message_id)
+        seen = self.recent.get(key, now)
+        if seen is not None and now - seen < self.coalesce_window:
+            return True
+        self.recent.set(key, now)
+        return False
+
+    async def _answer(self, query, text):
+        try:
+            await query.answer(text)
+        except TelegramError:
+            pass  # query sudah kedaluwarsa atau sudah dijawab
+
+    def _drop(self, route, reason, query, text=None):
+        self.dropped[route, reason] += 1
+        if query is not None:
+            # Jawab di task terpisah supaya slot processor langsung lepas
+            task = asyncio.get_running_loop().create_task(self._answer(query, text))
+            self._answers.add(task)
+            task.add_done_callback(self._answers.discard)
+        raise ApplicationHandlerStop
+
+    async def check(self, update, context):
+        user = update.effective_user
+        if user is None or str(user.id) in self.exempt:
+            return
+        now = time.monotonic()
+        query = update.callback_query
+        route = self.route_of(update)
+        if query is not None and self._coalesce(user.id, query, now):
+            self._drop(route, "coalesced", query)
+        limit = self.limits.get(route) or self.limits[DEFAULT_ROUTE]
+        if not limit.allow(user.id, now):
+            self._drop(route, "throttled", query, THROTTLED_TEXT)
+        self.passed += 1
+
+    def stats(self):
+        return {
+            "passed": self.passed,
+            "dropped": sum(self.dropped.values()),
+            "tracked": sum(len(limit.users) for limit in self.limits.values()) + len(self.recent),
+            "routes": dict(self.dropped),
+        }
+
+def install(application, callback_route):
+    """Pasang flood control di depan semua handler; objeknya di bot_data["flood"]
+
+    Group -1 tidak ikut dihitung compute_allowed_updates, jadi TypeHandler(Update)
+    ini tidak membuka langganan ke semua jenis update.
+    """
+    flood = application.bot_data["flood"] = FloodControl(callback_route)
+    application.add_handler(TypeHandler(Update, flood.check), group=-1)
+    return flood
@@ -0,0 +1,100 @@
+# httpserver.py
+
+import asyncio, json
+from collections import namedtuple
+
+Request = namedtuple("Request", "method path headers body")
+
+MAX_BODY = 1024 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 429: "Too Many Requests",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+def json_response(status, data):
+    return status, "application/json", json.dumps(data).encode()
+
+def text_response(status, text, content_type="text/plain; charset=utf-8"):
+    return status, content_type, text.encode()
+
+class HttpServer:
+    """HTTP/1.1 server minimal di atas asyncio, cukup untuk webhook dan endpoint internal
+
+    routes: {(method, path): async handler(Request) -> (status, content_type, body)}
+    """
+
+    def __init__(self, host, port, routes=None):
+        self.host = host
+        self.port = port
+        self.routes = dict(routes or {})
+        self._server = None
+
+    def route(self, method, path, handler):
+        self.routes[(method, path)] = handler
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        return self._server
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        method, path, _ = line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY:
+            raise ValueError("body too large")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), path.split("?", 1)[0], headers, body)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError):
+                    await self._respond(writer, *text_response(400, "bad request"), keep_alive=False)
+                    return
+                if request is None:
+                    return
+                handler = self.routes.get((request.method, request.path))
+                if handler is None:
+                    known = any(path == request.path for _, path in self.routes)
+                    response = text_response(405 if known else 404, "")
+                else:
+                    try:
+                        response = await handler(request)
+                    except Exception as e:
+                        print(f"❌ HTTP handler error {request.path}: {e}")
+                        response = text_response(500, "")
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await self._respond(writer, *response, keep_alive=keep_alive)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, content_type, body, keep_alive=True):
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
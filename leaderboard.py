@@ -0,0 +1,77 @@
+# leaderboard.py
+
+from evol import get_evol_level, get_evol_bounds
+
+TOP_N = 100
+
+class TierLeaderboards:
+    """Top-N per evol yang dimaterialisasi dari RankIndex, plus teks render-nya
+
+    Top-N sebuah evol hanya dihitung ulang (O(log n + N)) ketika perubahan
+    poin benar-benar menyentuh top-N tersebut; selebihnya cukup lookup dict.
+    """
+
+    def __init__(self, index, size=TOP_N):
+        self.index = index
+        self.size = size
+        self._top = {}
+        self._members = {}
+        self._text = {}
+
+    def top(self, level):
+        top = self._top.get(level)
+        if top is None:
+            low, high = get_evol_bounds(level)
+            top = self._top[level] = self.index.between(low, high, self.size)
+            self._members[level] = {uid for uid, _ in top}
+        return top
+
+    def render(self, level, render_fn):
+        """Teks leaderboard dari cache, render_fn(level, top) hanya saat top-N berubah"""
+        text = self._text.get(level)
+        if text is None:
+            text = self._text[level] = render_fn(level, self.top(level))
+        return text
+
+    def invalidate(self, level=None):
+        levels = list(self._top) if level is None else [level]
+        for lvl in levels:
+            self._top.pop(lvl, None)
+            self._members.pop(lvl, None)
+            self._text.pop(lvl, None)
+
+    def _touches(self, level, user_id, points):
+        top = self._top.get(level)
+        if top is None:
+            return False
+        if user_id in self._members[level]:
+            return True
+        if points is None or get_evol_level(points) != level:
+            return False
+        if len(top) < self.size:
+            return True
+        last_uid, last_points = top[-1]
+        return (-points, user_id) < (-last_points, last_uid)
+
+    def on_points_changed(self, user_id, old_points, new_points):
+        levels = {get_evol_level(new_points)}
+        if old_points is not None:
+            levels.add(get_evol_level(old_points))
+        for level in levels:
+            if self._touches(level, user_id, new_points):
+                self.invalidate(level)
+
+_boards = None
+
+def get_leaderboards():
+    global _boards
+    from rankindex import get_rank_index
+    index = get_rank_index()
+    # Index bisa ditukar oleh rebuild_rank_index; cache lama ikut dibuang
+    if _boards is None or _boards.index is not index:
+        _boards = TierLeaderboards(index)
+    return _boards
+
+def update_leaderboards(user_id, old_points, new_points):
+    if _boards is not None:
+        _boards.on_points_changed(user_id, old_points, new_points)
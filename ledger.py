@@ -0,0 +1,563 @@
+# ledger.py
+
+import asyncio, heapq, json, mmap, os, shutil, struct, threading, time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from operator import itemgetter
+from config import (LEDGER_DIR, LEDGER_FSYNC_INTERVAL, LEDGER_GROUP_MAX, LEDGER_SEGMENT_BYTES,
+    LEDGER_SNAPSHOT_INTERVAL, LEDGER_SNAPSHOT_EVENTS, LEDGER_ARCHIVE)
+from evol import np
+from usertable import numeric_id
+
+# Satu event per baris JSON: [seq, time, user_id, delta, reason, level, amount]
+# level/amount = pemakaian pool evol (klaim); event refill: amount = awal periode pool baru
+EVENT_FIELDS = ("seq", "time", "user_id", "delta", "reason", "level", "amount")
+REFILL = "refill"
+MAIN_STREAM = "main"
+ARCHIVE_DIR = "archive"
+SNAPSHOT_MAGIC = b"GXRSNAP1"
+KEEP_SNAPSHOTS = 2  # selain snapshot genesis yang tidak pernah dibuang
+TAIL_BYTES = 65536
+
+def _fsync_dir(directory):
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+def _segments(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.startswith("segment-") and name.endswith(".jsonl"))
+
+def _segment_first(path):
+    return int(os.path.basename(path)[8:-6])
+
+def _tail_seq(path, truncate=False):
+    """seq event terakhir di segmen (None kalau kosong); truncate: buang baris terpotong sisa crash"""
+    with open(path, "r+b" if truncate else "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        start = max(0, size - TAIL_BYTES)
+        f.seek(start)
+        tail = f.read()
+        end = tail.rfind(b"\n") + 1
+        if truncate and start + end < size:
+            f.truncate(start + end)
+        lines = tail[:end].splitlines()
+    return json.loads(lines[-1])[0] if lines else None
+
+def stream_names(directory=LEDGER_DIR, archive=False):
+    names = set()
+    roots = [directory] + ([os.path.join(directory, ARCHIVE_DIR)] if archive else [])
+    for root in roots:
+        if os.path.isdir(root):
+            names.update(name for name in os.listdir(root)
+                         if name != ARCHIVE_DIR and os.path.isdir(os.path.join(root, name)))
+    return sorted(names)
+
+def stream_heads(directory=LEDGER_DIR):
+    """seq terakhir yang sudah di disk per stream"""
+    heads = {}
+    for stream in stream_names(directory):
+        segments = _segments(os.path.join(directory, stream))
+        if segments:
+            seq = _tail_seq(segments[-1])
+            heads[stream] = seq if seq is not None else _segment_first(segments[-1]) - 1
+    return heads
+
+class PointsLedger:
+    """Writer ledger untuk satu stream (satu proses): append di memori, fsync per grup
+
+    append() hanya menambah baris ke buffer; sync() menulis semua baris yang
+    tertunda sekaligus lalu fsync sekali (group commit). sync() jalan tiap
+    LEDGER_FSYNC_INTERVAL, saat buffer mencapai LEDGER_GROUP_MAX, dan dari
+    flusher store sebelum row user ditulis, sehingga saldo di store tidak
+    pernah mendahului ledger (write-ahead).
+    """
+
+    def __init__(self, directory=LEDGER_DIR, stream=MAIN_STREAM, segment_bytes=LEDGER_SEGMENT_BYTES):
+        self.directory = directory
+        self.stream = stream
+        self.path = os.path.join(directory, stream)
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._buffer = []
+        self._cut = None
+        self._wakeup = None
+        self._fd = None
+        self.stats = {"syncs": 0, "synced_events": 0, "max_group": 0, "last_sync_ms": 0.0, "max_sync_ms": 0.0}
+        os.makedirs(self.path, exist_ok=True)
+        self.seq = self.synced = self._open_tail()
+
+    def _open_tail(self):
+        segments = _segments(self.path)
+        if not segments:
+            archived = _segments(os.path.join(self.directory, ARCHIVE_DIR, self.stream))
+            seq = (_tail_seq(archived[-1]) or 0) if archived else 0
+            self._open_segment(seq + 1)
+            return seq
+        seq = _tail_seq(segments[-1], truncate=True)
+        self._open(segments[-1])
+        return seq if seq is not None else self._first - 1
+
+    def _open(self, path):
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._size = os.fstat(self._fd).st_size
+        self._first = _segment_first(path)
+
+    def _open_segment(self, first):
+        self._open(os.path.join(self.path, f"segment-{first:012d}.jsonl"))
+        _fsync_dir(self.path)
+
+    def append(self, user_id, delta, reason, level=0, amount=0):
+        """Catat satu event; kembalikan seq-nya (durable setelah sync berikutnya)"""
+        with self._lock:
+            self.seq += 1
+            seq = self.seq
+            self._buffer.append(json.dumps([seq, round(time.time(), 3), user_id, delta, reason, level, amount],
+                                           separators=(",", ":")))
+            pending = len(self._buffer)
+        if pending >= LEDGER_GROUP_MAX and self._wakeup is not None:
+            self._wakeup.set()
+        return seq
+
+    def mark_cut(self):
+        """Segmen berikutnya dimulai tepat setelah seq saat ini (batas snapshot)"""
+        with self._lock:
+            self._cut = self.seq
+            return self.seq
+
+    def _write(self, lines):
+        if not lines:
+            return
+        data = ("\n".join(lines) + "\n").encode()
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+        os.fsync(self._fd)
+        self._size += len(data)
+
+    def sync(self):
+        """Tulis semua event tertunda lalu fsync sekali; kembalikan jumlah event"""
+        with self._sync_lock:
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+                last, cut, self._cut = self.seq, self._cut, None
+            if not lines and cut is None:
+                return 0
+            started = time.perf_counter()
+            first = last - len(lines) + 1
+            split = len(lines) if cut is None else cut - first + 1
+            try:
+                self._write(lines[:split])
+                if cut is not None and cut >= self._first:
+                    self._open_segment(cut + 1)
+                self._write(lines[split:])
+            except Exception:
+                # Ditulis ulang nanti; replay mengabaikan seq yang sudah pernah terbaca
+                with self._lock:
+                    self._buffer[:0] = lines
+                    if self._cut is None:
+                        self._cut = cut
+                raise
+            if self._size >= self.segment_bytes:
+                self._open_segment(last + 1)
+            self.synced = last
+            elapsed = (time.perf_counter() - started) * 1000
+            stats = self.stats
+            stats["syncs"] += 1
+            stats["synced_events"] += len(lines)
+            stats["max_group"] = max(stats["max_group"], len(lines))
+            stats["last_sync_ms"] = elapsed
+            stats["max_sync_ms"] = max(stats["max_sync_ms"], elapsed)
+            return len(lines)
+
+    def pending(self):
+        return self.seq - self.synced
+
+    async def run(self, stop_event):
+        """Background task: group commit tiap LEDGER_FSYNC_INTERVAL atau saat buffer penuh"""
+        self._wakeup = asyncio.Event()
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=LEDGER_FSYNC_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._buffer or self._cut is not None:
+                try:
+                    await asyncio.to_thread(self.sync)
+                except Exception as e:
+                    print(f"❌ Fsync ledger gagal: {e}")
+        self.sync()
+
+    def close(self):
+        self.sync()
+        os.close(self._fd)
+        self._fd = None
+
+class Snapshot:
+    """Snapshot saldo yang di-mmap: user_id numerik terurut + poin sebagai kolom int64
+
+    Lookup memakai bisect langsung di file, jadi boot tidak perlu memuat
+    seluruh saldo; user_id non-numerik ada di header JSON.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:8] != SNAPSHOT_MAGIC:
+            self._map.close()
+            raise ValueError(f"Bukan snapshot ledger: {path}")
+        (length,) = struct.unpack_from("<Q", self._map, 8)
+        self.header = json.loads(self._map[16:16 + length])
+        count = self.header["count"]
+        start = (16 + length + 7) // 8 * 8
+        self._view = memoryview(self._map)
+        self.ids = self._view[start:start + 8 * count].cast("q")
+        self.points = self._view[start + 8 * count:start + 16 * count].cast("q")
+        self.names = self.header["names"]
+        self.streams = self.header["streams"]
+        self.pool = self.header["pool"]
+        self.time = self.header["time"]
+
+    def __len__(self):
+        return len(self.ids) + len(self.names)
+
+    def get(self, user_id, default=0):
+        key = numeric_id(user_id)
+        if key is None:
+            return self.names.get(user_id, default)
+        pos = bisect_left(self.ids, key)
+        if pos < len(self.ids) and self.ids[pos] == key:
+            return self.points[pos]
+        return default
+
+    def items(self):
+        yield from zip(map(str, self.ids), self.points)
+        yield from self.names.items()
+
+    def close(self):
+        for view in (self.ids, self.points, self._view):
+            view.release()
+        self._map.close()
+
+def snapshot_paths(directory=LEDGER_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.startswith("snapshot-") and name.endswith(".bin"))
+
+def open_snapshot(directory=LEDGER_DIR, genesis=False):
+    """Snapshot terbaru (atau genesis = yang pertama) yang bisa dibaca, None kalau belum ada"""
+    paths = snapshot_paths(directory)
+    for path in (paths if genesis else reversed(paths)):
+        try:
+            return Snapshot(path)
+        except (ValueError, OSError, KeyError) as e:
+            print(f"⚠️ Snapshot {path} dilewati: {e}")
+    return None
+
+def write_snapshot(directory, items, streams, pool=None):
+    """Tulis snapshot dari iterable (user_id, points); temp file + fsync + rename"""
+    ids, points, names = array("q"), array("q"), {}
+    for user_id, value in items:
+        key = numeric_id(user_id)
+        if key is None:
+            names[user_id] = value
+        else:
+            ids.append(key)
+            points.append(value)
+    if np is not None:
+        order = np.argsort(np.frombuffer(ids, dtype=np.int64), kind="stable")
+        ids_bytes = np.frombuffer(ids, dtype=np.int64)[order].tobytes()
+        points_bytes = np.frombuffer(points, dtype=np.int64)[order].tobytes()
+    else:
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        ids_bytes = array("q", map(ids.__getitem__, order)).tobytes()
+        points_bytes = array("q", map(points.__getitem__, order)).tobytes()
+    now = time.time()
+    header = json.dumps({"time": now, "count": len(ids), "streams": streams, "pool": pool, "names": names}).encode()
+    padding = b"\0" * ((16 + len(header) + 7) // 8 * 8 - 16 - len(header))
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"snapshot-{int(now * 1000):015d}.bin")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC + struct.pack("<Q", len(header)) + header + padding)
+        f.write(ids_bytes)
+        f.write(points_bytes)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(directory)
+    return path
+
+def compact(directory, streams, archive=LEDGER_ARCHIVE):
+    """Pindahkan (atau hapus) segmen yang seluruh event-nya tercakup snapshot, buang snapshot lama"""
+    moved = 0
+    for stream, seq in streams.items():
+        segments = _segments(os.path.join(directory, stream))
+        target = os.path.join(directory, ARCHIVE_DIR, stream)
+        # Segmen tercakup kalau segmen sesudahnya dimulai paling lambat seq + 1; segmen terakhir selalu dipakai
+        for path, following in zip(segments, segments[1:]):
+            if _segment_first(following) > seq + 1:
+                break
+            if archive:
+                os.makedirs(target, exist_ok=True)
+                shutil.move(path, os.path.join(target, os.path.basename(path)))
+            else:
+                os.remove(path)
+            moved += 1
+    snapshots = snapshot_paths(directory)
+    for path in snapshots[1:-KEEP_SNAPSHOTS]:
+        os.remove(path)
+    return moved
+
+def _stream_events(directory, stream, after, archive, replay):
+    paths = _segments(os.path.join(directory, stream))
+    if archive:
+        archived = _segments(os.path.join(directory, ARCHIVE_DIR, stream))
+        live = {os.path.basename(p) for p in paths}
+        paths = sorted([p for p in archived if os.path.basename(p) not in live] + paths, key=_segment_first)
+    # Segmen yang seluruhnya <= after tidak perlu dibuka
+    while len(paths) > 1 and _segment_first(paths[1]) <= after + 1:
+        paths.pop(0)
+    last = after
+    for path in paths:
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    replay.corrupt += 1  # baris terpotong
+                    continue
+                seq = event[0]
+                if seq <= last:
+                    if seq > after:
+                        replay.duplicates += 1
+                    continue
+                if seq != last + 1:
+                    replay.gaps.append((stream, last + 1, seq - last - 1))
+                last = seq
+                yield event
+    replay.heads[stream] = last
+
+class Replay:
+    """Hasil replay ledger di atas snapshot: saldo user yang tersentuh, pemakaian pool, ringkasan"""
+
+    def __init__(self, snapshot=None):
+        self.snapshot = snapshot
+        self.balances = {}
+        pool = snapshot.pool if snapshot is not None and snapshot.pool else {}
+        self.pool_used = {int(level): used for level, used in pool.get("used", {}).items()}
+        self.period_start = pool.get("period_start")
+        self.events = 0
+        self.counts = Counter()
+        self.totals = Counter()
+        self.heads = {}
+        self.gaps = []  # (stream, seq pertama yang hilang, jumlah)
+        self.duplicates = 0
+        self.corrupt = 0
+
+    def apply(self, event):
+        seq, when, user_id, delta, reason, level, amount = event
+        self.events += 1
+        self.counts[reason] += 1
+        if reason == REFILL:
+            self.pool_used = dict.fromkeys(self.pool_used, 0)
+            self.period_start = amount
+            return
+        self.totals[reason] += delta
+        balance = self.balances.get(user_id)
+        if balance is None:
+            balance = self.snapshot.get(user_id) if self.snapshot is not None else 0
+        self.balances[user_id] = balance + delta
+        if level:
+            self.pool_used[level] = self.pool_used.get(level, 0) + amount
+
+    def all_balances(self):
+        """Saldo semua user: isi snapshot ditimpa saldo hasil replay"""
+        balances = dict(self.snapshot.items()) if self.snapshot is not None else {}
+        balances.update(self.balances)
+        return balances
+
+def replay(directory=LEDGER_DIR, snapshot=None, full=False):
+    """Replay event setelah snapshot (full: dari snapshot genesis, termasuk segmen di archive/)"""
+    result = Replay(snapshot)
+    after = snapshot.streams if snapshot is not None else {}
+    streams = [_stream_events(directory, stream, after.get(stream, 0), full, result)
+               for stream in stream_names(directory, archive=full)]
+    # Urut waktu antar stream supaya refill pool jatuh di tempat yang benar
+    for event in heapq.merge(*streams, key=itemgetter(1)):
+        result.apply(event)
+    return result
+
+async def take_snapshot(ledger, store, pool=None):
+    """Snapshot saldo semua user pada seq ledger saat ini, lalu compaction
+
+    Dipanggil di event loop: potongan seq dan salinan saldo diambil tanpa
+    await di antaranya, jadi tidak ada kredit yang terselip.
+    """
+    seq = ledger.mark_cut()
+    if hasattr(store, "points_items"):
+        items = store.points_items()
+    else:
+        items = [(uid, user.get("points", 0)) for uid, user in store.scan()]
+    pool_state = pool.state() if pool is not None else None
+    streams = dict(stream_heads(ledger.directory), **{ledger.stream: seq})
+    await asyncio.to_thread(ledger.sync)
+    path = await asyncio.to_thread(write_snapshot, ledger.directory, items, streams, pool_state)
+    await asyncio.to_thread(compact, ledger.directory, streams)
+    return path
+
+async def restore(ledger, store, pool=None, repair=True):
+    """Saat boot: snapshot terbaru + replay ekor ledger, samakan saldo store dan pemakaian pool
+
+    Tanpa snapshot (ledger baru diaktifkan) saldo store saat ini dicatat
+    sebagai snapshot genesis. repair=False hanya melaporkan selisih.
+    """
+    snapshot = open_snapshot(ledger.directory)
+    if snapshot is None:
+        path = await take_snapshot(ledger, store, pool)
+        print(f"📒 Snapshot genesis ledger: {os.path.basename(path)}")
+        return {}
+    started = time.perf_counter()
+    try:
+        result = await asyncio.to_thread(replay, ledger.directory, snapshot)
+    finally:
+        snapshot.close()
+    mismatched = {uid: balance for uid, balance in result.balances.items()
+                  if (store.get(uid) or {}).get("points", 0) != balance}
+    if repair:
+        for uid, balance in mismatched.items():
+            store.update(uid, points=balance)
+        if pool is not None and result.period_start is not None:
+            pool.restore(result.pool_used, result.period_start)
+    print(f"📒 Ledger: {result.events:,} event di-replay, {len(mismatched)} saldo "
+          f"{'diperbaiki' if repair else 'berbeda'} ({time.perf_counter() - started:.2f} s)")
+    return mismatched
+
+async def run_snapshots(stop_event, interval=LEDGER_SNAPSHOT_INTERVAL, events=LEDGER_SNAPSHOT_EVENTS):
+    """Background task: snapshot + compaction tiap interval detik atau setelah events event baru"""
+    from store import get_store
+    from pool import get_pool
+    ledger = get_ledger()
+    last_seq, last_time = ledger.seq, time.monotonic()
+    while not stop_event.is_set():
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=min(10.0, interval))
+        except asyncio.TimeoutError:
+            pass
+        if stop_event.is_set() or ledger.seq == last_seq:
+            continue
+        if ledger.seq - last_seq < events and time.monotonic() - last_time < interval:
+            continue
+        started = time.perf_counter()
+        try:
+            path = await take_snapshot(ledger, get_store(), get_pool())
+        except Exception as e:
+            print(f"❌ Snapshot ledger gagal: {e}")
+            continue
+        last_seq, last_time = ledger.seq, time.monotonic()
+        print(f"📸 Snapshot ledger {os.path.basename(path)} ({time.perf_counter() - started:.2f} s)")
+
+_ledger = None
+
+def init_ledger(stream=MAIN_STREAM, directory=LEDGER_DIR):
+    global _ledger
+    _ledger = PointsLedger(directory, stream)
+    return _ledger
+
+def get_ledger():
+    return _ledger
+
+def record(user_id, delta, reason, pool=None):
+    # Tanpa ledger aktif (LEDGER_ENABLED mati, skrip offline) kredit tidak dicatat
+    if _ledger is not None:
+        _ledger.append(user_id, delta, reason, *(pool or (0, 0)))
+
+def record_refill(period_start):
+    record("", 0, REFILL, (0, period_start))
+
+def audit(directory=LEDGER_DIR, full=False, limit=10):
+    """Bangun ulang saldo + pool dari ledger lalu bandingkan dengan users.db dan pool.json"""
+    from store import SqliteUserStore
+    from pool import PoolLedger
+    snapshot = open_snapshot(directory, genesis=full)
+    if snapshot is None:
+        print("Belum ada snapshot ledger.")
+        return False
+    ok = True
+    try:
+        result = replay(directory, snapshot, full)
+        print(f"Snapshot : {os.path.basename(snapshot.path)} ({len(snapshot):,} user)")
+        print(f"Event    : {result.events:,} ({', '.join(f'{r} {c:,}' for r, c in result.counts.items()) or '-'})")
+        for reason, total in result.totals.items():
+            print(f"  {reason:<9}: {total:+,} poin")
+        for stream, first, count in result.gaps:
+            print(f"⚠️ {stream}: {count:,} event hilang mulai seq {first:,}")
+            ok = False
+        if result.duplicates or result.corrupt:
+            print(f"Duplikat {result.duplicates:,}, baris rusak {result.corrupt:,}")
+        store = SqliteUserStore()
+        try:
+            # Non-full: hanya user yang tersentuh sejak snapshot; full: semua user
+            expected = result.all_balances() if full else result.balances
+            actual = {uid: user.get("points", 0) for uid, user in store.scan()} if full else \
+                {uid: (store.get(uid) or {}).get("points", 0) for uid in expected}
+        finally:
+            store.close()
+        diff = [(uid, expected.get(uid, 0), actual.get(uid, 0)) for uid in expected.keys() | actual.keys()
+                if expected.get(uid, 0) != actual.get(uid, 0)]
+        print(f"Saldo    : {len(expected):,} user diperiksa, {len(diff):,} berbeda")
+        for uid, want, got in sorted(diff)[:limit]:
+            print(f"  {uid}: ledger {want:,}, store {got:,}")
+        ok = ok and not diff
+        if result.period_start is not None:
+            pool = PoolLedger()
+            used = pool.usage()
+            print(f"Pool     : periode mulai {time.strftime('%Y-%m-%d %H:%M', time.localtime(result.period_start))}")
+            for level in sorted(used.keys() | result.pool_used.keys()):
+                mark = "" if used.get(level, 0) == result.pool_used.get(level, 0) else "  ⚠️"
+                print(f"  Evol {level}: ledger {result.pool_used.get(level, 0):,}, pool.json {used.get(level, 0):,}{mark}")
+    finally:
+        snapshot.close()
+    return ok
+
+if __name__ == "__main__":
+    import csv, sys
+    args = sys.argv[1:]
+    full = "--full" in args
+    args = [a for a in args if a != "--full"]
+    if args[:1] == ["audit"]:
+        sys.exit(0 if audit(full=full) else 1)
+    elif args[:1] == ["replay"] and len(args) == 2:
+        snapshot = open_snapshot(genesis=full)
+        result = replay(snapshot=snapshot, full=full)
+        with open(args[1], "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["User ID", "Points"])
+            writer.writerows(sorted(result.all_balances().items()))
+        if snapshot is not None:
+            snapshot.close()
+        print(f"✅ Saldo hasil replay ({result.events:,} event) ditulis ke {args[1]}")
+    elif args[:1] == ["snapshot"]:
+        # Bot harus berhenti: saldo dibaca langsung dari users.db dan pool.json
+        from store import SqliteUserStore
+        from pool import PoolLedger
+        store = SqliteUserStore()
+        heads = stream_heads()
+        path = write_snapshot(LEDGER_DIR, ((uid, u.get("points", 0)) for uid, u in store.scan()),
+                              heads, PoolLedger().state())
+        compact(LEDGER_DIR, heads)
+        store.close()
+        print(f"✅ Snapshot {path}")
+    else:
+        print("Gunakan: python ledger.py audit [--full] | replay OUT.csv [--full] | snapshot")
@@ -0,0 +1,264 @@
+# loopmon.py
+
+import asyncio, cProfile, os, pstats, sys, threading, time, traceback
+from collections import Counter, deque, namedtuple
+from config import (LOOP_LAG_INTERVAL, LOOP_BLOCK_THRESHOLD, LOOP_BLOCK_HISTORY, LOOP_REPORT_WINDOW,
+    PROFILE_MAX_SECONDS, PROFILE_SAMPLE_INTERVAL)
+from metrics import Histogram, instrumented
+from users import is_admin
+
+REPO = os.path.dirname(os.path.abspath(__file__)) + os.sep
+PROFILE_DIR = "data/profile"
+STACK_DEPTH = 25
+TOP_OFFENDERS = 10
+TOP_FUNCTIONS = 12
+
+Block = namedtuple("Block", "time duration handler site stack")
+
+# Frame wrapper metrics.instrumented menyimpan route dan update milik handler yang sedang jalan
+_WRAPPER_CODE = instrumented(lambda update, context: None, "").__code__
+
+def _in_repo(filename):
+    return filename.startswith(REPO) and "site-packages" not in filename
+
+def _route_of(local_vars):
+    route = local_vars.get("route")
+    if callable(route):
+        try:
+            return route(local_vars.get("update"))
+        except Exception:
+            return getattr(local_vars.get("callback"), "__name__", "?")
+    return route
+
+def describe(frame):
+    """(handler, lokasi kode repo terdalam, stack) dari frame teratas thread loop"""
+    handler = site = outermost = None
+    current = frame
+    while current is not None:
+        code = current.f_code
+        if code is _WRAPPER_CODE and handler is None:
+            handler = _route_of(current.f_locals)
+        if _in_repo(code.co_filename):
+            if site is None:
+                site = f"{os.path.basename(code.co_filename)}:{current.f_lineno} {code.co_name}"
+            outermost = code.co_name
+        current = current.f_back
+    stack = "".join(traceback.format_stack(frame, limit=STACK_DEPTH))
+    return handler or outermost or "?", site or "?", stack
+
+def collapse(frame):
+    """Stack sebagai satu baris "root;...;leaf" (format collapsed flamegraph.pl / speedscope)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class LoopMonitor:
+    """Ukur lag event loop dan catat blokade beserta handler dan stack-nya
+
+    Task sampler tidur interval detik lalu mengukur seberapa terlambat ia
+    dibangunkan. Thread watchdog memeriksa heartbeat sampler; kalau loop
+    tidak berdetak lebih dari threshold, stack thread loop diambil saat itu
+    juga, selagi kode yang memblokir masih berjalan. Kode C yang menahan GIL
+    baru tertangkap setelah selesai, jadi stack-nya bisa sudah bergeser.
+    """
+
+    def __init__(self, interval=LOOP_LAG_INTERVAL, threshold=LOOP_BLOCK_THRESHOLD, history=LOOP_BLOCK_HISTORY):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = Histogram()
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.blocked = 0
+        self.blocks = deque(maxlen=history)
+        self._heartbeat = time.monotonic()
+        self._capture = None
+        self._lock = threading.Lock()
+        self._thread_id = None
+        self._stopped = False
+
+    def _watch(self):
+        while not self._stopped:
+            time.sleep(self.threshold / 4)
+            if self._capture is not None or time.monotonic() - self._heartbeat - self.interval < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            capture = describe(frame)
+            del frame
+            with self._lock:
+                self._capture = capture
+
+    def _observe(self, lag):
+        self.lag.observe(lag)
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        with self._lock:
+            capture, self._capture = self._capture, None
+        if lag >= self.threshold:
+            handler, site, stack = capture or ("?", "?", "")
+            self.blocks.append(Block(time.time(), lag, handler, site, stack))
+            self.blocked += 1
+
+    async def run(self, stop_event):
+        """Background task: sampler lag; watchdog jalan di thread selama task ini hidup"""
+        loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped = False
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+        try:
+            while not stop_event.is_set():
+                expected = loop.time() + self.interval
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, loop.time() - expected)
+                self._heartbeat = time.monotonic()
+                self._observe(lag)
+        finally:
+            self._stopped = True
+
+    def worst(self, n=TOP_OFFENDERS, window=LOOP_REPORT_WINDOW):
+        """Blokade window detik terakhir per (handler, lokasi), urut total waktu macet"""
+        since = time.time() - window
+        groups = {}
+        for block in self.blocks:
+            if block.time < since:
+                continue
+            group = groups.get((block.handler, block.site))
+            if group is None:
+                group = groups[block.handler, block.site] = {
+                    "handler": block.handler, "site": block.site, "count": 0, "total": 0.0, "max": 0.0, "stack": ""}
+            group["count"] += 1
+            group["total"] += block.duration
+            if block.duration >= group["max"]:
+                group["max"] = block.duration
+                group["stack"] = block.stack
+        return sorted(groups.values(), key=lambda g: -g["total"])[:n]
+
+    def stats(self):
+        return {
+            "p50_ms": self.lag.quantile(0.5) * 1000,
+            "p99_ms": self.lag.quantile(0.99) * 1000,
+            "last_ms": self.last_lag * 1000,
+            "max_ms": self.max_lag * 1000,
+            "blocked": self.blocked,
+        }
+
+class Profiler:
+    """Profil sementara thread event loop: cProfile (pstats) + sampling stack (collapsed)"""
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+
+    def _sample(self, thread_id):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                self.samples[collapse(frame)] += 1
+            del frame
+
+    async def run(self, seconds):
+        """Profil semua yang jalan di thread loop selama seconds detik; kembalikan cProfile.Profile"""
+        sampler = threading.Thread(target=self._sample, args=(threading.get_ident(),), daemon=True)
+        profile = cProfile.Profile()
+        sampler.start()
+        profile.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+            self._stop.set()
+            await asyncio.to_thread(sampler.join)
+        return profile
+
+def top_functions(profile, n=TOP_FUNCTIONS):
+    """Baris ringkas fungsi dengan waktu sendiri (tottime) terbesar"""
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: -item[1][2])[:n]
+    return [f"{tt * 1000:8.1f} ms {nc:>8,} {os.path.basename(filename)}:{line} {func}"
+            for (filename, line, func), (cc, nc, tt, ct, callers) in rows]
+
+def write_profile(prefix, profile, samples):
+    """Tulis <prefix>.pstats dan <prefix>.collapsed.txt; kembalikan path keduanya"""
+    os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+    paths = [f"{prefix}.pstats", f"{prefix}.collapsed.txt"]
+    profile.dump_stats(paths[0])
+    with open(paths[1], "w") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+    return paths
+
+def lag_report(monitor):
+    """Laporan teks lengkap blokade terburuk, termasuk stack, untuk dikirim sebagai dokumen"""
+    lines = []
+    for group in monitor.worst():
+        lines.append(f"== {group['handler']} @ {group['site']}: {group['count']}x, "
+                     f"total {group['total'] * 1000:.0f} ms, maks {group['max'] * 1000:.0f} ms")
+        lines.append(group["stack"] or "(stack tidak tertangkap)")
+    return "\n".join(lines) + "\n"
+
+async def show_lag(update, context):
+    if not is_admin(update):
+        await update.message.reply_text("Kamu bukan admin.")
+        return
+    monitor = context.bot_data.get("loop_monitor")
+    if monitor is None:
+        await update.message.reply_text("Monitor event loop tidak aktif.")
+        return
+    s = monitor.stats()
+    lines = [
+        "🐢 **Event loop**",
+        f"Lag p50 {s['p50_ms']:.1f} ms, p99 {s['p99_ms']:.1f} ms, maks {s['max_ms']:.1f} ms",
+        f"Macet > {monitor.threshold * 1000:.0f} ms: {s['blocked']:,}x",
+    ]
+    worst = monitor.worst()
+    if worst:
+        lines.append("\n**Terburuk** (total/maks ms, jumlah, lokasi)\n```")
+        lines += [f"{g['handler']:<16} {g['total'] * 1000:>7.0f}/{g['max'] * 1000:<6.0f} x{g['count']:<4} {g['site']}"
+                  for g in worst]
+        lines.append("```")
+    await update.message.reply_text("\n".join(lines), parse_mode='Markdown')
+    if worst and context.args and context.args[0] == "stack":
+        await update.message.reply_document(document=lag_report(monitor).encode(), filename="lag_report.txt")
+
+_profiling = False
+
+async def run_profile(update, context):
+    global _profiling
+    if not is_admin(update):
+        await update.message.reply_text("Kamu bukan admin.")
+        return
+    if _profiling:
+        await update.message.reply_text("⏳ Profil lain masih berjalan.")
+        return
+    try:
+        seconds = min(max(int(context.args[0]), 1), PROFILE_MAX_SECONDS) if context.args else 10
+    except ValueError:
+        await update.message.reply_text(f"Gunakan format: /profile [detik, maks {PROFILE_MAX_SECONDS}]")
+        return
+
+    _profiling = True
+    try:
+        status = await update.message.reply_text(f"🔬 Profiling event loop {seconds} detik...")
+        profiler = Profiler()
+        profile = await profiler.run(seconds)
+        prefix = os.path.join(PROFILE_DIR, f"profile_{int(time.time())}")
+        paths = await asyncio.to_thread(write_profile, prefix, profile, profiler.samples)
+        top = "\n".join(top_functions(profile))
+        await status.edit_text(
+            f"✅ Profil selesai: {sum(profiler.samples.values()):,} sampel stack\n"
+            f"pstats: python -m pstats / snakeviz; collapsed: flamegraph.pl / speedscope\n\n{top}")
+        try:
+            for path in paths:
+                with open(path, "rb") as f:
+                    await update.message.reply_document(document=f, filename=os.path.basename(path))
+        finally:
+            for path in paths:
+                os.remove(path)
+    finally:
+        _profiling = False
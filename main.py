@@ -1,13 +1,30 @@
 
 # main.py
 
+import asyncio
 import os
 import sys
 import time
 import signal
 from telegram.ext import Application
 from commands import register_handlers
-from config import BOT_TOKEN
+from config import (BOT_TOKEN, BOT_MODE, BOT_API_URL, BOT_WORKERS, WORKER_RANK_REFRESH, REFERRAL_SCAN_INTERVAL,
+    NOTIFY_ENABLED, METRICS_ENABLED, METRICS_LISTEN, METRICS_PORT, LEDGER_ENABLED,
+    LOOP_MONITOR_ENABLED, ANALYTICS_ENABLED, API_SCHEDULER_ENABLED)
+from store import get_store, flush_store, close_store, init_store
+from rankindex import get_rank_index, run_refresher
+from pool import get_pool, init_pool
+from refgraph import get_referral_graph, run_scanner
+from tasks import migrate_tasks_json
+from webhook import compute_allowed_updates, run_webhook
+from processor import PerUserUpdateProcessor
+from broadcast import Broadcaster
+from notify import init_notifier
+from ledger import MAIN_STREAM, get_ledger, init_ledger, record_refill, restore, run_snapshots
+from metrics import TimedRequest, metrics_server
+from loopmon import LoopMonitor
+from analytics import get_analytics, init_analytics
+from transport import ScheduledRequest, build_request
 
 # PID file untuk mencegah multiple instances
 PID_FILE = "/tmp/gxr_bot.pid"
@@ -40,31 +57,158 @@ def cleanup_pid_file():
 def signal_handler(signum, frame):
     """Handle termination signals"""
     print("\nBot sedang dihentikan...")
+    if get_ledger() is not None:
+        get_ledger().sync()
+    flush_store()
+    get_pool().flush()
+    if get_analytics() is not None:
+        get_analytics().save()
+    close_store()
     cleanup_pid_file()
     sys.exit(0)
 
+async def post_init(application):
+    """Start background tasks once the bot is running"""
+    worker = application.bot_data.get("worker")
+    if worker is not None:
+        # Worker berbagi SQLite dengan worker lain: tanpa write-behind cache, pool lewat SQLite
+        init_store(cached=False)
+        init_pool(shared=True)
+    else:
+        migrate_tasks_json()
+    store = get_store()
+    ledger = None
+    if LEDGER_ENABLED:
+        # Tiap worker menulis stream ledger sendiri; pemulihan saldo hanya di mode satu proses
+        ledger = init_ledger(MAIN_STREAM if worker is None else f"w{worker}")
+        get_pool().on_refill = record_refill
+        if worker is None:
+            await restore(ledger, store, get_pool(), repair=hasattr(store, "flush"))
+            if hasattr(store, "set_before_flush"):
+                store.set_before_flush(ledger.sync)
+    analytics = init_analytics(MAIN_STREAM if worker is None else f"w{worker}") if ANALYTICS_ENABLED else None
+    get_rank_index()
+    get_referral_graph()
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    broadcaster = application.bot_data["broadcaster"] = Broadcaster(application)
+    tasks = [loop.create_task(get_pool().run(stop_event))]
+    if LOOP_MONITOR_ENABLED:
+        monitor = application.bot_data["loop_monitor"] = LoopMonitor()
+        tasks.append(loop.create_task(monitor.run(stop_event)))
+    if ledger is not None:
+        tasks.append(loop.create_task(ledger.run(stop_event)))
+        if worker is None:
+            tasks.append(loop.create_task(run_snapshots(stop_event)))
+    if analytics is not None:
+        tasks.append(loop.create_task(analytics.run(stop_event)))
+    if worker in (None, 0):
+        # Job broadcast dari worker mana pun dikirim oleh satu proses saja
+        tasks.append(loop.create_task(broadcaster.run(stop_event)))
+        if NOTIFY_ENABLED:
+            notifier = init_notifier(application, broadcaster.bucket, shared=worker is not None)
+            await notifier.start()
+            tasks.append(loop.create_task(notifier.run(stop_event)))
+    if worker is not None:
+        tasks.append(loop.create_task(run_refresher(stop_event, WORKER_RANK_REFRESH)))
+    # Worker juga memuat ulang graf referral supaya edge dari worker lain terlihat
+    tasks.append(loop.create_task(run_scanner(stop_event, REFERRAL_SCAN_INTERVAL, reload=worker is not None)))
+    if hasattr(store, "run_flusher"):
+        tasks.append(loop.create_task(store.run_flusher()))
+    application.bot_data["stop_event"] = stop_event
+    application.bot_data["background_tasks"] = tasks
+    if METRICS_ENABLED and METRICS_PORT:
+        port = METRICS_PORT if worker is None else METRICS_PORT + 1 + worker
+        server = metrics_server(application, METRICS_LISTEN, port)
+        try:
+            await server.start()
+            application.bot_data["metrics_server"] = server
+        except OSError as e:
+            print(f"⚠️ Endpoint metrics {METRICS_LISTEN}:{port} tidak bisa dibuka: {e}")
+
+async def post_shutdown(application):
+    """Stop background tasks and flush pending writes"""
+    stop_event = application.bot_data.pop("stop_event", None)
+    if stop_event is not None:
+        stop_event.set()
+        store = get_store()
+        if hasattr(store, "stop"):
+            store.stop()
+        await asyncio.gather(*application.bot_data.pop("background_tasks", []), return_exceptions=True)
+    server = application.bot_data.pop("metrics_server", None)
+    if server is not None:
+        await server.stop()
+    flush_store()
+    get_pool().flush()
+    if get_analytics() is not None:
+        get_analytics().save()
+    if get_ledger() is not None:
+        get_ledger().close()
+
+def build_application(worker=None, request=None):
+    """Application dengan handler terdaftar; worker = index worker di mode multi-worker"""
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(PerUserUpdateProcessor())
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if BOT_API_URL:
+        builder = builder.base_url(f"{BOT_API_URL}/bot").base_file_url(f"{BOT_API_URL}/file/bot")
+    if request is not None:
+        builder = builder.get_updates_request(request)
+    else:
+        request = build_request()
+    transport = None
+    if API_SCHEDULER_ENABLED:
+        request = transport = ScheduledRequest(request)
+    builder = builder.request(TimedRequest(request) if METRICS_ENABLED else request)
+    if worker is not None:
+        # Update datang dari supervisor, bukan dari getUpdates/webhook sendiri
+        builder = builder.updater(None)
+    application = builder.build()
+    application.bot_data["worker"] = worker
+    application.bot_data["api_transport"] = transport
+    register_handlers(application)
+    return application
+
 def main():
     # Check if already running
     if check_existing_process():
         print("❌ Bot sudah berjalan! Hentikan instance lain terlebih dahulu.")
         return
     
+    # Create PID file
+    create_pid_file()
+    
+    if BOT_WORKERS > 1:
+        from supervisor import run_supervisor
+        print(f"✅ Bot GXR Airdrop is running with {BOT_WORKERS} workers...")
+        print(f"🔄 PID: {os.getpid()}")
+        try:
+            asyncio.run(run_supervisor(BOT_WORKERS))
+        finally:
+            cleanup_pid_file()
+        return
+
     # Set up signal handlers
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
-    
-    # Create PID file
-    create_pid_file()
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)  # rolling restart hanya ada di mode multi-worker
     
     try:
-        application = Application.builder().token(BOT_TOKEN).build()
-        register_handlers(application)
+        application = build_application()
         print("✅ Bot GXR Airdrop is running...")
         print(f"🔄 PID: {os.getpid()}")
-        application.run_polling(allowed_updates=["message"])
+        if BOT_MODE == "webhook":
+            asyncio.run(run_webhook(application))
+        else:
+            application.run_polling(allowed_updates=compute_allowed_updates(application))
     except Exception as e:
         print(f"❌ Error: {e}")
     finally:
+        close_store()
         cleanup_pid_file()
 
 if __name__ == "__main__":
@@ -0,0 +1,87 @@
+# media.py
+
+import json, os
+from telegram.error import BadRequest
+
+FILE_ID_PATH = "data/file_ids.json"
+# Potongan pesan BadRequest yang berarti file_id tidak berlaku lagi (huruf kecil)
+FILE_ID_ERRORS = ("wrong file identifier", "wrong remote file identifier", "file reference expired",
+    "file_id", "wrong type of the web page content")
+
+class FileIdCache:
+    """Mapping path aset -> file_id Telegram, invalid otomatis kalau file berubah"""
+
+    def __init__(self, path=FILE_ID_PATH):
+        self.path = path
+        self._entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+
+    @staticmethod
+    def _signature(asset_path):
+        st = os.stat(asset_path)
+        return [st.st_mtime_ns, st.st_size]
+
+    def lookup(self, asset_path):
+        entry = self._entries.get(asset_path)
+        if entry is None:
+            return None
+        try:
+            if entry["signature"] != self._signature(asset_path):
+                return None
+        except OSError:
+            return None
+        return entry["file_id"]
+
+    def store(self, asset_path, file_id):
+        self._entries[asset_path] = {"file_id": file_id, "signature": self._signature(asset_path)}
+        self._save()
+
+    def discard(self, asset_path):
+        if self._entries.pop(asset_path, None) is not None:
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+_cache = None
+
+def get_file_ids():
+    global _cache
+    if _cache is None:
+        _cache = FileIdCache()
+    return _cache
+
+def is_file_id_error(error):
+    message = error.message.lower()
+    return any(part in message for part in FILE_ID_ERRORS)
+
+async def send_cached_photo(send_photo, asset_path, **kwargs):
+    """Kirim foto lewat file_id kalau sudah pernah diupload, kalau belum upload sekali
+
+    send_photo adalah bound method seperti bot.send_photo atau message.reply_photo.
+    """
+    cache = get_file_ids()
+    file_id = cache.lookup(asset_path)
+    if file_id is not None:
+        try:
+            return await send_photo(photo=file_id, **kwargs)
+        except BadRequest as e:
+            # file_id kadaluarsa / bot token berganti: upload ulang. Error lain
+            # (chat tidak ada, caption terlalu panjang) tidak ada hubungannya dengan cache.
+            if not is_file_id_error(e):
+                raise
+            cache.discard(asset_path)
+    with open(asset_path, "rb") as f:
+        message = await send_photo(photo=f, **kwargs)
+    if message is not None and message.photo:
+        cache.store(asset_path, message.photo[-1].file_id)
+    return message
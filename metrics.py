@@ -0,0 +1,324 @@
+# metrics.py
+
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+from time import perf_counter
+from telegram.ext import ApplicationHandlerStop
+from telegram.request import BaseRequest
+from httpserver import HttpServer, text_response
+
+# Batas atas bucket histogram (detik), gaya Prometheus
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("storage", "render", "api")
+STORAGE, RENDER, API = range(3)
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Perkiraan kuantil: batas atas bucket tempat kuantil q jatuh"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+class RouteStats:
+    __slots__ = ("count", "errors", "latency", "phases")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.latency = Histogram()
+        self.phases = [Histogram() for _ in PHASES]
+
+class Timings:
+    """Waktu eksklusif per fase untuk satu update; fase bersarang tidak dihitung ganda"""
+    __slots__ = ("totals", "active", "mark", "thread")
+
+    def __init__(self):
+        self.totals = [0.0, 0.0, 0.0]
+        self.active = -1
+        self.mark = 0.0
+        self.thread = threading.get_ident()
+
+_current = ContextVar("handler_timings", default=None)
+routes = {}
+
+def _enter(phase):
+    timings = _current.get()
+    # Kerja di thread lain (to_thread) ikut menyalin context; abaikan supaya state tidak rusak
+    if timings is None or timings.thread != threading.get_ident():
+        return None, -1
+    now = perf_counter()
+    previous = timings.active
+    if previous >= 0:
+        timings.totals[previous] += now - timings.mark
+    timings.active = phase
+    timings.mark = now
+    return timings, previous
+
+def _exit(timings, previous):
+    if timings is None:
+        return
+    now = perf_counter()
+    timings.totals[timings.active] += now - timings.mark
+    timings.active = previous
+    timings.mark = now
+
+def timed(phase):
+    """Decorator: catat waktu fungsi (sync/async) sebagai fase phase dari update yang sedang jalan"""
+    def decorate(fn):
+        if iscoroutinefunction(fn):
+            @wraps(fn)
+            async def wrapper(*args, **kwargs):
+                timings, previous = _enter(phase)
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    _exit(timings, previous)
+        else:
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                timings, previous = _enter(phase)
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    _exit(timings, previous)
+        return wrapper
+    return decorate
+
+def record(route, elapsed, timings, failed):
+    stats = routes.get(route)
+    if stats is None:
+        stats = routes[route] = RouteStats()
+    stats.count += 1
+    if failed:
+        stats.errors += 1
+    stats.latency.observe(elapsed)
+    for histogram, value in zip(stats.phases, timings.totals):
+        histogram.observe(value)
+
+def instrumented(callback, route):
+    """Bungkus callback handler; route berupa nama atau fungsi update -> nama"""
+    @wraps(callback)
+    async def wrapper(update, context):
+        timings = Timings()
+        token = _current.set(timings)
+        started = perf_counter()
+        failed = True
+        try:
+            result = await callback(update, context)
+            failed = False
+            return result
+        except ApplicationHandlerStop:
+            failed = False
+            raise
+        finally:
+            elapsed = perf_counter() - started
+            _current.reset(token)
+            record(route(update) if callable(route) else route, elapsed, timings, failed)
+    return wrapper
+
+def instrument_handlers(application, route_names=None):
+    """Bungkus semua handler terdaftar; route_names: {callback: nama atau fungsi update -> nama}"""
+    route_names = route_names or {}
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            route = route_names.get(handler.callback)
+            if route is None:
+                commands = getattr(handler, "commands", None)
+                route = f"/{min(commands)}" if commands else handler.callback.__name__
+            handler.callback = instrumented(handler.callback, route)
+
+class TimedRequest(BaseRequest):
+    """BaseRequest pembungkus: waktu setiap panggilan Bot API masuk fase api"""
+
+    def __init__(self, request):
+        self.request = request
+
+    @property
+    def read_timeout(self):
+        return self.request.read_timeout
+
+    async def initialize(self):
+        await self.request.initialize()
+
+    async def shutdown(self):
+        await self.request.shutdown()
+
+    @timed(API)
+    async def do_request(self, *args, **kwargs):
+        return await self.request.do_request(*args, **kwargs)
+
+class TimedStore:
+    """Proxy store user: get/update/increment/scan/count masuk fase storage"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    @timed(STORAGE)
+    def get(self, user_id, default=None):
+        return self.store.get(user_id, default)
+
+    @timed(STORAGE)
+    def update(self, user_id, **fields):
+        return self.store.update(user_id, **fields)
+
+    @timed(STORAGE)
+    def increment(self, user_id, field, delta):
+        return self.store.increment(user_id, field, delta)
+
+    @timed(STORAGE)
+    def put_many(self, rows):
+        return self.store.put_many(rows)
+
+    @timed(STORAGE)
+    def count(self):
+        return self.store.count()
+
+    def scan(self, after=None):
+        rows = self.store.scan(after)
+        while True:
+            timings, previous = _enter(STORAGE)
+            try:
+                row = next(rows, None)
+            finally:
+                _exit(timings, previous)
+            if row is None:
+                return
+            yield row
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+def _histogram_lines(name, histogram, **labels):
+    cumulative = 0
+    for bound, count in zip(BUCKETS, histogram.counts):
+        cumulative += count
+        yield f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}"
+    yield f"{name}_bucket{_labels(**labels, le='+Inf')} {histogram.count}"
+    yield f"{name}_sum{_labels(**labels)} {histogram.total:.6f}"
+    yield f"{name}_count{_labels(**labels)} {histogram.count}"
+
+def render_prometheus(processor=None, flood=None, monitor=None, transport=None):
+    """Semua metrik dalam format teks Prometheus 0.0.4"""
+    lines = [
+        "# HELP gxr_handler_updates_total Updates handled per route",
+        "# TYPE gxr_handler_updates_total counter",
+    ]
+    items = sorted(routes.items())
+    lines += [f"gxr_handler_updates_total{_labels(route=r)} {s.count}" for r, s in items]
+    lines += [
+        "# HELP gxr_handler_errors_total Handler exceptions per route",
+        "# TYPE gxr_handler_errors_total counter",
+    ]
+    lines += [f"gxr_handler_errors_total{_labels(route=r)} {s.errors}" for r, s in items]
+    lines += [
+        "# HELP gxr_handler_seconds Handler latency per route",
+        "# TYPE gxr_handler_seconds histogram",
+    ]
+    for route, stats in items:
+        lines += _histogram_lines("gxr_handler_seconds", stats.latency, route=route)
+    lines += [
+        "# HELP gxr_handler_phase_seconds Time per update spent in storage, render and Telegram API",
+        "# TYPE gxr_handler_phase_seconds histogram",
+    ]
+    for route, stats in items:
+        for phase, histogram in zip(PHASES, stats.phases):
+            lines += _histogram_lines("gxr_handler_phase_seconds", histogram, route=route, phase=phase)
+    if processor is not None and hasattr(processor, "stats"):
+        s = processor.stats()
+        lines += [
+            "# TYPE gxr_updates_running gauge", f"gxr_updates_running {s['running']}",
+            "# TYPE gxr_updates_waiting gauge", f"gxr_updates_waiting {s['waiting']}",
+        ]
+    if flood is not None:
+        lines += [
+            "# HELP gxr_flood_dropped_total Updates dropped by per-user flood control",
+            "# TYPE gxr_flood_dropped_total counter",
+        ]
+        lines += [f"gxr_flood_dropped_total{_labels(route=route, reason=reason)} {count}"
+                  for (route, reason), count in sorted(flood.dropped.items())]
+        lines += ["# TYPE gxr_flood_tracked_keys gauge", f"gxr_flood_tracked_keys {flood.stats()['tracked']}"]
+    if monitor is not None:
+        lines += [
+            "# HELP gxr_loop_lag_seconds Event loop scheduling lag",
+            "# TYPE gxr_loop_lag_seconds histogram",
+            *_histogram_lines("gxr_loop_lag_seconds", monitor.lag),
+            "# HELP gxr_loop_blocks_total Event loop stalls longer than the block threshold",
+            "# TYPE gxr_loop_blocks_total counter",
+            f"gxr_loop_blocks_total {monitor.blocked}",
+        ]
+    if transport is not None:
+        endpoints = sorted(transport.endpoints.items())
+        lines += [
+            "# HELP gxr_api_request_seconds Bot API request latency per method",
+            "# TYPE gxr_api_request_seconds histogram",
+        ]
+        for name, stats in endpoints:
+            lines += _histogram_lines("gxr_api_request_seconds", stats.latency, method=name)
+        lines += [
+            "# HELP gxr_api_queue_seconds Time a Bot API request waited for a transport slot",
+            "# TYPE gxr_api_queue_seconds histogram",
+        ]
+        for name, stats in endpoints:
+            lines += _histogram_lines("gxr_api_queue_seconds", stats.wait, method=name)
+        lines += ["# TYPE gxr_api_errors_total counter"]
+        lines += [f"gxr_api_errors_total{_labels(method=name)} {s.errors}" for name, s in endpoints]
+        lines += ["# HELP gxr_api_coalesced_total Queued message edits replaced by a newer edit",
+                  "# TYPE gxr_api_coalesced_total counter"]
+        lines += [f"gxr_api_coalesced_total{_labels(method=name)} {s.coalesced}" for name, s in endpoints]
+        lines += ["# TYPE gxr_api_inflight gauge"]
+        lines += [f"gxr_api_inflight{_labels(method=name)} {s.inflight}" for name, s in endpoints]
+        lines += ["# TYPE gxr_api_waiting gauge"]
+        lines += [f"gxr_api_waiting{_labels(priority=p)} {n}" for p, n in transport.waiting().items()]
+    return "\n".join(lines) + "\n"
+
+def summary():
+    """Ringkasan per route untuk /stats, urut dari yang paling sering dipanggil"""
+    rows = []
+    for route, stats in sorted(routes.items(), key=lambda item: -item[1].count):
+        count = stats.count or 1
+        rows.append({
+            "route": route,
+            "count": stats.count,
+            "errors": stats.errors,
+            "p50_ms": stats.latency.quantile(0.5) * 1000,
+            "p99_ms": stats.latency.quantile(0.99) * 1000,
+            **{f"{phase}_ms": h.total / count * 1000 for phase, h in zip(PHASES, stats.phases)},
+        })
+        # Sisa waktu di luar tiga fase: dispatch PTB, logika handler, dsb.
+        phases = sum(h.total for h in stats.phases)
+        rows[-1]["other_ms"] = max(0.0, stats.latency.total - phases) / count * 1000
+    return rows
+
+def metrics_server(application, host, port):
+    """Endpoint GET /metrics untuk Prometheus"""
+    async def handle(request):
+        body = render_prometheus(application.update_processor, application.bot_data.get("flood"),
+                                 application.bot_data.get("loop_monitor"), application.bot_data.get("api_transport"))
+        return text_response(200, body, "text/plain; version=0.0.4; charset=utf-8")
+    server = HttpServer(host, port)
+    server.route("GET", "/metrics", handle)
+    return server
@@ -0,0 +1,246 @@
+# notify.py
+
+import asyncio, math, os, sqlite3, time
+from array import array
+from collections import deque
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from config import (CLAIM_INTERVAL_HOURS, CLAIM_REWARD, BROADCAST_MAX_RETRIES, NOTIFY_RESOLUTION,
+    NOTIFY_CONCURRENCY, NOTIFY_SYNC_INTERVAL, NOTIFY_SYNC_OVERLAP, NOTIFY_CHECKPOINT_INTERVAL)
+from router import callback_data
+from store import DB_PATH, get_store
+from transport import bulk
+
+BOX_READY_TEXT = f"📦 Box farming kamu sudah penuh! Klaim {CLAIM_REWARD} poin sekarang."
+BOX_READY_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("💎 Claim Reward", callback_data=callback_data("claim"))],
+    [InlineKeyboardButton("🚜 Farming", callback_data=callback_data("farming"))],
+])
+
+async def yield_to_interactive(application):
+    """Tahan sebentar selama masih ada update interaktif yang menunggu diproses"""
+    processor = application.update_processor
+    for _ in range(20):
+        if getattr(processor, "waiting", 0) == 0:
+            return
+        await asyncio.sleep(0.05)
+
+async def send_bulk(application, bucket, chat_id, text, **kwargs):
+    """Kirim satu pesan non-interaktif lewat bucket; kembalikan 'sent', 'blocked' atau 'failed'"""
+    for attempt in range(BROADCAST_MAX_RETRIES + 1):
+        await yield_to_interactive(application)
+        await bucket.acquire()
+        try:
+            with bulk():
+                await application.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+            return "sent"
+        except RetryAfter as e:
+            bucket.pause(e.retry_after)
+        except Forbidden:
+            return "blocked"
+        except BadRequest:
+            return "failed"
+        except NetworkError:
+            await asyncio.sleep(2 ** attempt)
+    return "failed"
+
+class TimerWheel:
+    """Timing wheel dengan slot per tick (resolution detik), isi slot array('q') user id
+
+    Slot dikunci nomor tick absolut, jadi tidak ada putaran atau cascade:
+    schedule O(1), advance O(tick yang lewat), dan memori per user terjadwal
+    8 byte ditambah overhead per slot yang terisi. Tidak ada pembatalan;
+    entri yang sudah basi disaring pemanggil saat slotnya jatuh tempo.
+    """
+
+    def __init__(self, resolution=NOTIFY_RESOLUTION, start=None):
+        self.resolution = resolution
+        self._slots = {}
+        self._next = self._tick(start if start is not None else time.time())
+        self.size = 0
+
+    def _tick(self, when):
+        return math.ceil(when / self.resolution)
+
+    def __len__(self):
+        return self.size
+
+    def schedule(self, when, user_id):
+        # Tick yang sudah lewat jatuh ke slot berikutnya (langsung jatuh tempo)
+        tick = max(self._tick(when), self._next)
+        slot = self._slots.get(tick)
+        if slot is None:
+            slot = self._slots[tick] = array("q")
+        slot.append(user_id)
+        self.size += 1
+
+    def advance(self, now):
+        """Slot yang jatuh tempo sampai now (list array user id)"""
+        last = math.floor(now / self.resolution)
+        if last < self._next:
+            return []
+        if last - self._next > len(self._slots):
+            ticks = sorted(tick for tick in self._slots if tick <= last)
+        else:
+            ticks = range(self._next, last + 1)
+        due = []
+        for tick in ticks:
+            slot = self._slots.pop(tick, None)
+            if slot is not None:
+                self.size -= len(slot)
+                due.append(slot)
+        self._next = last + 1
+        return due
+
+    @property
+    def fired_until(self):
+        return (self._next - 1) * self.resolution
+
+class BoxNotifier:
+    """Push "box penuh" tepat saat CLAIM_INTERVAL_HOURS sejak klaim terakhir lewat
+
+    Jadwal dibangun dari last_claim di store (range scan index) saat start,
+    mulai dari waktu terakhir yang sudah selesai dikirim (tabel notify_state),
+    lalu ditambah setiap klaim. Mode multi-worker: klaim di worker lain dibaca
+    dari SQLite tiap NOTIFY_SYNC_INTERVAL. Pengiriman memakai token bucket
+    broadcast supaya total pesan bulk tetap di bawah batas global Telegram.
+    """
+
+    def __init__(self, application, bucket, interval=CLAIM_INTERVAL_HOURS * 3600, path=DB_PATH, shared=False):
+        self.application = application
+        self.bucket = bucket
+        self.interval = interval
+        self.shared = shared
+        self.wheel = None
+        self._due = deque()
+        self._ready = asyncio.Event()
+        self._inflight = 0
+        self._watermark = 0.0
+        self.stats = {"scheduled": 0, "sent": 0, "stale": 0, "blocked": 0, "failed": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS notify_state (id INTEGER PRIMARY KEY, fired_until REAL NOT NULL)")
+
+    def _load_cursor(self):
+        row = self._conn.execute("SELECT fired_until FROM notify_state WHERE id = 0").fetchone()
+        return row[0] if row else None
+
+    def _save_cursor(self, fired_until):
+        self._conn.execute(
+            "INSERT INTO notify_state (id, fired_until) VALUES (0, ?) "
+            "ON CONFLICT(id) DO UPDATE SET fired_until = excluded.fired_until", (fired_until,))
+
+    def _claims_since(self, since):
+        return [(int(uid), last) for uid, last in get_store().claimed_since(since) if uid.isdigit()]
+
+    def _rebuild(self):
+        # Deploy pertama: box yang sudah penuh sebelum notifier ada tidak di-push massal
+        fired_until = self._load_cursor() or time.time()
+        wheel = TimerWheel(start=fired_until)
+        watermark = fired_until - self.interval
+        for user_id, last_claim in get_store().claimed_since(watermark):
+            if user_id.isdigit():
+                wheel.schedule(last_claim + self.interval, int(user_id))
+            watermark = max(watermark, last_claim)
+        return wheel, watermark
+
+    async def start(self):
+        """Bangun wheel dari store; dipanggil sebelum update mulai diproses"""
+        started = time.perf_counter()
+        self.wheel, self._watermark = await asyncio.to_thread(self._rebuild)
+        self.stats["scheduled"] += len(self.wheel)
+        print(f"⏰ {len(self.wheel):,} notifikasi box dijadwalkan ({time.perf_counter() - started:.2f} s)")
+
+    def schedule(self, user_id, last_claim):
+        if self.wheel is not None and user_id.isdigit():
+            self.wheel.schedule(last_claim + self.interval, int(user_id))
+            self.stats["scheduled"] += 1
+
+    async def _sync(self):
+        # Overlap: klaim worker lain yang commit sedikit terlambat tetap terbaca
+        claims = await asyncio.to_thread(self._claims_since, self._watermark - NOTIFY_SYNC_OVERLAP)
+        for user_id, last_claim in claims:
+            self.wheel.schedule(last_claim + self.interval, user_id)
+            self._watermark = max(self._watermark, last_claim)
+        self.stats["scheduled"] += len(claims)
+
+    async def _notify(self, user_id):
+        user = get_store().get(str(user_id)) or {}
+        if user.get("last_claim", 0) + self.interval > time.time():
+            return "stale"  # sudah klaim lagi sejak dijadwalkan
+        return await send_bulk(self.application, self.bucket, user_id, BOX_READY_TEXT, reply_markup=BOX_READY_MARKUP)
+
+    async def _sender(self, stop_event):
+        while not stop_event.is_set():
+            if not self._due:
+                self._ready.clear()
+                waiter = asyncio.create_task(self._ready.wait())
+                stopper = asyncio.create_task(stop_event.wait())
+                await asyncio.wait({waiter, stopper}, return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                stopper.cancel()
+                continue
+            batch = self._due[0]
+            user_id = batch.pop()
+            if not batch:
+                self._due.popleft()
+            self._inflight += 1
+            try:
+                self.stats[await self._notify(user_id)] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"❌ Notifikasi box {user_id} gagal: {e}")
+            finally:
+                self._inflight -= 1
+
+    def _checkpoint(self):
+        # Cursor hanya maju kalau semua yang jatuh tempo sudah terkirim
+        if not self._due and not self._inflight:
+            self._save_cursor(self.wheel.fired_until)
+
+    async def run(self, stop_event):
+        """Background task: majukan wheel tiap NOTIFY_RESOLUTION, kirim batch yang jatuh tempo"""
+        senders = [asyncio.create_task(self._sender(stop_event)) for _ in range(NOTIFY_CONCURRENCY)]
+        last_sync = last_checkpoint = time.monotonic()
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=self.wheel.resolution)
+            except asyncio.TimeoutError:
+                pass
+            for slot in self.wheel.advance(time.time()):
+                # Klaim yang terbaca dua kali (sync overlap) ada di tick yang sama
+                self._due.append(array("q", set(slot)))
+            if self._due:
+                self._ready.set()
+            now = time.monotonic()
+            if self.shared and now - last_sync >= NOTIFY_SYNC_INTERVAL:
+                last_sync = now
+                try:
+                    await self._sync()
+                except Exception as e:
+                    print(f"❌ Sync jadwal notifikasi gagal: {e}")
+            if now - last_checkpoint >= NOTIFY_CHECKPOINT_INTERVAL:
+                last_checkpoint = now
+                self._checkpoint()
+        await asyncio.gather(*senders, return_exceptions=True)
+        self._checkpoint()
+        self._conn.close()
+
+    def pending(self):
+        return len(self.wheel or ()) + sum(len(batch) for batch in self._due)
+
+_notifier = None
+
+def init_notifier(application, bucket, shared=False):
+    global _notifier
+    _notifier = BoxNotifier(application, bucket, shared=shared)
+    return _notifier
+
+def get_notifier():
+    return _notifier
+
+def schedule_box(user_id, last_claim):
+    # Hanya proses yang menjalankan notifier yang menjadwalkan langsung
+    if _notifier is not None:
+        _notifier.schedule(user_id, last_claim)
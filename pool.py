@@ -1,17 +1,254 @@
 # pool.py
 
-from config import POOL_PER_EVOL
+import asyncio, json, os, sqlite3, threading, time
+from config import POOL_PER_EVOL, POOL_REFILL_HOURS, POOL_FLUSH_INTERVAL
+from store import DB_PATH
 
-# Simulasi memori, bisa pakai file kalau mau persistent
-evol_pool_used = {name: 0 for name in POOL_PER_EVOL.keys()}
+POOL_PATH = "data/pool.json"
 
-def check_and_reduce_pool(evol_name, amount):
-    # Deteksi level dari nama
-    for i in range(1, 8):
-        if f"Evol {i}" in evol_name:
-            if evol_pool_used[i] + amount > POOL_PER_EVOL[i]:
+class PoolLedger:
+    """Pemakaian pool per evol: reserve/commit/rollback di memori, disimpan per batch
+
+    Semua operasi O(1); refill dicek malas saat reserve sehingga restart
+    tidak perlu me-replay histori apa pun.
+    """
+
+    def __init__(self, caps=POOL_PER_EVOL, path=POOL_PATH, refill_hours=POOL_REFILL_HOURS):
+        self.caps = dict(caps)
+        self.path = path
+        self.refill_seconds = refill_hours * 3600 if refill_hours else None
+        self._lock = threading.Lock()
+        self._used = {level: 0 for level in self.caps}
+        self._reserved = {level: 0 for level in self.caps}
+        self._period_start = time.time()
+        self._dirty = False
+        self.on_refill = None  # dipanggil dengan awal periode baru (ledger poin)
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        for level, used in data.get("used", {}).items():
+            if int(level) in self._used:
+                self._used[int(level)] = used
+        self._period_start = data.get("period_start", self._period_start)
+
+    def next_refill(self):
+        if self.refill_seconds is None:
+            return None
+        return self._period_start + self.refill_seconds
+
+    def _refill_if_due(self, now):
+        due = self.next_refill()
+        if due is None or now < due:
+            return False
+        # Lompat ke periode yang sedang berjalan walau bot mati beberapa periode
+        periods = int((now - self._period_start) // self.refill_seconds)
+        self._period_start += periods * self.refill_seconds
+        for level in self._used:
+            self._used[level] = 0
+        self._dirty = True
+        if self.on_refill is not None:
+            self.on_refill(self._period_start)
+        return True
+
+    def refill_if_due(self, now=None):
+        with self._lock:
+            return self._refill_if_due(now or time.time())
+
+    def reserve(self, level, amount):
+        """Pesan amount dari pool evol; False kalau pool tidak cukup"""
+        with self._lock:
+            self._refill_if_due(time.time())
+            if level not in self.caps:
+                return False
+            if self._used[level] + self._reserved[level] + amount > self.caps[level]:
+                return False
+            self._reserved[level] += amount
+            return True
+
+    def commit(self, level, amount):
+        with self._lock:
+            self._reserved[level] -= amount
+            self._used[level] += amount
+            self._dirty = True
+
+    def rollback(self, level, amount):
+        with self._lock:
+            self._reserved[level] -= amount
+
+    def remaining(self, level):
+        with self._lock:
+            return self.caps[level] - self._used[level] - self._reserved[level]
+
+    def usage(self):
+        with self._lock:
+            return dict(self._used)
+
+    def state(self):
+        return {"used": self.usage(), "period_start": self._period_start}
+
+    def restore(self, used, period_start):
+        """Pakai pemakaian hasil replay ledger; pemakaian periode yang sama tidak pernah turun"""
+        with self._lock:
+            if period_start < self._period_start:
                 return False
-            evol_pool_used[i] += amount
+            if period_start > self._period_start:
+                self._period_start = period_start
+                self._used = {level: 0 for level in self.caps}
+            for level, amount in used.items():
+                if level in self._used:
+                    self._used[level] = max(self._used[level], amount)
+            self._dirty = True
             return True
-    return False
-  
+
+    def flush(self):
+        """Simpan pemakaian pool (temp file + fsync + rename) kalau ada perubahan"""
+        with self._lock:
+            if not self._dirty:
+                return False
+            data = {"used": dict(self._used), "period_start": self._period_start}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            with self._lock:
+                self._dirty = True
+            raise
+        return True
+
+    async def run(self, stop_event):
+        """Background task: flush berkala dan jalankan refill tepat waktu"""
+        while not stop_event.is_set():
+            timeout = POOL_FLUSH_INTERVAL
+            due = self.next_refill()
+            if due is not None:
+                timeout = max(0.0, min(timeout, due - time.time()))
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            if self.refill_if_due():
+                print("🔄 Pool evol di-refill")
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"❌ Gagal menyimpan pool: {e}")
+        self.flush()
+
+class SharedPoolLedger(PoolLedger):
+    """Pemakaian pool di SQLite (file yang sama dengan store user) untuk mode multi-worker
+
+    reserve langsung memotong pool dengan UPDATE bersyarat yang atomik antar
+    proses, rollback mengembalikannya, dan commit tidak perlu apa-apa.
+    Pemakaian dari pool.json diimpor sekali saat tabel pertama kali dibuat.
+    """
+
+    def __init__(self, caps=POOL_PER_EVOL, path=DB_PATH, json_path=POOL_PATH, refill_hours=POOL_REFILL_HOURS):
+        self.caps = dict(caps)
+        self.path = path
+        self.refill_seconds = refill_hours * 3600 if refill_hours else None
+        self._lock = threading.Lock()
+        self.on_refill = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            created = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pool'").fetchone() is None
+            self._conn.execute("CREATE TABLE IF NOT EXISTS pool (level INTEGER PRIMARY KEY, used INTEGER NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS pool_period (id INTEGER PRIMARY KEY, start REAL NOT NULL)")
+            ledger = PoolLedger(caps, json_path, refill_hours) if created else None
+            for level in self.caps:
+                used = ledger._used[level] if ledger else 0
+                self._conn.execute("INSERT OR IGNORE INTO pool (level, used) VALUES (?, ?)", (level, used))
+            start = ledger._period_start if ledger else time.time()
+            self._conn.execute("INSERT OR IGNORE INTO pool_period (id, start) VALUES (0, ?)", (start,))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._period_start = self._conn.execute("SELECT start FROM pool_period WHERE id = 0").fetchone()[0]
+
+    def _refill_if_due(self, now):
+        due = self.next_refill()
+        if due is None or now < due:
+            return False
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Proses lain mungkin sudah me-refill periode ini
+            start = self._conn.execute("SELECT start FROM pool_period WHERE id = 0").fetchone()[0]
+            refilled = now >= start + self.refill_seconds
+            if refilled:
+                start += int((now - start) // self.refill_seconds) * self.refill_seconds
+                self._conn.execute("UPDATE pool_period SET start = ? WHERE id = 0", (start,))
+                self._conn.execute("UPDATE pool SET used = 0")
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._period_start = start
+        if refilled and self.on_refill is not None:
+            self.on_refill(start)
+        return refilled
+
+    def reserve(self, level, amount):
+        with self._lock:
+            self._refill_if_due(time.time())
+            if level not in self.caps:
+                return False
+            cursor = self._conn.execute(
+                "UPDATE pool SET used = used + ? WHERE level = ? AND used + ? <= ?",
+                (amount, level, amount, self.caps[level]))
+            return cursor.rowcount == 1
+
+    def commit(self, level, amount):
+        pass
+
+    def rollback(self, level, amount):
+        with self._lock:
+            self._conn.execute("UPDATE pool SET used = used - ? WHERE level = ?", (amount, level))
+
+    def remaining(self, level):
+        return self.caps[level] - self.usage()[level]
+
+    def usage(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT level, used FROM pool").fetchall())
+
+    def flush(self):
+        return False
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_ledger = None
+
+def get_pool():
+    global _ledger
+    if _ledger is None:
+        _ledger = PoolLedger()
+    return _ledger
+
+def init_pool(shared=False):
+    """Pilih ledger global; shared=True untuk worker yang berbagi pool lewat SQLite"""
+    global _ledger
+    _ledger = SharedPoolLedger() if shared else PoolLedger()
+    return _ledger
+
+def check_and_reduce_pool(evol_level, amount):
+    pool = get_pool()
+    if not pool.reserve(evol_level, amount):
+        return False
+    pool.commit(evol_level, amount)
+    return True
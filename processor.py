@@ -0,0 +1,117 @@
+# processor.py
+
+import asyncio, time
+from contextlib import nullcontext
+from telegram.ext import BaseUpdateProcessor
+from config import UPDATE_CONCURRENCY, UPDATE_MAX_PENDING
+
+def update_key(update):
+    """Kunci serialisasi: user_id, atau chat_id kalau update tidak punya user"""
+    user = getattr(update, "effective_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(update, "effective_chat", None)
+    return chat.id if chat is not None else None
+
+def raw_update_key(data):
+    """Sama seperti update_key, tetapi untuk update JSON mentah dari Bot API"""
+    for name, value in data.items():
+        if name == "update_id" or not isinstance(value, dict):
+            continue
+        for field in ("from", "user", "chat"):
+            entity = value.get(field)
+            if isinstance(entity, dict) and "id" in entity:
+                return entity["id"]
+        return None
+    return None
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Proses update secara konkuren antar user, tetapi berurutan untuk user yang sama
+
+    Semaphore bawaan BaseUpdateProcessor membatasi jumlah update yang
+    sedang menunggu (max_pending); batas eksekusi global (concurrency)
+    baru diambil setelah lock user didapat, jadi user yang spam tidak
+    memakan slot eksekusi milik user lain. Update yang oleh classify
+    dimasukkan ke lane (add_lane) mengambil slot lane itu dulu, baru slot
+    global: route yang mahal tidak menghabiskan slot milik layar yang murah,
+    dan total eksekusi tetap tidak melewati concurrency.
+    """
+
+    def __init__(self, concurrency=UPDATE_CONCURRENCY, max_pending=UPDATE_MAX_PENDING):
+        super().__init__(max_pending)
+        self.concurrency = concurrency
+        self._slots = asyncio.BoundedSemaphore(concurrency)
+        self._lanes = {}
+        self.classify = None
+        self._locks = {}
+        self.waiting = 0
+        self.running = 0
+        self._stats = {"processed": 0, "failed": 0, "wait_total": 0.0, "wait_max": 0.0}
+
+    def add_lane(self, name, concurrency):
+        self._lanes[name] = asyncio.BoundedSemaphore(concurrency)
+
+    async def do_process_update(self, update, coroutine):
+        key = update_key(update)
+        lane = None
+        if self.classify is not None and self._lanes:
+            lane = self._lanes.get(self.classify(update))
+        queued = time.perf_counter()
+        entry = None
+        if key is not None:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+        self.waiting += 1
+        started = False
+        try:
+            if entry is not None:
+                await entry[0].acquire()
+            try:
+                async with lane or nullcontext(), self._slots:
+                    started = True
+                    self.waiting -= 1
+                    wait = time.perf_counter() - queued
+                    self._stats["wait_total"] += wait
+                    self._stats["wait_max"] = max(self._stats["wait_max"], wait)
+                    self.running += 1
+                    try:
+                        await coroutine
+                    except Exception:
+                        self._stats["failed"] += 1
+                        raise
+                    else:
+                        self._stats["processed"] += 1
+                    finally:
+                        self.running -= 1
+            finally:
+                if entry is not None:
+                    entry[0].release()
+        finally:
+            if not started:
+                self.waiting -= 1
+                coroutine.close()
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def stats(self):
+        done = self._stats["processed"] + self._stats["failed"]
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "waiting": self.waiting,
+            "keys": len(self._locks),
+            "processed": self._stats["processed"],
+            "failed": self._stats["failed"],
+            "wait_avg_ms": self._stats["wait_total"] / done * 1000 if done else 0.0,
+            "wait_max_ms": self._stats["wait_max"] * 1000,
+        }
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
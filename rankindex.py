@@ -0,0 +1,222 @@
+# rankindex.py
+
+import asyncio
+from bisect import bisect_left, insort
+from operator import neg
+
+BUCKET_SIZE = 1000
+
+class RankIndex:
+    """Global rank index: bucketed sorted list of (-points, user_id)
+
+    Bucket sizes live in a Fenwick tree, so rank-of-user and
+    user-at-rank are both O(log n).
+    """
+
+    def __init__(self, bucket_size=BUCKET_SIZE):
+        self.bucket_size = bucket_size
+        self._points = {}
+        self._buckets = []
+        self._maxes = []
+        self._tree = []
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, user_id):
+        return user_id in self._points
+
+    def build(self, items):
+        """Bulk load dari iterable (user_id, points)"""
+        self._points = dict(items)
+        keys = sorted(zip(map(neg, self._points.values()), self._points))
+        size = self.bucket_size
+        self._buckets = [keys[i:i + size] for i in range(0, len(keys), size)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._rebuild_tree()
+
+    def _rebuild_tree(self):
+        tree = [0] + [len(bucket) for bucket in self._buckets]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, pos, delta):
+        i = pos + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_prefix(self, pos):
+        # Jumlah panjang bucket [0, pos)
+        total, i = 0, pos
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _tree_find(self, index):
+        # Bucket yang memuat posisi ke-index (0-based), plus offset di dalamnya
+        pos, bit = 0, 1 << (len(self._tree) - 1).bit_length()
+        while bit:
+            nxt = pos + bit
+            if nxt < len(self._tree) and self._tree[nxt] <= index:
+                pos = nxt
+                index -= self._tree[nxt]
+            bit >>= 1
+        return pos, index
+
+    def _locate(self, key):
+        # Posisi global (0-based) elemen pertama >= key
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._buckets):
+            return len(self._points)
+        return self._tree_prefix(pos) + bisect_left(self._buckets[pos], key)
+
+    def _insert(self, key):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            self._rebuild_tree()
+            return
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._buckets):
+            pos -= 1
+        bucket = self._buckets[pos]
+        insort(bucket, key)
+        self._maxes[pos] = bucket[-1]
+        if len(bucket) > self.bucket_size * 2:
+            half = len(bucket) // 2
+            self._buckets[pos:pos + 1] = [bucket[:half], bucket[half:]]
+            self._maxes[pos:pos + 1] = [bucket[half - 1], bucket[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(pos, 1)
+
+    def _remove(self, key):
+        pos = bisect_left(self._maxes, key)
+        bucket = self._buckets[pos]
+        del bucket[bisect_left(bucket, key)]
+        if bucket:
+            self._maxes[pos] = bucket[-1]
+            self._tree_add(pos, -1)
+        else:
+            del self._buckets[pos]
+            del self._maxes[pos]
+            self._rebuild_tree()
+
+    def update(self, user_id, points):
+        old = self._points.get(user_id)
+        if old == points:
+            return
+        if old is not None:
+            self._remove((-old, user_id))
+        self._points[user_id] = points
+        self._insert((-points, user_id))
+
+    def remove(self, user_id):
+        old = self._points.pop(user_id, None)
+        if old is not None:
+            self._remove((-old, user_id))
+
+    def rank(self, user_id):
+        """Peringkat global 1-based, None kalau user belum terdaftar"""
+        points = self._points.get(user_id)
+        if points is None:
+            return None
+        key = (-points, user_id)
+        pos = bisect_left(self._maxes, key)
+        return self._tree_prefix(pos) + bisect_left(self._buckets[pos], key) + 1
+
+    def at(self, rank):
+        """(user_id, points) di peringkat 1-based tertentu"""
+        if not 1 <= rank <= len(self._points):
+            raise IndexError(rank)
+        pos, offset = self._tree_find(rank - 1)
+        neg_points, user_id = self._buckets[pos][offset]
+        return user_id, -neg_points
+
+    def top(self, count):
+        result = []
+        for bucket in self._buckets:
+            for neg_points, user_id in bucket:
+                if len(result) >= count:
+                    return result
+                result.append((user_id, -neg_points))
+        return result
+
+    def between(self, min_points, max_points=None, limit=None):
+        """(user_id, points) dengan min_points <= points < max_points, terurut turun
+
+        Poin diasumsikan integer; cost O(log n + hasil).
+        """
+        start = 0 if max_points is None else self._locate((1 - max_points,))
+        if start >= len(self._points):
+            return []
+        pos, offset = self._tree_find(start)
+        result = []
+        for i in range(pos, len(self._buckets)):
+            for neg_points, user_id in self._buckets[i][offset:]:
+                if -neg_points < min_points or (limit is not None and len(result) >= limit):
+                    return result
+                result.append((user_id, -neg_points))
+            offset = 0
+        return result
+
+    def count_between(self, min_points, max_points=None):
+        end = self._locate((1 - min_points,))
+        start = 0 if max_points is None else self._locate((1 - max_points,))
+        return end - start
+
+    def around(self, user_id, radius=2):
+        """List (rank, user_id, points) di sekitar user"""
+        rank = self.rank(user_id)
+        if rank is None:
+            return []
+        first = max(1, rank - radius)
+        last = min(len(self._points), rank + radius)
+        return [(r, *self.at(r)) for r in range(first, last + 1)]
+
+_index = None
+
+def _build_from_store():
+    from store import get_store
+    store = get_store()
+    index = RankIndex()
+    if hasattr(store, "points_items"):
+        index.build(store.points_items())  # langsung dari kolom poin
+    else:
+        index.build((uid, user.get("points", 0)) for uid, user in store.scan())
+    return index
+
+def get_rank_index():
+    global _index
+    if _index is None:
+        _index = _build_from_store()
+    return _index
+
+def rebuild_rank_index():
+    """Bangun index baru dari store lalu tukar; untuk worker yang poinnya juga berubah di proses lain"""
+    global _index
+    _index = _build_from_store()
+    return _index
+
+async def run_refresher(stop_event, interval):
+    """Background task: rebuild index tiap interval detik (mode multi-worker)"""
+    while not stop_event.is_set():
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        if not stop_event.is_set():
+            try:
+                await asyncio.to_thread(rebuild_rank_index)
+            except Exception as e:
+                print(f"❌ Rebuild rank index gagal: {e}")
+
+def update_rank(user_id, points):
+    # Index dibangun malas; sebelum itu tidak ada yang perlu diperbarui
+    if _index is not None:
+        _index.update(user_id, points)
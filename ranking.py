@@ -2,49 +2,49 @@
 # ranking.py
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-from users import load_users
-from evol import get_evol_info
+from render import edit_screen, display_name
+from media import send_cached_photo
+from store import get_store, new_user
+from rankindex import get_rank_index
+from leaderboard import get_leaderboards
+from evol import get_tier, get_tier_by_level, progress_text, MAX_EVOL
+from metrics import timed, RENDER
+from router import callback_data
 import os
 
-async def show_rank_navigation(query, context):
+async def show_rank_navigation(query, context, level=None):
+    """Layar rank; level = evol yang sedang dilihat (default evol milik user)"""
     user_id = str(query.from_user.id)
-    users = load_users()
-    user = users.get(user_id, {"points": 0})
-    current_evol, badge_path, _ = get_evol_info(user["points"])
-    
-    # Extract current evol number
-    current_evol_num = 1
-    for i in range(1, 8):
-        if f"Evol {i}" in current_evol:
-            current_evol_num = i
-            break
+    user = get_store().get(user_id) or new_user()
+    tier = get_tier(user["points"])
+    current_evol = tier.title
+    viewed = get_tier_by_level(level) if level else tier
+    badge_path, viewed_num = viewed.badge, viewed.level
     
     # Navigation buttons
-    prev_evol = max(1, current_evol_num - 1)
-    next_evol = min(7, current_evol_num + 1)
+    prev_evol = max(1, viewed_num - 1)
+    next_evol = min(MAX_EVOL, viewed_num + 1)
     
     keyboard = []
     
     # Navigation row
     nav_row = []
-    if current_evol_num > 1:
-        nav_row.append(InlineKeyboardButton("⬅️ Previous", callback_data=f"evol_{prev_evol}"))
-    nav_row.append(InlineKeyboardButton(f"🎯 Evol {current_evol_num}", callback_data=f"evol_{current_evol_num}"))
-    if current_evol_num < 7:
-        nav_row.append(InlineKeyboardButton("➡️ Next", callback_data=f"evol_{next_evol}"))
+    if viewed_num > 1:
+        nav_row.append(InlineKeyboardButton("⬅️ Previous", callback_data=callback_data("evol", prev_evol)))
+    nav_row.append(InlineKeyboardButton(f"🎯 Evol {viewed_num}", callback_data=callback_data("evol", viewed_num)))
+    if viewed_num < MAX_EVOL:
+        nav_row.append(InlineKeyboardButton("➡️ Next", callback_data=callback_data("evol", next_evol)))
     keyboard.append(nav_row)
     
     # Action buttons
-    keyboard.append([InlineKeyboardButton("🏆 Top 100 Leaderboard", callback_data=f"leaderboard_{current_evol_num}")])
-    keyboard.append([InlineKeyboardButton("📊 My Position", callback_data="my_position")])
-    keyboard.append([InlineKeyboardButton("🏠 Back to Home", callback_data="back_main")])
+    keyboard.append([InlineKeyboardButton("🏆 Top 100 Leaderboard", callback_data=callback_data("leaderboard", viewed_num))])
+    keyboard.append([InlineKeyboardButton("📊 My Position", callback_data=callback_data("position"))])
+    keyboard.append([InlineKeyboardButton("🏠 Back to Home", callback_data=callback_data("main"))])
     
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     # Get user ranking
-    all_users = [(uid, data.get("points", 0)) for uid, data in users.items()]
-    all_users.sort(key=lambda x: x[1], reverse=True)
-    user_rank = next((i+1 for i, (uid, _) in enumerate(all_users) if uid == user_id), "Unranked")
+    user_rank = get_rank_index().rank(user_id) or "Unranked"
     
     rank_text = f"""🏆 **RANK EVOLUTION**
 
@@ -54,61 +54,39 @@ async def show_rank_navigation(query, context):
 📍 Global Rank: #{user_rank}
 
 🎯 **Evolution Progress:**
-{'🟢' if current_evol_num >= 1 else '⚪'} Evol 1 - Rookie (0-49)
-{'🟢' if current_evol_num >= 2 else '⚪'} Evol 2 - Charger (50-14,999)
-{'🟢' if current_evol_num >= 3 else '⚪'} Evol 3 - Breaker (15,000-29,999)
-{'🟢' if current_evol_num >= 4 else '⚪'} Evol 4 - Phantom (30,000-49,999)
-{'🟢' if current_evol_num >= 5 else '⚪'} Evol 5 - Overdrive (50,000-79,999)
-{'🟢' if current_evol_num >= 6 else '⚪'} Evol 6 - Genesis (80,000-119,999)
-{'🟢' if current_evol_num >= 7 else '⚪'} Evol 7 - Final Form (120,000+)
+{progress_text(tier.level)}
 
 Gunakan tombol navigasi untuk melihat evol lainnya!"""
 
     # Send photo if exists, otherwise send text
     if os.path.exists(badge_path):
-        await query.message.reply_photo(
-            photo=open(badge_path, "rb"),
+        await send_cached_photo(
+            query.message.reply_photo,
+            badge_path,
             caption=rank_text,
             reply_markup=reply_markup,
             parse_mode='Markdown'
         )
         await query.delete_message()
     else:
-        await query.edit_message_text(rank_text, reply_markup=reply_markup, parse_mode='Markdown')
+        await edit_screen(query, rank_text, reply_markup)
 
-async def show_leaderboard(query, context):
-    evol_num = int(query.data.split("_")[1])
-    users = load_users()
-    
-    # Filter users by evol level
-    evol_users = []
-    for uid, data in users.items():
-        points = data.get("points", 0)
-        evol_name, _, _ = get_evol_info(points)
-        if f"Evol {evol_num}" in evol_name:
-            evol_users.append((uid, points, data.get("username", f"User{uid[:6]}")))
-    
-    # Sort by points
-    evol_users.sort(key=lambda x: x[1], reverse=True)
-    top_100 = evol_users[:100]
-    
-    keyboard = [
-        [InlineKeyboardButton("🔙 Back to Rank", callback_data="rank")],
-        [InlineKeyboardButton("🏠 Back to Home", callback_data="back_main")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    evol_names = {
-        1: "Rookie", 2: "Charger", 3: "Breaker", 4: "Phantom",
-        5: "Overdrive", 6: "Genesis", 7: "Final Form"
-    }
-    
-    leaderboard_text = f"🏆 **TOP 100 - EVOL {evol_num} ({evol_names[evol_num]})**\n\n"
+LEADERBOARD_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔙 Back to Rank", callback_data=callback_data("rank"))],
+    [InlineKeyboardButton("🏠 Back to Home", callback_data=callback_data("main"))]
+])
+POSITION_RADIUS = 3
+
+@timed(RENDER)
+def render_leaderboard(evol_num, top_100):
+    store = get_store()
+    leaderboard_text = f"🏆 **TOP 100 - EVOL {evol_num} ({get_tier_by_level(evol_num).name})**\n\n"
     
     if not top_100:
         leaderboard_text += "Belum ada pengguna di level ini."
     else:
-        for i, (uid, points, username) in enumerate(top_100[:10]):  # Show top 10
+        for i, (uid, points) in enumerate(top_100[:10]):  # Show top 10
+            username = display_name(uid, store.get(uid))
             medal = "🥇" if i == 0 else "🥈" if i == 1 else "🥉" if i == 2 else f"{i+1}."
             leaderboard_text += f"{medal} {username}\n💎 {points:,} points\n\n"
         
@@ -116,5 +94,28 @@ async def show_leaderboard(query, context):
             leaderboard_text += f"... dan {len(top_100)-10} pengguna lainnya\n\n"
         
         leaderboard_text += f"📊 Total {len(top_100)} pengguna di Evol {evol_num}"
-    
-    await query.edit_message_text(leaderboard_text, reply_markup=reply_markup, parse_mode='Markdown')
+    return leaderboard_text
+
+async def show_leaderboard(query, context, evol_num):
+    leaderboard_text = get_leaderboards().render(evol_num, render_leaderboard)
+    await edit_screen(query, leaderboard_text, LEADERBOARD_MARKUP)
+
+@timed(RENDER)
+def render_position(user_id, neighbours):
+    store = get_store()
+    lines = ["📊 **POSISI KAMU**\n"]
+    for rank, uid, points in neighbours:
+        username = display_name(uid, store.get(uid))
+        marker = "👉 " if uid == user_id else ""
+        lines.append(f"{marker}#{rank:,} {username} — 💎 {points:,}")
+    return "\n".join(lines)
+
+async def show_my_position(query, context):
+    """User di sekitar peringkat user sendiri (rank index, O(log n))"""
+    user_id = str(query.from_user.id)
+    neighbours = get_rank_index().around(user_id, radius=POSITION_RADIUS)
+    if neighbours:
+        text = render_position(user_id, neighbours)
+    else:
+        text = "📊 **POSISI KAMU**\n\nKamu belum punya poin. Klaim reward dulu untuk masuk peringkat!"
+    await edit_screen(query, text, LEADERBOARD_MARKUP)
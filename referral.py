@@ -1,32 +1,78 @@
 # referral.py
 
-from users import load_users, save_users
-from config import REFERRAL_REWARD
+from store import get_store
+from render import display_name
+from users import credit_points
+from refgraph import get_referral_graph, ALREADY_REFERRED, CYCLE
+from config import REFERRAL_REWARD, REFERRAL_TOP_N
+
+CODE_PREFIX = "REF"
+
+def parse_code(code):
+    """user_id referrer dari kode REF123456 (prefix boleh tidak ditulis), None kalau formatnya salah"""
+    user_id = code.upper().removeprefix(CODE_PREFIX)
+    return user_id if user_id.isascii() and user_id.isdigit() else None
 
 async def show_referral_code(update, context):
-    user_id = str(update.effective_user.id)
-    await update.message.reply_text(f"Kode referralmu: REF{user_id}")
+    user = update.effective_user
+    user_id = str(user.id)
+    store = get_store()
+    # Kode hanya valid untuk user yang dikenal store
+    if store.get(user_id) is None:
+        store.update(user_id, username=user.username or user.first_name)
+    graph = get_referral_graph()
+    count = graph.count(user_id)
+    await update.message.reply_text(
+        f"Kode referralmu: {CODE_PREFIX}{user_id}\n"
+        f"👥 Teman diundang: {count}\n"
+        f"💎 Bonus referral: {count * REFERRAL_REWARD:,} poin")
 
 async def apply_referral(update, context):
     if not context.args:
         await update.message.reply_text("Gunakan format: /usecode REF123456")
         return
-    code = context.args[0].replace("REF", "")
-    referrer_id = code
+    referrer_id = parse_code(context.args[0])
     new_user_id = str(update.effective_user.id)
+    if referrer_id is None:
+        await update.message.reply_text("Kode referral tidak valid.")
+        return
     if referrer_id == new_user_id:
         await update.message.reply_text("Kamu tidak bisa mereferensikan dirimu sendiri.")
         return
 
-    users = load_users()
-    if users.get(new_user_id, {}).get("ref_applied"):
+    store = get_store()
+    # ref_applied: referral sebelum graf referral ada
+    if store.get(new_user_id, {}).get("ref_applied"):
         await update.message.reply_text("Referral sudah digunakan.")
         return
+    if store.get(referrer_id) is None:
+        await update.message.reply_text("Kode referral tidak ditemukan.")
+        return
+    graph = get_referral_graph()
+    if referrer_id in graph.flagged:
+        await update.message.reply_text("⚠️ Kode referral ini sedang ditinjau admin. Coba kode lain.")
+        return
 
-    users.setdefault(referrer_id, {"points": 0})
-    users[referrer_id]["points"] += REFERRAL_REWARD
-    users.setdefault(new_user_id, {"points": 0})
-    users[new_user_id]["points"] += REFERRAL_REWARD
-    users[new_user_id]["ref_applied"] = True
-    save_users(users)
+    result = graph.add(new_user_id, referrer_id)
+    if result == ALREADY_REFERRED:
+        await update.message.reply_text("Referral sudah digunakan.")
+        return
+    if result == CYCLE:
+        await update.message.reply_text("Kode ini berasal dari temanmu sendiri, tidak bisa dipakai.")
+        return
+
+    credit_points(referrer_id, REFERRAL_REWARD, "referral")
+    credit_points(new_user_id, REFERRAL_REWARD, "referral", ref_applied=True)
     await update.message.reply_text("✅ Referral berhasil! Kamu dan temanmu dapat poin.")
+
+async def show_referral_top(update, context):
+    top = get_referral_graph().top(REFERRAL_TOP_N)
+    if not top:
+        await update.message.reply_text("Belum ada referral.")
+        return
+    store = get_store()
+    lines = [f"👥 **TOP {REFERRAL_TOP_N} REFERRAL**\n"]
+    for i, (uid, count) in enumerate(top, 1):
+        username = display_name(uid, store.get(uid))
+        lines.append(f"{i}. {username} — {count:,} teman")
+    await update.message.reply_text("\n".join(lines), parse_mode='Markdown')
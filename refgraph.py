@@ -0,0 +1,298 @@
+# refgraph.py
+
+import asyncio, heapq, os, random, sqlite3, threading, time
+from collections import Counter, deque
+from store import DB_PATH
+from config import (REFERRAL_FARM_MIN_SIZE, REFERRAL_FARM_INACTIVE_RATIO, REFERRAL_FARM_SAMPLE,
+    REFERRAL_BURST, REFERRAL_BURST_WINDOW)
+
+# Hasil add()
+ADDED, ALREADY_REFERRED, CYCLE = range(3)
+
+class ReferralGraph:
+    """Graf referral: satu edge user -> referrer, statistik dijaga inkremental
+
+    Edge disimpan di SQLite (file yang sama dengan store user) dan ditambahkan
+    dalam satu transaksi IMMEDIATE, sehingga "satu referral per user" dan
+    "tidak boleh membentuk cycle" tetap benar antar proses worker. Di memori
+    disimpan referrer, anak, depth per user dan bucket referrer per jumlah
+    referral: count/depth O(1), top-N cukup menyusuri bucket terbesar.
+    """
+
+    def __init__(self, path=DB_PATH, load=True):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS referrals (
+            user_id TEXT PRIMARY KEY,
+            referrer TEXT NOT NULL,
+            created REAL NOT NULL
+        )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS referrals_referrer ON referrals (referrer)")
+        self._referrer = {}
+        self._children = {}
+        self._depth = {}
+        self._depth_counts = Counter()
+        self._by_count = {}
+        self._top = None
+        self.flagged = {}  # user_id -> alasan, hasil scan terakhir
+        self.last_scan = None
+        if load:
+            self.load(read_edges(self._conn))
+
+    def load(self, edges):
+        """Bangun ulang state memori dari iterable (user_id, referrer, created)"""
+        self._referrer = {user_id: referrer for user_id, referrer, _ in edges}
+        self._children = {}
+        for user_id, referrer in self._referrer.items():
+            self._children.setdefault(referrer, []).append(user_id)
+        self._by_count = {}
+        for referrer, children in self._children.items():
+            self._by_count.setdefault(len(children), set()).add(referrer)
+        self._depth = {}
+        self._depth_counts = Counter()
+        # Depth dihitung dari akar; user di dalam cycle tidak terjangkau dan tidak punya depth
+        roots = [uid for uid in self._children if uid not in self._referrer]
+        for root in roots:
+            self._set_depths(root, 0)
+        self._top = None
+
+    def _set_depths(self, user_id, depth):
+        queue = deque([(child, depth + 1) for child in self._children.get(user_id, ())])
+        while queue:
+            uid, d = queue.popleft()
+            old = self._depth.get(uid)
+            if old is not None:
+                self._depth_counts[old] -= 1
+                if not self._depth_counts[old]:
+                    del self._depth_counts[old]
+            self._depth[uid] = d
+            self._depth_counts[d] += 1
+            queue.extend((child, d + 1) for child in self._children.get(uid, ()))
+
+    def _link(self, user_id, referrer):
+        self._referrer[user_id] = referrer
+        children = self._children.setdefault(referrer, [])
+        count = len(children)
+        if count:
+            bucket = self._by_count[count]
+            bucket.discard(referrer)
+            if not bucket:
+                del self._by_count[count]
+        children.append(user_id)
+        self._by_count.setdefault(count + 1, set()).add(referrer)
+        # user_id sebelumnya akar: seluruh subtree-nya turun di bawah referrer
+        self._depth[user_id] = self.depth(referrer) + 1
+        self._depth_counts[self._depth[user_id]] += 1
+        self._set_depths(user_id, self._depth[user_id])
+        self._top = None
+
+    def add(self, user_id, referrer, now=None):
+        """Catat user_id direferensikan referrer; ADDED, ALREADY_REFERRED atau CYCLE"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM referrals WHERE user_id = ?", (user_id,)).fetchone():
+                    result = ALREADY_REFERRED
+                elif self._is_ancestor(user_id, referrer):
+                    result = CYCLE
+                else:
+                    self._conn.execute("INSERT INTO referrals (user_id, referrer, created) VALUES (?, ?, ?)",
+                                       (user_id, referrer, now or time.time()))
+                    result = ADDED
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if result == ADDED:
+            self._link(user_id, referrer)
+        return result
+
+    def _is_ancestor(self, user_id, referrer):
+        # Rantai referrer ditelusuri di SQLite supaya edge dari worker lain ikut terhitung
+        row = self._conn.execute(
+            "WITH RECURSIVE up(id) AS (SELECT ? UNION "
+            "SELECT r.referrer FROM referrals r JOIN up ON r.user_id = up.id) "
+            "SELECT 1 FROM up WHERE id = ? LIMIT 1",
+            (referrer, user_id),
+        ).fetchone()
+        return row is not None
+
+    def referrer_of(self, user_id):
+        return self._referrer.get(user_id)
+
+    def count(self, user_id):
+        """Jumlah referral langsung milik user_id"""
+        children = self._children.get(user_id)
+        return len(children) if children else 0
+
+    def depth(self, user_id):
+        """Panjang rantai referrer di atas user_id (0 = bukan hasil referral)"""
+        return self._depth.get(user_id, 0)
+
+    def top(self, n):
+        """n referrer teratas [(user_id, count)], urut count lalu user_id"""
+        if self._top is None or len(self._top) < n <= len(self._children):
+            result = []
+            for count in sorted(self._by_count, reverse=True):
+                if len(result) >= n:
+                    break
+                bucket = self._by_count[count]
+                result.extend((uid, count) for uid in heapq.nsmallest(n - len(result), bucket))
+            self._top = result
+        return self._top[:n]
+
+    def stats(self):
+        edges = len(self._referrer)
+        depth_total = sum(d * c for d, c in self._depth_counts.items())
+        return {
+            "edges": edges,
+            "referrers": len(self._children),
+            "max_referrals": max(self._by_count, default=0),
+            "max_depth": max(self._depth_counts, default=0),
+            "avg_depth": depth_total / edges if edges else 0.0,
+            "depths": dict(sorted(self._depth_counts.items())),
+            "flagged": Counter(self.flagged.values()),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def read_edges(conn):
+    return conn.execute("SELECT user_id, referrer, created FROM referrals").fetchall()
+
+def find_cycles(referrer):
+    """User yang berada di dalam cycle pada graf user -> referrer (tiap node paling banyak satu edge keluar)"""
+    state = {}  # 1 = di jalur yang sedang ditelusuri, 2 = selesai
+    in_cycle = set()
+    for start in referrer:
+        path = []
+        node = start
+        while node is not None and node not in state:
+            state[node] = 1
+            path.append(node)
+            node = referrer.get(node)
+        if node is not None and state[node] == 1:
+            in_cycle.update(path[path.index(node):])
+        for uid in path:
+            state[uid] = 2
+    return in_cycle
+
+def find_bursts(edges, limit=REFERRAL_BURST, window=REFERRAL_BURST_WINDOW):
+    """Referrer yang mendapat >= limit referral dalam window detik"""
+    times = {}
+    for _, referrer, created in edges:
+        times.setdefault(referrer, []).append(created)
+    bursts = set()
+    for referrer, created in times.items():
+        if len(created) < limit:
+            continue
+        created.sort()
+        for i in range(limit - 1, len(created)):
+            if created[i] - created[i - limit + 1] <= window:
+                bursts.add(referrer)
+                break
+    return bursts
+
+def find_farms(referrer, is_inactive, min_size=REFERRAL_FARM_MIN_SIZE,
+               inactive_ratio=REFERRAL_FARM_INACTIVE_RATIO, sample=REFERRAL_FARM_SAMPLE):
+    """Akar pohon referral besar yang anggotanya mayoritas tidak pernah aktif
+
+    is_inactive(user_id) dipanggil untuk paling banyak sample anggota per pohon.
+    """
+    members = {}
+    roots = {}
+    for user_id in referrer:
+        # Akar dicari dengan path compression lewat roots; cycle berhenti di node yang sudah dilewati
+        path, seen = [], set()
+        node = user_id
+        while node in referrer and node not in roots and node not in seen:
+            path.append(node)
+            seen.add(node)
+            node = referrer[node]
+        root = roots.get(node, node)
+        for uid in path:
+            roots[uid] = root
+        members.setdefault(root, []).append(user_id)
+    rng = random.Random(0)
+    farms = set()
+    for root, users in members.items():
+        if len(users) < min_size:
+            continue
+        checked = users if len(users) <= sample else rng.sample(users, sample)
+        inactive = sum(1 for uid in checked if is_inactive(uid))
+        if inactive / len(checked) >= inactive_ratio:
+            farms.add(root)
+    return farms
+
+def scan(path=DB_PATH, is_inactive=None):
+    """(edges, flagged) dari snapshot SQLite; jalan di thread, tidak menyentuh graf yang dipakai handler"""
+    conn = sqlite3.connect(path)
+    try:
+        edges = read_edges(conn)
+    finally:
+        conn.close()
+    referrer = {user_id: ref for user_id, ref, _ in edges}
+    flagged = {}
+    if is_inactive is not None:
+        flagged.update(dict.fromkeys(find_farms(referrer, is_inactive), "farm"))
+    flagged.update(dict.fromkeys(find_bursts(edges), "burst"))
+    flagged.update(dict.fromkeys(find_cycles(referrer), "cycle"))
+    return edges, flagged
+
+def user_inactive(user_id):
+    """Belum pernah klaim dan belum menyelesaikan task"""
+    from store import get_store
+    user = get_store().get(user_id) or {}
+    return not user.get("last_claim") and not user.get("tasks")
+
+def _scan_job(path, reload):
+    edges, flagged = scan(path, user_inactive)
+    graph = None
+    if reload:
+        graph = ReferralGraph(path, load=False)
+        graph.load(edges)
+    return graph, flagged
+
+_graph = None
+
+def get_referral_graph():
+    global _graph
+    if _graph is None:
+        _graph = ReferralGraph()
+    return _graph
+
+async def run_scanner(stop_event, interval, reload=False):
+    """Background task: scan cycle/burst/farm tiap interval detik di thread
+
+    reload: graf memori juga dibangun ulang dari snapshot yang sama lalu
+    ditukar (mode multi-worker, edge dari worker lain baru terlihat di sini).
+    """
+    global _graph
+    path = get_referral_graph().path
+    while not stop_event.is_set():
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        if stop_event.is_set():
+            break
+        started = time.perf_counter()
+        try:
+            fresh, flagged = await asyncio.to_thread(_scan_job, path, reload)
+        except Exception as e:
+            print(f"❌ Scan referral gagal: {e}")
+            continue
+        old = get_referral_graph()
+        if fresh is not None:
+            _graph = fresh
+            old.close()
+        new = set(flagged) - set(old.flagged)
+        _graph.flagged = flagged
+        _graph.last_scan = (time.time(), time.perf_counter() - started)
+        if new:
+            reasons = dict(Counter(flagged[uid] for uid in new))
+            print(f"⚠️ Referral mencurigakan: {len(new)} user baru ditandai {reasons}")
@@ -0,0 +1,70 @@
+# render.py
+
+from collections import OrderedDict, namedtuple
+from telegram.error import BadRequest
+from telegram.helpers import escape_markdown
+from config import RENDER_CACHE_SIZE
+from metrics import timed, RENDER, API
+
+Screen = namedtuple("Screen", "text markup")
+
+_static = {}
+_last_rendered = OrderedDict()
+stats = {"edits": 0, "skipped": 0, "not_modified": 0}
+
+def display_name(uid, user):
+    """Nama tersimpan user (username/first_name dari Telegram), di-escape untuk parse_mode Markdown"""
+    return escape_markdown((user or {}).get("username") or f"User{uid[:6]}")
+
+def static_screen(builder):
+    """Decorator: layar statis dibangun sekali, pemanggilan berikutnya dari cache"""
+    def get():
+        screen = _static.get(builder.__name__)
+        if screen is None:
+            screen = _static[builder.__name__] = builder()
+        return screen
+    get.__name__ = builder.__name__
+    return get
+
+def _fingerprint(text, markup):
+    return hash((text, markup))
+
+def _remember(key, fingerprint):
+    _last_rendered[key] = fingerprint
+    _last_rendered.move_to_end(key)
+    if len(_last_rendered) > RENDER_CACHE_SIZE:
+        _last_rendered.popitem(last=False)
+
+def remember(message, text, markup=None):
+    """Catat konten pesan yang baru dikirim supaya edit identik bisa dilewati"""
+    if message is not None:
+        _remember((message.chat_id, message.message_id), _fingerprint(text, markup))
+
+@timed(API)
+async def _edit(query, text, reply_markup, parse_mode):
+    # Serialisasi dan parsing balasan PTB ikut dihitung sebagai waktu API, bukan render
+    return await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+
+@timed(RENDER)
+async def edit_screen(query, text, reply_markup=None, parse_mode='Markdown'):
+    """edit_message_text yang tidak memanggil Telegram kalau isi pesan sama persis"""
+    message = query.message
+    key = (message.chat_id, message.message_id) if message is not None else query.inline_message_id
+    fingerprint = _fingerprint(text, reply_markup)
+    if _last_rendered.get(key) == fingerprint:
+        stats["skipped"] += 1
+        return False
+    try:
+        await _edit(query, text, reply_markup, parse_mode)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+        stats["not_modified"] += 1
+    else:
+        stats["edits"] += 1
+    _remember(key, fingerprint)
+    return True
+
+def forget(message):
+    if message is not None:
+        _last_rendered.pop((message.chat_id, message.message_id), None)
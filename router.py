@@ -0,0 +1,213 @@
+# router.py
+
+import time
+from collections import OrderedDict
+from config import RENDER_CACHE_SIZE
+
+SEPARATOR = ":"
+MAX_CALLBACK_DATA = 64  # batas callback_data Telegram (byte)
+
+# Kode callback_data per route. Tombol lama tetap beredar di chat user,
+# jadi kode yang sudah rilis tidak boleh diganti atau dipakai ulang.
+ROUTE_CODES = {
+    "main": "m",
+    "farming": "f",
+    "claim": "cl",
+    "tasks": "t",
+    "complete": "tc",
+    "completed": "c",
+    "completed_type": "ct",
+    "rank": "r",
+    "evol": "e",
+    "leaderboard": "lb",
+    "position": "p",
+    "wallet": "w",
+    "wallet_soon": "ws",
+}
+
+# Format lama: string utuh, atau prefix_param_param
+LEGACY_EXACT = {
+    "back_main": "main",
+    "farming": "farming",
+    "claim_now": "claim",
+    "completed_task": "completed",
+    "rank": "rank",
+    "my_position": "position",
+    "wallet_connect": "wallet",
+    "wallet_soon": "wallet_soon",
+}
+# prefix -> (route, jumlah bagian awal yang dibuang). Bagian yang maknanya berubah
+# diubah lewat CallbackRouter.legacy, mis. complete_{type}_{index dalam kategori}.
+LEGACY_PREFIXES = {
+    "task": ("tasks", 0),
+    "complete": ("complete", 0),
+    "completed": ("completed_type", 0),
+    "evol": ("evol", 0),
+    "leaderboard": ("leaderboard", 0),
+}
+
+def callback_data(name, *params):
+    """callback_data ringkas untuk route name, mis. callback_data("evol", 3) -> "e:3" """
+    data = SEPARATOR.join((ROUTE_CODES[name], *map(str, params)))
+    if len(data.encode()) > MAX_CALLBACK_DATA:
+        raise ValueError(f"callback_data terlalu panjang: {data!r}")
+    return data
+
+def int_range(low, high):
+    """Parser parameter: int di antara low..high"""
+    def parse(value):
+        number = int(value)
+        if not low <= number <= high:
+            raise ValueError(value)
+        return number
+    return parse
+
+def one_of(values):
+    """Parser parameter: string yang harus ada di values"""
+    def parse(value):
+        if value not in values:
+            raise ValueError(value)
+        return value
+    return parse
+
+class Route:
+    """Satu route callback
+
+    params: parser per parameter, dipanggil sekali saat resolve.
+    answer/alert: teks query.answer (route tanpa handler = toast saja).
+    answers: handler memanggil query.answer sendiri (mis. hasil klaim sebagai alert).
+    concurrency: batas eksekusi sendiri di update processor, di dalam batas global (None = global saja).
+    cache: "static" = lewati kalau pesan sudah menampilkan route+param yang sama,
+           angka = sama tetapi hanya selama sekian detik, None = selalu jalan.
+    """
+
+    __slots__ = ("name", "code", "handler", "params", "answer", "alert", "answers", "concurrency", "cache")
+
+    def __init__(self, name, handler=None, params=(), answer=None, alert=False, answers=False,
+                 concurrency=None, cache=None):
+        self.name = name
+        self.code = ROUTE_CODES[name]
+        self.handler = handler
+        self.params = tuple(params)
+        self.answer = answer
+        self.alert = alert
+        self.answers = answers
+        self.concurrency = concurrency
+        self.cache = cache
+
+class CallbackRouter:
+    """Router callback_query berbasis tabel: lookup kode O(1), alias untuk format lama"""
+
+    def __init__(self, cache_size=RENDER_CACHE_SIZE):
+        self.routes = {}
+        self._by_name = {}
+        self._shown = OrderedDict()
+        self.cache_size = cache_size
+        self.stats = {"dispatched": 0, "cached": 0, "unknown": 0, "invalid": 0}
+        self._converters = {}
+
+    def route(self, name, handler=None, **options):
+        route = Route(name, handler, **options)
+        self.routes[route.code] = route
+        self._by_name[name] = route
+        return route
+
+    def legacy(self, prefix, convert):
+        """Ubah bagian data legacy prefix_... sebelum di-parse; convert boleh raise ValueError/KeyError/IndexError"""
+        self._converters[prefix] = convert
+
+    def _lookup(self, data):
+        code, _, rest = data.partition(SEPARATOR)
+        route = self.routes.get(code)
+        if route is not None:
+            return route, rest.split(SEPARATOR) if rest else []
+        name = LEGACY_EXACT.get(data)
+        if name is not None:
+            return self._by_name.get(name), []
+        prefix, _, rest = data.partition("_")
+        name, skip = LEGACY_PREFIXES.get(prefix, (None, 0))
+        if name is None or not rest:
+            return None, []
+        raw = rest.split("_")[skip:]
+        convert = self._converters.get(prefix)
+        if convert is not None:
+            try:
+                raw = convert(raw)
+            except (ValueError, KeyError, IndexError):
+                raw = None  # tidak valid, tapi route tetap dikenal (metrik, lane)
+        return self._by_name.get(name), raw
+
+    def resolve(self, data):
+        """(route, params hasil parse) atau (None, None) kalau data tidak dikenal/tidak valid"""
+        route, raw = self._lookup(data or "")
+        if route is None:
+            self.stats["unknown"] += 1
+            return None, None
+        if raw is None or len(raw) != len(route.params):
+            self.stats["invalid"] += 1
+            return None, None
+        try:
+            return route, tuple(parse(value) for parse, value in zip(route.params, raw))
+        except (ValueError, KeyError):
+            self.stats["invalid"] += 1
+            return None, None
+
+    def name_of(self, update):
+        """Nama route untuk label metrik dan lane processor, tanpa mem-parse parameter"""
+        query = getattr(update, "callback_query", None)
+        if query is None:
+            return None
+        route, _ = self._lookup(query.data or "")
+        return route.name if route is not None else None
+
+    def metrics_route(self, update):
+        return f"cb:{self.name_of(update) or 'other'}"
+
+    def _key(self, query):
+        message = query.message
+        return (message.chat_id, message.message_id) if message is not None else query.inline_message_id
+
+    def _is_cached(self, key, route, params):
+        if route.cache is None or key is None:
+            return False
+        shown = self._shown.get(key)
+        if shown is None or shown[0] != (route.name, params):
+            return False
+        return route.cache == "static" or time.monotonic() - shown[1] < route.cache
+
+    def _remember(self, key, route, params):
+        if key is None:
+            return
+        self._shown[key] = ((route.name, params), time.monotonic())
+        self._shown.move_to_end(key)
+        if len(self._shown) > self.cache_size:
+            self._shown.popitem(last=False)
+
+    async def dispatch(self, update, context):
+        """Callback untuk CallbackQueryHandler"""
+        query = update.callback_query
+        route, params = self.resolve(query.data)
+        if route is None or route.handler is None:
+            # Tetap dijawab supaya spinner di tombol berhenti
+            await query.answer(route.answer if route else None, show_alert=bool(route and route.alert))
+            return
+        key = self._key(query)
+        if self._is_cached(key, route, params):
+            self.stats["cached"] += 1
+            await query.answer()
+            return
+        if not route.answers:
+            await query.answer(route.answer, show_alert=route.alert)
+        self.stats["dispatched"] += 1
+        await route.handler(query, context, *params)
+        self._remember(key, route, params)
+
+    def install(self, application):
+        """Daftarkan lane concurrency per route di update processor (kalau didukung)"""
+        processor = application.update_processor
+        if not hasattr(processor, "add_lane"):
+            return
+        for route in self.routes.values():
+            if route.concurrency is not None:
+                processor.add_lane(route.name, route.concurrency)
+        processor.classify = self.name_of
@@ -1,42 +1,64 @@
-
 #!/usr/bin/env python3
 import os
 import signal
 import sys
+import time
 
 PID_FILE = "/tmp/gxr_bot.pid"
+DRAIN_WAIT = 40  # detik; worker diberi WORKER_DRAIN_TIMEOUT untuk menguras antrean
 
-def stop_bot():
-    """Stop running bot instance"""
+def read_pid():
     if not os.path.exists(PID_FILE):
         print("❌ Bot tidak sedang berjalan")
-        return
-    
+        return None
+    with open(PID_FILE, 'r') as f:
+        return int(f.read().strip())
+
+def stop_bot():
+    """Stop running bot instance (multi-worker: tunggu semua worker selesai menguras antrean)"""
     try:
-        with open(PID_FILE, 'r') as f:
-            pid = int(f.read().strip())
-        
+        pid = read_pid()
+        if pid is None:
+            return
+
         # Send termination signal
         os.kill(pid, signal.SIGTERM)
-        
-        # Wait a moment then force kill if needed
-        import time
-        time.sleep(2)
-        
-        try:
-            os.kill(pid, 0)  # Check if still running
+
+        # Wait for the drain, then force kill if needed
+        deadline = time.time() + DRAIN_WAIT
+        while time.time() < deadline:
+            try:
+                os.kill(pid, 0)  # Check if still running
+            except OSError:
+                print(f"✅ Bot (PID {pid}) berhasil dihentikan")
+                break
+            time.sleep(0.5)
+        else:
             os.kill(pid, signal.SIGKILL)  # Force kill
             print(f"🔴 Bot (PID {pid}) dihentikan paksa")
-        except OSError:
-            print(f"✅ Bot (PID {pid}) berhasil dihentikan")
-        
+
         # Remove PID file
-        os.remove(PID_FILE)
-        
+        if os.path.exists(PID_FILE):
+            os.remove(PID_FILE)
+
     except (ValueError, OSError) as e:
         print(f"❌ Error saat menghentikan bot: {e}")
         if os.path.exists(PID_FILE):
             os.remove(PID_FILE)
 
+def restart_workers():
+    """Rolling restart worker (mode multi-worker) tanpa menghentikan bot"""
+    try:
+        pid = read_pid()
+        if pid is None:
+            return
+        os.kill(pid, signal.SIGHUP)
+        print(f"🔄 Rolling restart dikirim ke bot (PID {pid})")
+    except (ValueError, OSError) as e:
+        print(f"❌ Error saat restart worker: {e}")
+
 if __name__ == "__main__":
-    stop_bot()
+    if len(sys.argv) > 1 and sys.argv[1] == "restart":
+        restart_workers()
+    else:
+        stop_bot()
@@ -0,0 +1,323 @@
+# store.py
+
+import json, os, sqlite3, threading
+from abc import ABC, abstractmethod
+from config import (USER_STORE_BACKEND, USER_CACHE_ENABLED, USER_CACHE_FLUSH_INTERVAL,
+    USER_CACHE_FLUSH_BATCH, USER_CACHE_MAX_ROWS, USER_TABLE_COLUMNAR, METRICS_ENABLED)
+
+DB_PATH = "data/users.db"
+LEGACY_JSON_PATH = "data/users.json"
+
+USER_FIELDS = ("points", "last_claim", "wallet", "ref_applied", "username", "tasks")
+SCAN_CHUNK = 1000
+
+def new_user():
+    """Default row for a user that has never been stored"""
+    return {"points": 0, "last_claim": 0, "wallet": ""}
+
+def _check_fields(fields):
+    for name in fields:
+        if name not in USER_FIELDS:
+            raise KeyError(f"Unknown user field: {name}")
+
+class UserStore(ABC):
+    """Per-user storage API used by the handlers"""
+
+    @abstractmethod
+    def get(self, user_id, default=None):
+        pass
+
+    @abstractmethod
+    def update(self, user_id, **fields):
+        pass
+
+    @abstractmethod
+    def increment(self, user_id, field, delta):
+        pass
+
+    @abstractmethod
+    def scan(self, after=None):
+        """Iterasi (user_id, user); dengan after, urut user_id mulai setelah after"""
+
+    @abstractmethod
+    def count(self):
+        pass
+
+    def claimed_since(self, since):
+        """Iterasi (user_id, last_claim) untuk user yang klaim setelah since"""
+        for user_id, user in self.scan():
+            if user.get("last_claim", 0) > since:
+                yield user_id, user["last_claim"]
+
+    def put_many(self, rows):
+        for user_id, user in rows:
+            self.update(user_id, **user)
+
+    def close(self):
+        pass
+
+class SqliteUserStore(UserStore):
+    """SQLite (WAL) backend, satu row per user"""
+
+    def __init__(self, path=DB_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS users (
+            user_id TEXT PRIMARY KEY,
+            points INTEGER NOT NULL DEFAULT 0,
+            last_claim REAL NOT NULL DEFAULT 0,
+            wallet TEXT NOT NULL DEFAULT '',
+            ref_applied INTEGER NOT NULL DEFAULT 0,
+            username TEXT,
+            tasks INTEGER NOT NULL DEFAULT 0
+        )""")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(users)")}
+        if "tasks" not in columns:
+            self._conn.execute("ALTER TABLE users ADD COLUMN tasks INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS users_last_claim ON users (last_claim, user_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @staticmethod
+    def _row(row):
+        user = dict(zip(USER_FIELDS, row))
+        user["ref_applied"] = bool(user["ref_applied"])
+        if user["username"] is None:
+            del user["username"]
+        return user
+
+    def get(self, user_id, default=None):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(USER_FIELDS)} FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return self._row(row) if row else default
+
+    def _upsert_sql(self, fields):
+        cols = ", ".join(fields)
+        marks = ", ".join("?" for _ in fields)
+        sets = ", ".join(f"{f} = excluded.{f}" for f in fields)
+        return f"INSERT INTO users (user_id, {cols}) VALUES (?, {marks}) ON CONFLICT(user_id) DO UPDATE SET {sets}"
+
+    def update(self, user_id, **fields):
+        if not fields:
+            return
+        _check_fields(fields)
+        with self._lock:
+            self._conn.execute(self._upsert_sql(fields), (user_id, *fields.values()))
+
+    def increment(self, user_id, field, delta):
+        _check_fields((field,))
+        with self._lock:
+            row = self._conn.execute(
+                f"INSERT INTO users (user_id, {field}) VALUES (?, ?) "
+                f"ON CONFLICT(user_id) DO UPDATE SET {field} = {field} + excluded.{field} "
+                f"RETURNING {field}",
+                (user_id, delta),
+            ).fetchone()
+        return row[0]
+
+    def put_many(self, rows):
+        with self._lock:
+            # IMMEDIATE: ambil write lock di awal supaya tidak deadlock dengan proses worker lain
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for user_id, user in rows:
+                    fields = {k: v for k, v in user.items() if k in USER_FIELDS}
+                    if fields:
+                        self._conn.execute(self._upsert_sql(fields), (user_id, *fields.values()))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def scan(self, after=None):
+        # Keyset pagination supaya lock tidak ditahan selama iterasi
+        last = after or ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT user_id, {', '.join(USER_FIELDS)} FROM users "
+                    "WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                    (last, SCAN_CHUNK),
+                ).fetchall()
+            for row in rows:
+                yield row[0], self._row(row[1:])
+            if len(rows) < SCAN_CHUNK:
+                return
+            last = rows[-1][0]
+
+    def scan_rows(self):
+        """Tuple mentah (user_id, *USER_FIELDS) tanpa urutan, untuk memuat seluruh tabel sekaligus"""
+        with self._lock:
+            cursor = self._conn.execute(f"SELECT user_id, {', '.join(USER_FIELDS)} FROM users")
+            while True:
+                rows = cursor.fetchmany(SCAN_CHUNK)
+                if not rows:
+                    return
+                yield from rows
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def claimed_since(self, since):
+        # Range scan di index last_claim, keyset (last_claim, user_id) per chunk
+        last = (since, "")
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT user_id, last_claim FROM users WHERE (last_claim, user_id) > (?, ?) "
+                    "ORDER BY last_claim, user_id LIMIT ?",
+                    (*last, SCAN_CHUNK),
+                ).fetchall()
+            yield from rows
+            if len(rows) < SCAN_CHUNK:
+                return
+            last = (rows[-1][1], rows[-1][0])
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, str(value)),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class JsonUserStore(UserStore):
+    """Legacy backend: seluruh users.json di memori, ditulis ulang tiap perubahan"""
+
+    def __init__(self, path=LEGACY_JSON_PATH):
+        self.path = path
+        self._users = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self._users = json.load(f)
+
+    def _save(self):
+        # temp file + fsync + rename: crash di tengah tulis tidak memotong file lama
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._users, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def get(self, user_id, default=None):
+        user = self._users.get(user_id)
+        return dict(user) if user is not None else default
+
+    def update(self, user_id, **fields):
+        _check_fields(fields)
+        self._users.setdefault(user_id, new_user()).update(fields)
+        self._save()
+
+    def increment(self, user_id, field, delta):
+        _check_fields((field,))
+        user = self._users.setdefault(user_id, new_user())
+        user[field] = user.get(field, 0) + delta
+        self._save()
+        return user[field]
+
+    def put_many(self, rows):
+        for user_id, user in rows:
+            self._users.setdefault(user_id, new_user()).update(user)
+        self._save()
+
+    def scan(self, after=None):
+        if after is None:
+            items = list(self._users.items())
+        else:
+            items = sorted((uid, u) for uid, u in self._users.items() if uid > after)
+        for user_id, user in items:
+            yield user_id, dict(user)
+
+    def count(self):
+        return len(self._users)
+
+def migrate_json(store, json_path=LEGACY_JSON_PATH):
+    """One-shot import of the legacy users.json into a store"""
+    if not os.path.exists(json_path):
+        return 0
+    with open(json_path, "r") as f:
+        users = json.load(f)
+    rows = [(uid, {k: v for k, v in u.items() if k in USER_FIELDS}) for uid, u in users.items()]
+    store.put_many(rows)
+    return len(rows)
+
+_store = None
+
+def open_store(backend=USER_STORE_BACKEND, cached=USER_CACHE_ENABLED, columnar=USER_TABLE_COLUMNAR):
+    if backend == "json":
+        store = JsonUserStore()
+    elif backend == "sqlite":
+        store = SqliteUserStore()
+        if store.get_meta("json_migrated") is None:
+            migrated = migrate_json(store)
+            store.set_meta("json_migrated", migrated)
+            if migrated:
+                print(f"📦 {migrated} user dimigrasi dari {LEGACY_JSON_PATH}")
+    else:
+        raise ValueError(f"Unknown user store backend: {backend}")
+    if cached and columnar:
+        from usertable import ColumnarUserTable
+        store = ColumnarUserTable(store, USER_CACHE_FLUSH_INTERVAL, USER_CACHE_FLUSH_BATCH)
+    elif cached:
+        from cache import UserCache
+        store = UserCache(store, USER_CACHE_FLUSH_INTERVAL, USER_CACHE_FLUSH_BATCH, USER_CACHE_MAX_ROWS)
+    if METRICS_ENABLED:
+        from metrics import TimedStore
+        store = TimedStore(store)
+    return store
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = open_store()
+    return _store
+
+def init_store(**options):
+    """Buka store global dengan opsi open_store selain default (mis. worker tanpa cache)"""
+    global _store
+    close_store()
+    _store = open_store(**options)
+    return _store
+
+def flush_store():
+    if _store is not None and hasattr(_store, "flush"):
+        _store.flush()
+
+def close_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        store = SqliteUserStore()
+        count = migrate_json(store, sys.argv[2] if len(sys.argv) > 2 else LEGACY_JSON_PATH)
+        store.set_meta("json_migrated", count)
+        print(f"✅ {count} user dimigrasi ke {DB_PATH}")
+    else:
+        print("Gunakan: python store.py migrate [path/to/users.json]")
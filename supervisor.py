@@ -0,0 +1,351 @@
+# supervisor.py
+
+import asyncio, multiprocessing, queue, signal, time
+from telegram import Update
+from telegram.error import NetworkError, RetryAfter
+from config import (BOT_MODE, WEBHOOK_URL, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_LISTEN,
+    WEBHOOK_PORT, WEBHOOK_PATH, UPDATE_MAX_PENDING, WORKER_QUEUE_BATCHES, WORKER_START_TIMEOUT,
+    WORKER_DRAIN_TIMEOUT)
+from processor import raw_update_key
+from store import init_store, close_store
+from pool import SharedPoolLedger
+from refgraph import ReferralGraph
+from tasks import migrate_tasks_json
+from webhook import WebhookListener, compute_allowed_updates
+
+POLL_TIMEOUT = 30
+SOURCE_BATCH = 100
+REPORT_INTERVAL = 0.2
+
+async def _report_processed(processor, processed):
+    while True:
+        stats = processor.stats()
+        processed.value = stats["processed"] + stats["failed"]
+        await asyncio.sleep(REPORT_INTERVAL)
+
+async def run_worker(index, inbox, processed, ready, go, request_factory=None):
+    """Proses update dari inbox sampai sentinel None, lalu kuras yang masih berjalan"""
+    from main import build_application
+    request = request_factory() if request_factory is not None else None
+    application = build_application(worker=index, request=request)
+    processor = application.update_processor
+    stop_event = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop_event.set)
+    async with application:
+        await application.post_init(application)
+        await application.start()
+        ready.set()
+        # Saat rolling restart, worker lama masih menguras antrean yang sama
+        while not go.is_set() and not stop_event.is_set():
+            await asyncio.sleep(0.05)
+        reporter = asyncio.create_task(_report_processed(processor, processed))
+        received = 0
+        try:
+            while not stop_event.is_set():
+                try:
+                    batch = await asyncio.to_thread(inbox.get, True, 0.5)
+                except queue.Empty:
+                    continue
+                if batch is None:
+                    break
+                for data in batch:
+                    application.update_queue.put_nowait(Update.de_json(data, application.bot))
+                received += len(batch)
+                while received - processed.value >= UPDATE_MAX_PENDING:
+                    await asyncio.sleep(0.01)
+            await application.update_queue.join()
+        finally:
+            reporter.cancel()
+            await application.stop()
+            stats = processor.stats()
+            processed.value = stats["processed"] + stats["failed"]
+    await application.post_shutdown(application)
+    close_store()
+
+def worker_main(index, inbox, processed, ready, go, request_factory=None):
+    """Entry point proses worker (multiprocessing spawn)"""
+    # Ctrl+C dikirim ke seluruh process group; yang mengatur stop adalah supervisor
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(run_worker(index, inbox, processed, ready, go, request_factory))
+
+def prepare_shared_state():
+    """Migrasi sekali di supervisor supaya worker tidak balapan menjalankannya"""
+    init_store(cached=False)
+    try:
+        migrate_tasks_json()
+        SharedPoolLedger().close()
+        ReferralGraph(load=False).close()
+    finally:
+        close_store()
+
+class WorkerHandle:
+    """Satu proses worker beserta event start dan counter update yang selesai"""
+
+    def __init__(self, ctx, index, inbox, request_factory=None):
+        self.index = index
+        self.ready = ctx.Event()
+        self.go = ctx.Event()
+        self.processed = ctx.Value("q", 0, lock=False)
+        self.process = ctx.Process(
+            target=worker_main,
+            args=(index, inbox, self.processed, self.ready, self.go, request_factory),
+            name=f"gxr-worker-{index}",
+        )
+
+class Supervisor:
+    """Satu proses ingest membagi update ke N worker berdasarkan user_id
+
+    Semua update user yang sama lewat satu antrean ke satu worker, jadi
+    urutan per user tetap terjaga. Saat rolling restart, worker baru sudah
+    siap sebelum worker lama diberi sentinel, dan baru mulai membaca antrean
+    setelah worker lama selesai menguras bagiannya.
+    """
+
+    def __init__(self, workers, request_factory=None, queue_batches=WORKER_QUEUE_BATCHES):
+        self.ctx = multiprocessing.get_context("spawn")
+        self.size = workers
+        self.request_factory = request_factory
+        self.inboxes = [self.ctx.Queue(queue_batches) for _ in range(workers)]
+        self.workers = [None] * workers
+        self.dispatched = 0
+        self.restarts = 0
+        self._retired = 0
+        self._stopping = False
+        self._lock = asyncio.Lock()
+
+    def _spawn(self, index):
+        handle = WorkerHandle(self.ctx, index, self.inboxes[index], self.request_factory)
+        handle.process.start()
+        return handle
+
+    async def _wait_ready(self, handle):
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while not handle.ready.is_set():
+            if not handle.process.is_alive() or time.monotonic() > deadline:
+                handle.process.terminate()
+                raise RuntimeError(f"Worker {handle.index} gagal start (exit {handle.process.exitcode})")
+            await asyncio.sleep(0.05)
+
+    async def start(self):
+        prepare_shared_state()
+        handles = [self._spawn(index) for index in range(self.size)]
+        for handle in handles:
+            await self._wait_ready(handle)
+        for handle in handles:
+            self.workers[handle.index] = handle
+            handle.go.set()
+
+    def slot(self, data):
+        key = raw_update_key(data)
+        return key % self.size if isinstance(key, int) else 0
+
+    async def _put(self, index, item):
+        inbox = self.inboxes[index]
+        while True:
+            try:
+                inbox.put_nowait(item)
+                return
+            except queue.Full:
+                # Worker penuh: tahan ingest (webhook membalas 429, polling berhenti mengambil)
+                await asyncio.sleep(0.005)
+
+    async def dispatch(self, batch):
+        slots = {}
+        for position, data in enumerate(batch):
+            slots.setdefault(self.slot(data), []).append(position)
+        # Urut kemunculan pertama: kalau dibatalkan di tengah, prefix yang sudah masuk sepanjang mungkin
+        for index, positions in slots.items():
+            await self._put(index, [batch[position] for position in positions])
+            if isinstance(batch, Batch):
+                batch.mark(positions)
+            self.dispatched += len(positions)
+
+    async def run(self, source):
+        """Bagi semua batch dari source ke worker sampai source habis atau task dibatalkan"""
+        try:
+            async for batch in source:
+                await self.dispatch(batch)
+        finally:
+            await source.aclose()
+
+    async def _retire(self, handle):
+        await self._put(handle.index, None)
+        await asyncio.to_thread(handle.process.join, WORKER_DRAIN_TIMEOUT)
+        if handle.process.is_alive():
+            print(f"⚠️ Worker {handle.index} belum selesai setelah {WORKER_DRAIN_TIMEOUT:.0f} detik, dihentikan paksa")
+            handle.process.terminate()
+            await asyncio.to_thread(handle.process.join)
+        self._retired += handle.processed.value
+
+    async def rolling_restart(self):
+        """Ganti worker satu per satu tanpa menghentikan ingest"""
+        async with self._lock:
+            for index in range(self.size):
+                if self._stopping:
+                    return
+                handle = self._spawn(index)
+                try:
+                    await self._wait_ready(handle)
+                except RuntimeError as e:
+                    print(f"❌ {e}; worker lama tetap dipakai")
+                    continue
+                await self._retire(self.workers[index])
+                self.workers[index] = handle
+                handle.go.set()
+                self.restarts += 1
+                print(f"🔄 Worker {index} di-restart (PID {handle.process.pid})")
+
+    async def monitor(self):
+        """Jalankan ulang worker yang mati tanpa diminta"""
+        while not self._stopping:
+            await asyncio.sleep(1)
+            async with self._lock:
+                for index, handle in enumerate(self.workers):
+                    if self._stopping or handle.process.is_alive():
+                        continue
+                    print(f"❌ Worker {index} berhenti (exit {handle.process.exitcode}), dijalankan ulang")
+                    self._retired += handle.processed.value
+                    replacement = self._spawn(index)
+                    try:
+                        await self._wait_ready(replacement)
+                    except RuntimeError as e:
+                        print(f"❌ {e}")
+                    self.workers[index] = replacement
+                    replacement.go.set()
+                    self.restarts += 1
+
+    async def stop(self):
+        """Kuras semua worker: update yang sudah dibagi tetap diproses sebelum keluar"""
+        self._stopping = True
+        async with self._lock:
+            await asyncio.gather(*(self._retire(handle) for handle in self.workers if handle))
+        for inbox in self.inboxes:
+            inbox.cancel_join_thread()
+            inbox.close()
+
+    def processed(self):
+        return self._retired + sum(handle.processed.value for handle in self.workers if handle)
+
+    def stats(self):
+        return {
+            "workers": self.size,
+            "pids": [handle.process.pid for handle in self.workers if handle],
+            "dispatched": self.dispatched,
+            "processed": self.processed(),
+            "restarts": self.restarts,
+        }
+
+class Batch(list):
+    """Batch update dari polling_source; dispatch menandai update yang sudah masuk antrean worker"""
+
+    def __init__(self, items):
+        super().__init__(items)
+        self.enqueued = [False] * len(self)
+
+    def mark(self, positions):
+        for position in positions:
+            self.enqueued[position] = True
+
+    def prefix(self):
+        """Jumlah update terdepan yang semuanya sudah masuk antrean"""
+        return next((i for i, done in enumerate(self.enqueued) if not done), len(self))
+
+async def polling_source(bot, allowed_updates):
+    """getUpdates dari satu proses; saat berhenti offset dikonfirmasi hanya sampai update yang sudah dibagi
+
+    getUpdates berikutnya baru dipanggil setelah batch selesai dibagi, jadi
+    selama jalan offset tidak pernah melewati update yang belum masuk antrean.
+    Kalau dibatalkan di tengah dispatch, update sesudah yang pertama belum
+    masuk akan diambil lagi oleh proses berikutnya (bisa ada yang terproses dua kali,
+    tidak ada yang hilang).
+    """
+    await bot.delete_webhook()
+    offset = 0  # update_id pertama yang belum dibagi ke worker
+    updates = batch = None
+    try:
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT,
+                                                allowed_updates=allowed_updates)
+            except RetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+                continue
+            except NetworkError as e:
+                print(f"⚠️ getUpdates gagal: {e}")
+                await asyncio.sleep(1)
+                continue
+            if updates:
+                batch = Batch(update.to_dict() for update in updates)
+                yield batch
+                offset = updates[-1].update_id + 1
+                batch = None
+    finally:
+        if batch is not None:
+            done = batch.prefix()
+            if done:
+                offset = updates[done - 1].update_id + 1
+        if offset:
+            try:
+                await bot.get_updates(offset=offset, timeout=0)
+            except Exception as e:
+                print(f"⚠️ Gagal konfirmasi offset {offset}: {e}")
+
+async def webhook_source(bot, allowed_updates):
+    """Terima update lewat WebhookListener; antrean penuh dibalas 429 ke Telegram"""
+    listener = WebhookListener(None)
+    await listener.server.start()
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            url=WEBHOOK_URL,
+            secret_token=listener.secret,
+            allowed_updates=allowed_updates,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+    print(f"🌐 Webhook listening on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    try:
+        while True:
+            batch = [await listener.queue.get()]
+            while len(batch) < SOURCE_BATCH and not listener.queue.empty():
+                batch.append(listener.queue.get_nowait())
+            yield batch
+            for _ in batch:
+                listener.queue.task_done()
+    finally:
+        await listener.server.stop()
+
+async def run_supervisor(workers):
+    """Mode multi-worker sampai SIGINT/SIGTERM; SIGHUP = rolling restart"""
+    from main import build_application
+    application = build_application()
+    allowed_updates = compute_allowed_updates(application)
+    supervisor = Supervisor(workers)
+    await supervisor.start()
+    print(f"👷 {workers} worker siap: PID {', '.join(map(str, supervisor.stats()['pids']))}")
+
+    stop_event = asyncio.Event()
+    restarts = set()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    def restart():
+        task = loop.create_task(supervisor.rolling_restart())
+        restarts.add(task)
+        task.add_done_callback(restarts.discard)
+    loop.add_signal_handler(signal.SIGHUP, restart)
+
+    async with application.bot as bot:
+        source = webhook_source if BOT_MODE == "webhook" else polling_source
+        ingest = asyncio.create_task(supervisor.run(source(bot, allowed_updates)))
+        monitor = asyncio.create_task(supervisor.monitor())
+        stopper = asyncio.create_task(stop_event.wait())
+        await asyncio.wait({ingest, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        print("\nBot sedang dihentikan, menguras worker...")
+        for task in (ingest, monitor, stopper):
+            task.cancel()
+        results = await asyncio.gather(ingest, monitor, stopper, return_exceptions=True)
+        if isinstance(results[0], Exception) and not isinstance(results[0], asyncio.CancelledError):
+            print(f"❌ Ingest error: {results[0]}")
+        await supervisor.stop()
+    stats = supervisor.stats()
+    print(f"✅ {stats['processed']:,}/{stats['dispatched']:,} update diproses, semua worker berhenti")
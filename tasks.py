@@ -1,108 +1,336 @@
-
 # tasks.py
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import TelegramError
 import json
 import os
+import sqlite3
+import threading
+import time
+from render import edit_screen
+from metrics import timed, RENDER
+from store import DB_PATH, get_store
+from users import credit_points, is_admin
+from refgraph import get_referral_graph
+from router import callback_data
+from config import TASK_CHANNEL, TASK_REVIEW_PAGE
 
 TASKS_FILE = "data/tasks.json"
 
+# Katalog task. "id" adalah nomor bit di kolom tasks milik user,
+# jadi jangan pernah dipakai ulang atau diubah setelah rilis.
+# "verify": cara cek otomatis ("channel", "referrals"); tanpa itu task direview admin.
+TASK_CATALOG = {
+    "original": [
+        {"id": 0, "name": "Follow Twitter @GXROfficial", "reward": 100},
+        {"id": 1, "name": "Join Telegram Channel", "reward": 100, "verify": "channel"},
+        {"id": 2, "name": "Share Post on Twitter", "reward": 150},
+        {"id": 3, "name": "Invite 5 Friends", "reward": 500, "verify": "referrals", "target": 5}
+    ],
+    "partnership": [
+        {"id": 4, "name": "Complete KYC Verification", "reward": 300},
+        {"id": 5, "name": "Trade $100 on DEX", "reward": 800},
+        {"id": 6, "name": "Hold 1000 USDT", "reward": 600}
+    ],
+    "collaborator": [
+        {"id": 7, "name": "Create Content Video", "reward": 1000},
+        {"id": 8, "name": "Write Article Review", "reward": 750},
+        {"id": 9, "name": "Design Banner/Logo", "reward": 500}
+    ]
+}
+
+TASK_TITLES = {
+    "original": "🎯 Original Tasks",
+    "partnership": "🤝 Partnership Tasks",
+    "collaborator": "👥 Collaborator Tasks"
+}
+
+TASKS_BY_ID = {task["id"]: (task_type, task) for task_type, tasks in TASK_CATALOG.items() for task in tasks}
+CATEGORY_MASKS = {task_type: sum(1 << task["id"] for task in tasks) for task_type, tasks in TASK_CATALOG.items()}
+
+# Fragmen keyboard dibangun sekali saat import
+COMPLETE_BUTTONS = {
+    task["id"]: [InlineKeyboardButton(f"Complete: {task['name']}", callback_data=callback_data("complete", task_type, task["id"]))]
+    for task_type, tasks in TASK_CATALOG.items() for task in tasks
+}
+BACK_TO_FARMING = [InlineKeyboardButton("🔙 Back to Farming", callback_data=callback_data("farming"))]
+
+COMPLETED_MARKUP = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🎯 Original Task", callback_data=callback_data("completed_type", "original"))],
+    [InlineKeyboardButton("🤝 Partnership Task", callback_data=callback_data("completed_type", "partnership"))],
+    [InlineKeyboardButton("👥 Collaborator Task", callback_data=callback_data("completed_type", "collaborator"))],
+    [InlineKeyboardButton("🏠 Back to Home", callback_data=callback_data("main"))]
+])
+BACK_TO_COMPLETED = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔙 Back to Completed", callback_data=callback_data("completed"))],
+    [InlineKeyboardButton("🏠 Back to Home", callback_data=callback_data("main"))]
+])
+
+MEMBER_STATUSES = {"member", "administrator", "creator"}
+SUBMITTED_TEXT = "⏳ Task dikirim. Reward masuk setelah diverifikasi admin."
+
+class TaskReviews:
+    """Submission task yang menunggu review admin (SQLite, file yang sama dengan store user)
+
+    pending -> approved/rejected lewat UPDATE bersyarat, jadi satu submission
+    hanya bisa di-approve sekali walau beberapa admin atau worker bersamaan.
+    Task yang ditolak boleh dikirim ulang.
+    """
+
+    def __init__(self, path=DB_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS task_submissions (
+            user_id TEXT NOT NULL,
+            task_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            submitted REAL NOT NULL,
+            reviewed REAL,
+            PRIMARY KEY (user_id, task_id)
+        )""")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS task_submissions_status ON task_submissions (status, submitted)")
+
+    def submit(self, user_id, task_id):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO task_submissions (user_id, task_id, submitted) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id, task_id) DO UPDATE SET status = 'pending', submitted = excluded.submitted, "
+                "reviewed = NULL WHERE status = 'rejected'",
+                (user_id, task_id, time.time()))
+
+    def pending_mask(self, user_id):
+        """Bitset task user yang masih menunggu review"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task_id FROM task_submissions WHERE user_id = ? AND status = 'pending'", (user_id,))
+            return sum(1 << task_id for task_id, in rows)
+
+    def pending(self, limit, offset=0):
+        """[(user_id, task_id, submitted)] terlama dulu"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT user_id, task_id, submitted FROM task_submissions WHERE status = 'pending' "
+                "ORDER BY submitted LIMIT ? OFFSET ?", (limit, offset)).fetchall()
+
+    def count_pending(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM task_submissions WHERE status = 'pending'").fetchone()[0]
+
+    def review(self, user_id, task_id, status):
+        """Set status approved/rejected; False kalau tidak ada submission pending"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE task_submissions SET status = ?, reviewed = ? "
+                "WHERE user_id = ? AND task_id = ? AND status = 'pending'",
+                (status, time.time(), user_id, task_id))
+            return cursor.rowcount == 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_reviews = None
+
+def get_reviews():
+    global _reviews
+    if _reviews is None:
+        _reviews = TaskReviews()
+    return _reviews
+
 def load_user_tasks(user_id):
-    """Load user's completed tasks"""
+    """Bitset task yang sudah diselesaikan user"""
+    return (get_store().get(user_id) or {}).get("tasks", 0)
+
+def count_completed(mask, task_type):
+    return (mask & CATEGORY_MASKS[task_type]).bit_count()
+
+def migrate_tasks_json():
+    """One-shot import tasks.json lama (index per kategori) ke bitset di user store"""
     if not os.path.exists(TASKS_FILE):
-        return {"original": [], "partnership": [], "collaborator": []}
-    
-    try:
-        with open(TASKS_FILE, "r") as f:
-            data = json.load(f)
-            return data.get(user_id, {"original": [], "partnership": [], "collaborator": []})
-    except:
-        return {"original": [], "partnership": [], "collaborator": []}
-
-def save_user_tasks(user_id, tasks):
-    """Save user's completed tasks"""
-    if not os.path.exists("data"):
-        os.makedirs("data")
-    
+        return 0
     try:
         with open(TASKS_FILE, "r") as f:
             data = json.load(f)
-    except:
-        data = {}
-    
-    data[user_id] = tasks
-    with open(TASKS_FILE, "w") as f:
-        json.dump(data, f)
-
-async def show_tasks(query, context):
-    task_type = query.data.split("_")[1]  # original, partnership, collaborator
-    
-    tasks = {
-        "original": [
-            {"name": "Follow Twitter @GXROfficial", "reward": 100, "completed": False},
-            {"name": "Join Telegram Channel", "reward": 100, "completed": False},
-            {"name": "Share Post on Twitter", "reward": 150, "completed": False},
-            {"name": "Invite 5 Friends", "reward": 500, "completed": False}
-        ],
-        "partnership": [
-            {"name": "Complete KYC Verification", "reward": 300, "completed": False},
-            {"name": "Trade $100 on DEX", "reward": 800, "completed": False},
-            {"name": "Hold 1000 USDT", "reward": 600, "completed": False}
-        ],
-        "collaborator": [
-            {"name": "Create Content Video", "reward": 1000, "completed": False},
-            {"name": "Write Article Review", "reward": 750, "completed": False},
-            {"name": "Design Banner/Logo", "reward": 500, "completed": False}
-        ]
-    }
-    
-    task_titles = {
-        "original": "🎯 Original Tasks",
-        "partnership": "🤝 Partnership Tasks", 
-        "collaborator": "👥 Collaborator Tasks"
-    }
-    
-    user_tasks = load_user_tasks(str(query.from_user.id))
-    completed_tasks = user_tasks.get(task_type, [])
-    
+    except (OSError, ValueError):
+        return 0
+    store = get_store()
+    for user_id, user_tasks in data.items():
+        mask = 0
+        for task_type, indexes in user_tasks.items():
+            for i in indexes:
+                if task_type in TASK_CATALOG and 0 <= i < len(TASK_CATALOG[task_type]):
+                    mask |= 1 << TASK_CATALOG[task_type][i]["id"]
+        store.update(user_id, tasks=load_user_tasks(user_id) | mask)
+    os.replace(TASKS_FILE, f"{TASKS_FILE}.migrated")
+    return len(data)
+
+async def show_tasks(query, context, task_type):
+    user_id = str(query.from_user.id)
+    await render_tasks(query, task_type, load_user_tasks(user_id), get_reviews().pending_mask(user_id))
+
+@timed(RENDER)
+async def render_tasks(query, task_type, completed, pending=0, note=None):
     keyboard = []
-    task_text = f"**{task_titles[task_type]}**\n\n"
-    
-    for i, task in enumerate(tasks[task_type]):
-        status = "✅" if i in completed_tasks else "📝"
+    task_text = f"**{TASK_TITLES[task_type]}**\n\n"
+    if note:
+        task_text += f"{note}\n\n"
+
+    for task in TASK_CATALOG[task_type]:
+        done = completed >> task["id"] & 1
+        waiting = not done and pending >> task["id"] & 1
+        status = "✅" if done else "⏳" if waiting else "📝"
         task_text += f"{status} {task['name']}\n💰 Reward: {task['reward']} points\n\n"
-        
-        if i not in completed_tasks:
-            keyboard.append([InlineKeyboardButton(f"Complete: {task['name']}", callback_data=f"complete_{task_type}_{i}")])
-    
-    keyboard.append([InlineKeyboardButton("🔙 Back to Farming", callback_data="farming")])
+
+        if not done and not waiting:
+            keyboard.append(COMPLETE_BUTTONS[task["id"]])
+
+    keyboard.append(BACK_TO_FARMING)
     reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await query.edit_message_text(task_text, reply_markup=reply_markup, parse_mode='Markdown')
 
-async def show_completed_tasks(query, context):
+    await edit_screen(query, task_text, reply_markup)
+
+async def verify_task(bot, user_id, task):
+    """(True, None) kalau terverifikasi, (False, alasan) kalau belum, (None, None) kalau perlu review admin"""
+    method = task.get("verify")
+    if method == "referrals":
+        graph = get_referral_graph()
+        count = graph.count(user_id)
+        if user_id in graph.flagged:
+            return None, None  # referral ditandai scan abuse: admin yang memutuskan
+        if count < task["target"]:
+            return False, f"❌ Baru {count}/{task['target']} teman yang memakai kode referralmu."
+        return True, None
+    if method == "channel" and TASK_CHANNEL:
+        try:
+            member = await bot.get_chat_member(TASK_CHANNEL, int(user_id))
+        except TelegramError:
+            return None, None  # bot bukan admin channel atau channel salah
+        if member.status not in MEMBER_STATUSES:
+            return False, f"❌ Kamu belum bergabung di {TASK_CHANNEL}."
+        return True, None
+    return None, None
+
+def legacy_complete_params(parts):
+    """Tombol lama complete_{type}_{i}: i adalah index dalam kategori, bukan id task"""
+    task_type, index = parts
+    index = int(index)
+    if index < 0:
+        raise IndexError(index)
+    return [task_type, str(TASK_CATALOG[task_type][index]["id"])]
+
+def award_task(user_id, task_id):
+    """Tandai task selesai dan beri reward sekali saja; False kalau sudah pernah"""
+    completed = load_user_tasks(user_id)
+    if completed >> task_id & 1:
+        return False
+    credit_points(user_id, TASKS_BY_ID[task_id][1]["reward"], "task", tasks=completed | 1 << task_id)
+    return True
+
+async def complete_task(query, context, task_type, task_id):
+    """Tombol Complete: reward kalau bisa dicek otomatis, selain itu masuk antrean review admin"""
+    if TASKS_BY_ID.get(task_id, (None,))[0] != task_type:
+        return
+    task = TASKS_BY_ID[task_id][1]
     user_id = str(query.from_user.id)
-    user_tasks = load_user_tasks(user_id)
-    
-    keyboard = [
-        [InlineKeyboardButton("🎯 Original Task", callback_data="completed_original")],
-        [InlineKeyboardButton("🤝 Partnership Task", callback_data="completed_partnership")],
-        [InlineKeyboardButton("👥 Collaborator Task", callback_data="completed_collaborator")],
-        [InlineKeyboardButton("🏠 Back to Home", callback_data="back_main")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    total_completed = len(user_tasks["original"]) + len(user_tasks["partnership"]) + len(user_tasks["collaborator"])
-    
+    reviews = get_reviews()
+    note = None
+    if not load_user_tasks(user_id) >> task_id & 1 and not reviews.pending_mask(user_id) >> task_id & 1:
+        verified, note = await verify_task(context.bot, user_id, task)
+        if verified:
+            award_task(user_id, task_id)
+        elif verified is None:
+            reviews.submit(user_id, task_id)
+            note = SUBMITTED_TEXT
+
+    await render_tasks(query, task_type, load_user_tasks(user_id), reviews.pending_mask(user_id), note)
+
+async def show_completed_tasks(query, context):
+    completed = load_user_tasks(str(query.from_user.id))
+
+    original = count_completed(completed, "original")
+    partnership = count_completed(completed, "partnership")
+    collaborator = count_completed(completed, "collaborator")
+    total_completed = original + partnership + collaborator
+
     completed_text = f"""✅ **COMPLETED TASKS**
 
 📊 **Summary:**
-• Original Tasks: {len(user_tasks["original"])} completed
-• Partnership Tasks: {len(user_tasks["partnership"])} completed  
-• Collaborator Tasks: {len(user_tasks["collaborator"])} completed
+• Original Tasks: {original} completed
+• Partnership Tasks: {partnership} completed
+• Collaborator Tasks: {collaborator} completed
 
 🏆 **Total Completed:** {total_completed} tasks
 
 Pilih kategori untuk melihat detail tasks yang sudah selesai!"""
 
-    await query.edit_message_text(completed_text, reply_markup=reply_markup, parse_mode='Markdown')
+    await edit_screen(query, completed_text, COMPLETED_MARKUP)
+
+@timed(RENDER)
+def render_completed_category(task_type, completed):
+    lines = [f"✅ **{TASK_TITLES[task_type]}**\n"]
+    for task in TASK_CATALOG[task_type]:
+        if completed >> task["id"] & 1:
+            lines.append(f"✅ {task['name']} (+{task['reward']} points)")
+    if len(lines) == 1:
+        lines.append("Belum ada task yang selesai di kategori ini.")
+    return "\n".join(lines)
+
+async def show_completed_category(query, context, task_type):
+    completed = load_user_tasks(str(query.from_user.id))
+    await edit_screen(query, render_completed_category(task_type, completed), BACK_TO_COMPLETED)
+
+async def show_pending_tasks(update, context):
+    """/pendingtasks [halaman]: submission task terlama yang menunggu review"""
+    if not is_admin(update):
+        await update.message.reply_text("Kamu bukan admin.")
+        return
+    try:
+        page = max(int(context.args[0]), 1) if context.args else 1
+    except ValueError:
+        page = 1
+    reviews = get_reviews()
+    rows = reviews.pending(TASK_REVIEW_PAGE, (page - 1) * TASK_REVIEW_PAGE)
+    if not rows:
+        await update.message.reply_text("Tidak ada task yang menunggu review.")
+        return
+    lines = [f"📝 **Task menunggu review** ({reviews.count_pending():,}, halaman {page})\n```"]
+    for user_id, task_id, submitted in rows:
+        lines.append(f"{user_id:<12} {task_id:>2} {TASKS_BY_ID[task_id][1]['name'][:28]:<28} "
+                     f"{time.strftime('%m-%d %H:%M', time.localtime(submitted))}")
+    lines.append("```\n/approvetask user_id task_id atau /rejecttask user_id task_id")
+    await update.message.reply_text("\n".join(lines), parse_mode='Markdown')
+
+async def _review(update, context, command, status):
+    if not is_admin(update):
+        await update.message.reply_text("Kamu bukan admin.")
+        return
+    try:
+        user_id, task_id = context.args[0], int(context.args[1])
+        task = TASKS_BY_ID[task_id][1]
+    except (IndexError, ValueError, KeyError):
+        await update.message.reply_text(f"Gunakan format: /{command} user_id task_id")
+        return
+    if not get_reviews().review(user_id, task_id, status):
+        await update.message.reply_text("Tidak ada submission pending untuk user dan task itu.")
+        return
+    if status == "approved" and award_task(user_id, task_id):
+        text = f"✅ Task \"{task['name']}\" terverifikasi! +{task['reward']} poin."
+    elif status == "approved":
+        text = None  # sudah pernah dapat reward task ini
+    else:
+        text = f"❌ Task \"{task['name']}\" belum bisa diverifikasi. Selesaikan lalu kirim ulang."
+    await update.message.reply_text(f"Submission {user_id}/{task_id}: {status}.")
+    if text is not None and user_id.isdigit():
+        try:
+            await context.bot.send_message(chat_id=int(user_id), text=text)
+        except TelegramError:
+            pass  # user memblokir bot
+
+async def approve_task(update, context):
+    await _review(update, context, "approvetask", "approved")
+
+async def reject_task(update, context):
+    await _review(update, context, "rejecttask", "rejected")
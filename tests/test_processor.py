@@ -0,0 +1,90 @@
+# tests/test_processor.py
+#
+# PerUserUpdateProcessor dengan update tiruan: update satu user diproses
+# berurutan dan sesuai urutan masuk, jadi handler yang menunggu Bot API di
+# antara cek dan kredit tidak pernah mengkredit dobel.
+# Jalankan dari root repo: python -m pytest tests
+
+import asyncio, random
+from types import SimpleNamespace
+import pytest
+from config import CLAIM_REWARD
+from processor import PerUserUpdateProcessor
+from store import get_store, close_store
+from users import credit_points
+
+USER_ID = 1001
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, **kwargs):
+        # Round-trip Bot API tiruan supaya handler benar-benar saling bersilangan
+        await asyncio.sleep(random.uniform(0, 0.002))
+        self.replies.append(text)
+
+def fake_update(user_id=USER_ID, seq=0):
+    user = SimpleNamespace(id=user_id)
+    return SimpleNamespace(effective_user=user, effective_chat=user, message=FakeMessage(), seq=seq)
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # Store dan file data lain memakai path relatif (data/...)
+    monkeypatch.chdir(tmp_path)
+    close_store()
+    yield tmp_path
+    close_store()
+
+async def process_all(updates, handler, concurrency=8):
+    processor = PerUserUpdateProcessor(concurrency=concurrency, max_pending=len(updates))
+    await asyncio.gather(*(processor.process_update(update, handler(update)) for update in updates))
+    return processor
+
+def test_check_then_claim_with_await_credits_once(workdir):
+    # Cek klaim, round-trip Bot API, baru kredit: tanpa urutan per user semua lolos cek
+    async def claim(update):
+        user_id = str(update.effective_user.id)
+        if (get_store().get(user_id) or {}).get("last_claim", 0):
+            await update.message.reply_text("Tunggu dulu.")
+            return
+        await update.message.reply_text("Memproses klaim...")
+        credit_points(user_id, CLAIM_REWARD, "claim", last_claim=1.0)
+
+    updates = [fake_update() for _ in range(20)]
+    processor = asyncio.run(process_all(updates, claim))
+
+    assert get_store().get(str(USER_ID))["points"] == CLAIM_REWARD
+    replies = [text for update in updates for text in update.message.replies]
+    assert replies.count("Memproses klaim...") == 1
+    assert processor.stats()["processed"] == 20
+    assert processor.stats()["failed"] == 0
+
+def test_updates_of_one_user_run_in_submission_order(workdir):
+    order = {}
+
+    async def record(update):
+        await update.message.reply_text("...")
+        order.setdefault(update.effective_user.id, []).append(update.seq)
+
+    updates = [fake_update(user_id, seq) for seq in range(30) for user_id in (USER_ID, USER_ID + 1, USER_ID + 2)]
+    asyncio.run(process_all(updates, record))
+
+    assert order == {user_id: list(range(30)) for user_id in (USER_ID, USER_ID + 1, USER_ID + 2)}
+
+def test_read_modify_write_per_user_is_serialized(workdir):
+    # Handler sengaja baca-tunggu-tulis: tanpa urutan per user kredit akan hilang
+    async def credit_once(update):
+        user_id = str(update.effective_user.id)
+        before = (get_store().get(user_id) or {}).get("points", 0)
+        await update.message.reply_text("...")
+        if (get_store().get(user_id) or {}).get("points", 0) == before:
+            credit_points(user_id, 1, "test")
+
+    updates = [fake_update() for _ in range(50)] + [fake_update(USER_ID + 1) for _ in range(30)]
+    random.shuffle(updates)
+    asyncio.run(process_all(updates, credit_once))
+
+    store = get_store()
+    assert store.get(str(USER_ID))["points"] == 50
+    assert store.get(str(USER_ID + 1))["points"] == 30
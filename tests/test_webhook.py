@@ -0,0 +1,34 @@
+# tests/test_webhook.py
+#
+# allowed_updates dari handler yang terdaftar: penjaga di group -1
+# (flood control) tidak boleh membuka langganan ke semua jenis update.
+# Jalankan dari root repo: python -m pytest tests
+
+import pytest
+from telegram import Update
+from telegram.ext import Application, MessageHandler, TypeHandler, filters
+import config
+from webhook import compute_allowed_updates
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+
+def test_allowed_updates_with_flood_control(workdir):
+    from main import build_application
+    assert config.FLOOD_ENABLED
+    application = build_application()
+    assert "flood" in application.bot_data
+    assert compute_allowed_updates(application) == [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+async def ignore(update, context):
+    pass
+
+def test_generic_handler_in_normal_group_subscribes_to_all():
+    application = Application.builder().token("123:stub").build()
+    application.add_handler(MessageHandler(filters.ALL, ignore))
+    application.add_handler(TypeHandler(Update, ignore), group=-1)
+    assert compute_allowed_updates(application) == [Update.MESSAGE]
+    application.add_handler(TypeHandler(Update, ignore), group=1)
+    assert compute_allowed_updates(application) == list(Update.ALL_TYPES)
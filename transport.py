@@ -0,0 +1,200 @@
+# transport.py
+
+import asyncio, itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from heapq import heappop, heappush
+from time import perf_counter
+from telegram.request import BaseRequest, HTTPXRequest
+from metrics import Histogram
+from config import (API_POOL_SIZE, API_HTTP2, API_CONNECT_TIMEOUT, API_READ_TIMEOUT, API_WRITE_TIMEOUT,
+    API_POOL_TIMEOUT, API_MAX_INFLIGHT)
+
+try:
+    import h2
+except ImportError:  # h2 opsional, hanya untuk HTTP/2
+    h2 = None
+
+CALLBACK, INTERACTIVE, BULK = range(3)
+PRIORITY_NAMES = ("callback", "interactive", "bulk")
+# Long polling memegang koneksi sampai timeout; tidak boleh memakan slot antrean
+UNSCHEDULED = {"getUpdates"}
+EDIT_METHODS = {"editMessageText", "editMessageCaption", "editMessageReplyMarkup", "editMessageMedia"}
+
+_priority = ContextVar("api_priority", default=INTERACTIVE)
+
+@contextmanager
+def bulk():
+    """Panggilan Bot API di dalam blok ini antre sebagai bulk (broadcast, notifikasi)"""
+    token = _priority.set(BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def build_request(pool_size=API_POOL_SIZE, http2=API_HTTP2):
+    """HTTPXRequest dengan pool, timeout dan versi HTTP dari config"""
+    if http2 and h2 is None:
+        print("⚠️ API_HTTP2 aktif tapi paket h2 tidak terpasang, memakai HTTP/1.1")
+    return HTTPXRequest(
+        connection_pool_size=pool_size,
+        connect_timeout=API_CONNECT_TIMEOUT,
+        read_timeout=API_READ_TIMEOUT,
+        write_timeout=API_WRITE_TIMEOUT,
+        pool_timeout=API_POOL_TIMEOUT,
+        http_version="2" if http2 and h2 is not None else "1.1",
+    )
+
+def _edit_key(name, request_data):
+    if name not in EDIT_METHODS or request_data is None:
+        return None
+    params = request_data.parameters
+    if "inline_message_id" in params:
+        return name, params["inline_message_id"]
+    return name, str(params.get("chat_id")), params.get("message_id")
+
+class EndpointStats:
+    __slots__ = ("count", "errors", "inflight", "coalesced", "latency", "wait")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.inflight = 0
+        self.coalesced = 0
+        self.latency = Histogram()  # durasi request HTTP
+        self.wait = Histogram()  # antre sebelum dikirim
+
+class Pending:
+    """Request yang menunggu slot; edit berikutnya ke pesan yang sama menimpa isinya"""
+
+    __slots__ = ("name", "key", "args", "kwargs", "waiters", "queued")
+
+    def __init__(self, name, key, args, kwargs):
+        self.name = name
+        self.key = key
+        self.args = args
+        self.kwargs = kwargs
+        self.waiters = []
+        self.queued = perf_counter()
+
+class ScheduledRequest(BaseRequest):
+    """BaseRequest pembungkus: batas request serentak, antrean prioritas, edit digabung
+
+    Selama di bawah max_inflight request langsung dikirim. Di atasnya request
+    antre per prioritas: answerCallbackQuery (spinner tombol user) dulu,
+    lalu balasan handler, lalu bulk (lihat bulk()). Edit ke pesan yang sama
+    yang masih antre digabung: hanya isi terbaru yang dikirim, dan semua
+    pemanggil menerima hasil yang sama.
+    """
+
+    def __init__(self, request, max_inflight=API_MAX_INFLIGHT):
+        self.request = request
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.endpoints = {}
+        self._queue = []  # heap (prioritas, urutan, Pending)
+        self._edits = {}  # key edit -> Pending yang masih antre
+        self._seq = itertools.count()
+        self._tasks = set()
+
+    @property
+    def read_timeout(self):
+        return self.request.read_timeout
+
+    async def initialize(self):
+        await self.request.initialize()
+
+    async def shutdown(self):
+        await self.request.shutdown()
+
+    def _endpoint(self, name):
+        stats = self.endpoints.get(name)
+        if stats is None:
+            stats = self.endpoints[name] = EndpointStats()
+        return stats
+
+    async def _send(self, stats, args, kwargs):
+        stats.count += 1
+        stats.inflight += 1
+        started = perf_counter()
+        try:
+            return await self.request.do_request(*args, **kwargs)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.inflight -= 1
+            stats.latency.observe(perf_counter() - started)
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        name = url.rsplit("/", 1)[-1]
+        stats = self._endpoint(name)
+        args = (url, method, request_data)
+        if name in UNSCHEDULED:
+            return await self._send(stats, args, kwargs)
+        key = _edit_key(name, request_data)
+        pending = self._edits.get(key) if key is not None else None
+        if pending is not None:
+            pending.args, pending.kwargs = args, kwargs
+            stats.coalesced += 1
+        elif self.inflight < self.max_inflight and not self._queue:
+            self.inflight += 1
+            stats.wait.observe(0.0)
+            try:
+                return await self._send(stats, args, kwargs)
+            finally:
+                self._release()
+        else:
+            pending = Pending(name, key, args, kwargs)
+            priority = CALLBACK if name == "answerCallbackQuery" else _priority.get()
+            heappush(self._queue, (priority, next(self._seq), pending))
+            if key is not None:
+                self._edits[key] = pending
+        waiter = asyncio.get_running_loop().create_future()
+        pending.waiters.append(waiter)
+        return await waiter
+
+    def _release(self):
+        # Slot yang lepas langsung dipindah ke request antrean teratas
+        while self._queue:
+            pending = heappop(self._queue)[2]
+            if pending.key is not None:
+                del self._edits[pending.key]
+            if all(waiter.done() for waiter in pending.waiters):
+                continue  # semua pemanggil sudah batal
+            task = asyncio.get_running_loop().create_task(self._run(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return
+        self.inflight -= 1
+
+    async def _run(self, pending):
+        stats = self._endpoint(pending.name)
+        stats.wait.observe(perf_counter() - pending.queued)
+        try:
+            result = await self._send(stats, pending.args, pending.kwargs)
+        except Exception as e:
+            for waiter in pending.waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+        else:
+            for waiter in pending.waiters:
+                if not waiter.done():
+                    waiter.set_result(result)
+        finally:
+            self._release()
+
+    def waiting(self):
+        """Jumlah request antre per nama prioritas"""
+        counts = [0] * len(PRIORITY_NAMES)
+        for priority, _, _ in self._queue:
+            counts[priority] += 1
+        return dict(zip(PRIORITY_NAMES, counts))
+
+    def stats(self):
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "waiting": self.waiting(),
+            "coalesced": sum(s.coalesced for s in self.endpoints.values()),
+        }
@@ -1,55 +1,85 @@
 # users.py
 
-import json, os, time
-from evol import get_evol_info
-from config import CLAIM_REWARD, CLAIM_INTERVAL_HOURS
-from pool import check_and_reduce_pool
+import os, time
+from evol import get_tier
+from config import CLAIM_REWARD, CLAIM_INTERVAL_HOURS, ADMIN_IDS
+from pool import get_pool
+from store import get_store, new_user
+from rankindex import update_rank
+from leaderboard import update_leaderboards
+from notify import schedule_box
+from ledger import record
+from analytics import track
+from media import send_cached_photo
 
-DATA_PATH = "data/users.json"
+def is_admin(update):
+    return str(update.effective_user.id) in ADMIN_IDS
 
-def load_users():
-    if not os.path.exists(DATA_PATH):
-        return {}
-    with open(DATA_PATH, "r") as f:
-        return json.load(f)
+def credit_points(user_id, amount, reason, pool=None, **fields):
+    """Tambah poin user, catat di ledger, dan perbarui index yang bergantung pada poin
 
-def save_users(data):
-    with open(DATA_PATH, "w") as f:
-        json.dump(data, f)
+    pool: (level, amount) pemakaian pool evol yang menyertai kredit ini.
+    """
+    store = get_store()
+    points = store.increment(user_id, "points", amount)
+    record(user_id, amount, reason, pool)
+    track(user_id, points - amount, points, reason, pool)
+    if fields:
+        store.update(user_id, **fields)
+    update_rank(user_id, points)
+    update_leaderboards(user_id, points - amount, points)
+    return points
 
-async def claim_reward(update, context):
-    user_id = str(update.effective_user.id)
-    users = load_users()
-    now = time.time()
+def try_claim(user_id, now=None):
+    """Klaim reward box untuk user_id; kembalikan teks hasil untuk user"""
+    store = get_store()
+    now = now or time.time()
 
-    user = users.get(user_id, {"points": 0, "last_claim": 0, "wallet": ""})
+    user = store.get(user_id) or new_user()
     elapsed = now - user.get("last_claim", 0)
 
     if elapsed < CLAIM_INTERVAL_HOURS * 3600:
         remaining = int(CLAIM_INTERVAL_HOURS * 3600 - elapsed)
-        await update.message.reply_text(f"Tunggu {remaining//3600} jam {remaining%3600//60} menit lagi.")
-        return
+        return f"Tunggu {remaining//3600} jam {remaining%3600//60} menit lagi."
 
-    name, _, max_gxr = get_evol_info(user["points"])
-    if not check_and_reduce_pool(name, max_gxr):
-        await update.message.reply_text("⚠️ Pool tier kamu sudah habis. Tunggu refill.")
-        return
+    tier = get_tier(user["points"])
+    pool = get_pool()
+    if not pool.reserve(tier.level, tier.cap):
+        refill = pool.next_refill()
+        wait = f" dalam {int(refill - now)//3600} jam {int(refill - now)%3600//60} menit" if refill else ""
+        return f"⚠️ Pool tier kamu sudah habis. Tunggu refill{wait}."
+
+    try:
+        credit_points(user_id, CLAIM_REWARD, "claim", (tier.level, tier.cap), last_claim=now)
+    except Exception:
+        pool.rollback(tier.level, tier.cap)
+        raise
+    pool.commit(tier.level, tier.cap)
+    schedule_box(user_id, now)
+    return f"✅ Klaim berhasil! +{CLAIM_REWARD} poin.\nEvolusimu: {tier.title}"
 
-    user["points"] += CLAIM_REWARD
-    user["last_claim"] = now
-    users[user_id] = user
-    save_users(users)
-    await update.message.reply_text(f"✅ Klaim berhasil! +{CLAIM_REWARD} poin.\nEvolusimu: {name}")
+def box_status(user, now=None):
+    """Sisa detik sampai box penuh (0 = siap klaim) dan persentase isinya"""
+    interval = CLAIM_INTERVAL_HOURS * 3600
+    remaining = max(0.0, interval - ((now or time.time()) - user.get("last_claim", 0)))
+    return remaining, 100 - remaining / interval * 100
+
+async def claim_reward(update, context):
+    await update.message.reply_text(try_claim(str(update.effective_user.id)))
+
+async def claim_now(query, context):
+    """Tombol Claim Reward: hasil klaim langsung sebagai alert di jawaban callback"""
+    await query.answer(try_claim(str(query.from_user.id)), show_alert=True)
 
 async def get_user_status(update, context):
     user_id = str(update.effective_user.id)
-    users = load_users()
-    user = users.get(user_id, {"points": 0})
-    name, badge, _ = get_evol_info(user["points"])
+    user = get_store().get(user_id) or new_user()
+    tier = get_tier(user["points"])
+    name, badge = tier.title, tier.badge
 
     # Check if image exists
     if os.path.exists(badge):
-        await context.bot.send_photo(chat_id=update.effective_chat.id, photo=open(badge, "rb"),
+        await send_cached_photo(context.bot.send_photo, badge, chat_id=update.effective_chat.id,
             caption=f"🎮 Evolusimu: {name}\n💎 Poin: {user['points']}")
     else:
         await update.message.reply_text(f"🎮 **Evolusimu:** {name}\n💎 **Poin:** {user['points']}\n📷 _Gambar evolusi akan segera ditambahkan_", parse_mode='Markdown')
@@ -63,23 +93,22 @@ async def connect_wallet(update, context):
         await update.message.reply_text("Alamat tidak valid.")
         return
     user_id = str(update.effective_user.id)
-    users = load_users()
-    user = users.get(user_id, {"points": 0})
-    user["wallet"] = address
-    users[user_id] = user
-    save_users(users)
+    get_store().update(user_id, wallet=address)
     await update.message.reply_text("✅ Wallet berhasil dihubungkan.")
 
-async def export_csv(update, context):
-    if str(update.effective_user.id) != "123456789":  # Ganti dengan Telegram ID kamu
+async def cache_stats(update, context):
+    if not is_admin(update):
         await update.message.reply_text("Kamu bukan admin.")
         return
-
-    import csv
-    users = load_users()
-    with open("data/export.csv", "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["User ID", "Points", "Wallet"])
-        for uid, u in users.items():
-            writer.writerow([uid, u["points"], u.get("wallet", "")])
-    await update.message.reply_document(document=open("data/export.csv", "rb"))
\ No newline at end of file
+    store = get_store()
+    if not hasattr(store, "stats"):
+        await update.message.reply_text("User cache tidak aktif.")
+        return
+    stats = store.stats()
+    await update.message.reply_text(
+        f"🗄 **User Cache**\n"
+        f"Dirty: {stats['dirty']} | Cached: {stats['cached']}\n"
+        f"Flush: {stats['flushes']}x, {stats['flushed_rows']} rows, {stats['flush_errors']} error\n"
+        f"Batch terakhir: {stats['last_batch']} (max {stats['max_batch']})\n"
+        f"Latency flush: {stats['last_flush_ms']:.1f} ms (max {stats['max_flush_ms']:.1f} ms)",
+        parse_mode='Markdown')
@@ -0,0 +1,317 @@
+# usertable.py
+
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, compress, islice
+from cache import WriteBehind
+from evol import np, classify_points, get_evol_level
+from store import USER_FIELDS, SCAN_CHUNK, _check_fields
+from config import USER_TABLE_OVERFLOW
+
+REF_APPLIED = 1  # bit di kolom flags
+NO_NAME = -1
+MAX_NAME_BYTES = 0xFFFF
+
+def numeric_id(user_id):
+    """Telegram ID sebagai int kalau bentuk string-nya kanonik, selain itu None"""
+    if user_id.isascii() and user_id.isdigit() and len(user_id) < 19 and str(int(user_id)) == user_id:
+        return int(user_id)
+    return None
+
+def _levels(points):
+    levels = classify_points(points)
+    if np is not None:
+        return array("b", levels.astype(np.int8).tobytes())
+    return array("b", levels)
+
+def _column(values, dtype):
+    # Salinan, bukan view: view numpy mengunci array dari append selama masih hidup
+    return np.frombuffer(values, dtype=dtype).copy()
+
+class ColumnarUserTable(WriteBehind):
+    """Semua user di RAM sebagai kolom array, write-behind di depan store
+
+    Satu row per user: points/tasks array('q'), last_claim array('d'), tier
+    array('b') dan flags array('B'). Username disimpan UTF-8 di satu bytearray
+    (offset + panjang per row), wallet di dict karena kebanyakan kosong.
+    user_id numerik dicari lewat bisect di _keys terurut; user baru dan id
+    non-numerik masuk dict _recent sampai index dibangun ulang. Row tidak
+    pernah dihapus, jadi nomor row stabil untuk scan per chunk.
+    """
+
+    def __init__(self, store, flush_interval=2.0, flush_batch=500, overflow=USER_TABLE_OVERFLOW):
+        super().__init__(store, flush_interval, flush_batch)
+        self.overflow = overflow
+        self._ids = array("q")  # -1 untuk user_id non-numerik (lihat _names)
+        self._points = array("q")
+        self._last_claim = array("d")
+        self._tasks = array("q")
+        self._tier = array("b")
+        self._flags = array("B")
+        self._name_start = array("q")
+        self._name_len = array("H")
+        self._name_blob = bytearray()
+        self._name_garbage = 0
+        self._wallets = {}  # row -> wallet yang terisi
+        self._names = {}  # row -> user_id non-numerik
+        self._keys = array("q")  # user_id numerik terurut
+        self._slots = array("q")  # row untuk tiap _keys
+        self._recent = {}  # user_id (int atau str) -> row, belum masuk _keys
+        self._load()
+
+    def _load(self):
+        scan_rows = getattr(self.store, "scan_rows", None)
+        if scan_rows is not None:
+            rows = iter(scan_rows())
+        else:
+            rows = ((uid, *(u.get(f) for f in USER_FIELDS)) for uid, u in self.store.scan())
+        with self._lock:
+            for chunk in iter(lambda: list(islice(rows, SCAN_CHUNK)), []):
+                self._extend(chunk)
+            # Tier sekali untuk seluruh kolom, bukan per row
+            self._tier = _levels(self._points)
+            self._reindex()
+
+    def _extend(self, chunk):
+        # Muat satu chunk (user_id, *USER_FIELDS) per kolom, tanpa loop per field
+        user_ids, points, last_claims, wallets, ref_applied, usernames, tasks = zip(*chunk)
+        base = len(self._ids)
+        keys = list(map(numeric_id, user_ids))
+        for i, key in enumerate(keys):
+            if key is None:
+                self._names[base + i] = user_ids[i]
+                keys[i] = -1
+        self._ids.extend(keys)
+        self._points.extend(p or 0 for p in points)
+        self._last_claim.extend(c or 0 for c in last_claims)
+        self._tasks.extend(t or 0 for t in tasks)
+        self._flags.extend(REF_APPLIED if r else 0 for r in ref_applied)
+        self._wallets.update((base + i, w) for i, w in enumerate(wallets) if w)
+        encoded = [name.encode()[:MAX_NAME_BYTES] if name is not None else b"" for name in usernames]
+        offset = len(self._name_blob)
+        starts = accumulate(map(len, encoded), initial=offset)
+        self._name_start.extend(start if name is not None else NO_NAME for start, name in zip(starts, usernames))
+        self._name_len.extend(map(len, encoded))
+        self._name_blob += b"".join(encoded)
+
+    def _add_row(self, user_id):
+        row = len(self._ids)
+        key = numeric_id(user_id)
+        if key is None:
+            self._names[row] = user_id
+            key = -1
+        self._ids.append(key)
+        self._points.append(0)
+        self._last_claim.append(0)
+        self._tasks.append(0)
+        self._tier.append(1)
+        self._flags.append(0)
+        self._name_start.append(NO_NAME)
+        self._name_len.append(0)
+        return row
+
+    def _insert(self, user_id):
+        row = self._add_row(user_id)
+        key = self._ids[row]
+        self._recent[key if key >= 0 else user_id] = row
+        if len(self._recent) - len(self._names) > self.overflow:
+            self._reindex()
+        return row
+
+    def _reindex(self):
+        # _keys/_slots dibangun ulang dari kolom id; _recent tinggal id non-numerik
+        if np is not None:
+            ids = _column(self._ids, np.int64)
+            rows = np.flatnonzero(ids >= 0)
+            rows = rows[np.argsort(ids[rows], kind="stable")]
+            keys = array("q", ids[rows].tobytes())
+            slots = array("q", rows.astype(np.int64).tobytes())
+        else:
+            rows = sorted(compress(range(len(self._ids)), map((-1).__lt__, self._ids)), key=self._ids.__getitem__)
+            keys = array("q", map(self._ids.__getitem__, rows))
+            slots = array("q", rows)
+        self._keys, self._slots = keys, slots
+        self._recent = {name: row for row, name in self._names.items()}
+        if self._name_garbage > len(self._name_blob) // 2:
+            self._compact_names()
+
+    def _compact_names(self):
+        blob = bytearray()
+        for row, start in enumerate(self._name_start):
+            if start != NO_NAME:
+                self._name_start[row] = len(blob)
+                blob += self._name_blob[start:start + self._name_len[row]]
+        self._name_blob = blob
+        self._name_garbage = 0
+
+    def _row(self, user_id):
+        key = numeric_id(user_id)
+        if key is None:
+            return self._recent.get(user_id)
+        pos = bisect_left(self._keys, key)
+        if pos < len(self._keys) and self._keys[pos] == key:
+            return self._slots[pos]
+        return self._recent.get(key)
+
+    def _user_id(self, row):
+        key = self._ids[row]
+        return str(key) if key >= 0 else self._names[row]
+
+    def _name(self, row):
+        start = self._name_start[row]
+        if start == NO_NAME:
+            return None
+        return self._name_blob[start:start + self._name_len[row]].decode(errors="ignore")
+
+    def _set_name(self, row, username):
+        if self._name_start[row] != NO_NAME:
+            self._name_garbage += self._name_len[row]
+        if username is None:
+            self._name_start[row] = NO_NAME
+            self._name_len[row] = 0
+            return
+        data = username.encode()[:MAX_NAME_BYTES]
+        self._name_start[row] = len(self._name_blob)
+        self._name_len[row] = len(data)
+        self._name_blob += data
+
+    def _user(self, row):
+        user = {
+            "points": self._points[row],
+            "last_claim": self._last_claim[row],
+            "wallet": self._wallets.get(row, ""),
+            "ref_applied": bool(self._flags[row] & REF_APPLIED),
+            "tasks": self._tasks[row],
+        }
+        username = self._name(row)
+        if username is not None:
+            user["username"] = username
+        return user
+
+    def _set(self, row, field, value):
+        if field == "points":
+            self._points[row] = value
+            self._tier[row] = get_evol_level(value)
+        elif field == "last_claim":
+            self._last_claim[row] = value or 0
+        elif field == "tasks":
+            self._tasks[row] = value or 0
+        elif field == "wallet":
+            if value:
+                self._wallets[row] = value
+            else:
+                self._wallets.pop(row, None)
+        elif field == "ref_applied":
+            self._flags[row] = self._flags[row] | REF_APPLIED if value else self._flags[row] & ~REF_APPLIED
+        else:
+            self._set_name(row, value)
+
+    def get(self, user_id, default=None):
+        with self._lock:
+            row = self._row(user_id)
+            return self._user(row) if row is not None else default
+
+    def update(self, user_id, **fields):
+        if not fields:
+            return
+        _check_fields(fields)
+        with self._lock:
+            row = self._row(user_id)
+            if row is None:
+                row = self._insert(user_id)
+            for field, value in fields.items():
+                self._set(row, field, value)
+            self._mark(row)
+
+    def increment(self, user_id, field, delta):
+        _check_fields((field,))
+        with self._lock:
+            row = self._row(user_id)
+            if row is None:
+                row = self._insert(user_id)
+            value = self._user(row).get(field, 0) + delta
+            self._set(row, field, value)
+            self._mark(row)
+            return value
+
+    def put_many(self, rows):
+        for user_id, user in rows:
+            self.update(user_id, **{k: v for k, v in user.items() if k in USER_FIELDS})
+
+    def scan(self, after=None):
+        if after is not None:
+            # Urutan user_id hanya dijamin store; nilai terbaru diambil dari tabel
+            for user_id, user in self.store.scan(after):
+                with self._lock:
+                    row = self._row(user_id)
+                    if row is not None:
+                        user = self._user(row)
+                yield user_id, user
+            return
+        start = 0
+        while True:
+            with self._lock:
+                end = min(start + SCAN_CHUNK, len(self._ids))
+                chunk = [(self._user_id(row), self._user(row)) for row in range(start, end)]
+            yield from chunk
+            if len(chunk) < SCAN_CHUNK:
+                return
+            start = end
+
+    def count(self):
+        with self._lock:
+            return len(self._ids)
+
+    def claimed_since(self, since):
+        # Seleksi di seluruh kolom last_claim sekaligus, tuple dibuat per chunk
+        with self._lock:
+            if np is not None:
+                rows = np.flatnonzero(_column(self._last_claim, np.float64) > since).tolist()
+            else:
+                rows = list(compress(range(len(self._last_claim)), map(float(since).__lt__, self._last_claim)))
+        for start in range(0, len(rows), SCAN_CHUNK):
+            with self._lock:
+                chunk = [(self._user_id(row), self._last_claim[row]) for row in rows[start:start + SCAN_CHUNK]]
+            yield from chunk
+
+    def points_items(self):
+        """(user_id, points) semua user dari salinan kolom, untuk membangun rank index"""
+        with self._lock:
+            ids, points, names = array("q", self._ids), array("q", self._points), dict(self._names)
+        user_ids = list(map(str, ids))
+        for row, name in names.items():
+            user_ids[row] = name
+        return zip(user_ids, points)
+
+    def export_rows(self):
+        """(user_id, points, wallet, tier, last_claim) per user, diiris per chunk dari kolom"""
+        start = 0
+        while True:
+            with self._lock:
+                end = min(start + SCAN_CHUNK, len(self._ids))
+                rows = range(start, end)
+                chunk = list(zip(
+                    map(self._user_id, rows),
+                    self._points[start:end],
+                    map(self._wallets.get, rows, [""] * len(rows)),
+                    self._tier[start:end],
+                    self._last_claim[start:end],
+                ))
+            yield from chunk
+            if len(chunk) < SCAN_CHUNK:
+                return
+            start = end
+
+    def nbytes(self):
+        """Perkiraan memori kolom (tanpa dict wallet/overflow)"""
+        with self._lock:
+            columns = (self._ids, self._points, self._last_claim, self._tasks, self._tier,
+                       self._flags, self._name_start, self._name_len, self._keys, self._slots)
+            return sum(len(c) * c.itemsize for c in columns) + len(self._name_blob)
+
+    def stats(self):
+        with self._lock:
+            return dict(super().stats(), overflow=len(self._recent), nbytes=self.nbytes())
+
+    def _batch(self, keys):
+        return [(self._user_id(row), self._user(row)) for row in keys]
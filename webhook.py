@@ -0,0 +1,163 @@
+# webhook.py
+
+import asyncio, hmac, json, secrets, signal, sys
+from telegram import Update
+from telegram.ext import (CallbackQueryHandler, ChatMemberHandler, CommandHandler,
+    InlineQueryHandler, MessageHandler, PollAnswerHandler, PreCheckoutQueryHandler)
+from httpserver import HttpServer, json_response, text_response
+from config import (WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+    WEBHOOK_QUEUE_SIZE, WEBHOOK_MAX_CONNECTIONS)
+
+# Jenis update yang bisa dihasilkan tiap tipe handler
+HANDLER_UPDATE_TYPES = {
+    CommandHandler: [Update.MESSAGE],
+    MessageHandler: [Update.MESSAGE],
+    CallbackQueryHandler: [Update.CALLBACK_QUERY],
+    InlineQueryHandler: [Update.INLINE_QUERY],
+    ChatMemberHandler: [Update.MY_CHAT_MEMBER, Update.CHAT_MEMBER],
+    PollAnswerHandler: [Update.POLL_ANSWER],
+    PreCheckoutQueryHandler: [Update.PRE_CHECKOUT_QUERY],
+}
+
+_secret = None
+
+def webhook_secret():
+    """WEBHOOK_SECRET, atau secret acak per proses kalau kosong
+
+    Listener selalu mencocokkan header secret, jadi webhook tanpa secret
+    tidak pernah terbuka untuk siapa saja yang tahu URL-nya. Secret acak
+    ikut dikirim ke setWebhook; replay lokal butuh WEBHOOK_SECRET diisi.
+    """
+    global _secret
+    if _secret is None:
+        _secret = WEBHOOK_SECRET
+        if not _secret:
+            _secret = secrets.token_urlsafe(32)
+            print("⚠️ WEBHOOK_SECRET kosong, memakai secret acak untuk proses ini")
+    return _secret
+
+def compute_allowed_updates(application):
+    """allowed_updates untuk Telegram, diturunkan dari handler yang terdaftar di group >= 0"""
+    allowed = set()
+    for group, handlers in application.handlers.items():
+        if group < 0:
+            continue  # group negatif = penjaga di depan handler (flood control), bukan penerima update
+        for handler in handlers:
+            types = next((t for cls, t in HANDLER_UPDATE_TYPES.items() if isinstance(handler, cls)), None)
+            if types is None:
+                # Handler generik (TypeHandler dsb.) bisa menerima apa saja
+                return list(Update.ALL_TYPES)
+            allowed.update(types)
+    return [update_type for update_type in Update.ALL_TYPES if update_type in allowed]
+
+class WebhookListener:
+    """Terima update Telegram lewat HTTP, antre dengan batas, lalu proses lewat Application
+
+    Kalau antrean penuh, request dibalas 429 sehingga Telegram mengirim ulang
+    nanti (backpressure) alih-alih bot menumpuk update di memori.
+    """
+
+    def __init__(self, application, host=WEBHOOK_LISTEN, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                 secret=None, queue_size=WEBHOOK_QUEUE_SIZE):
+        self.application = application
+        self.secret = secret or webhook_secret()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.server = HttpServer(host, port)
+        self.server.route("POST", path, self._receive)
+        self.stats = {"received": 0, "rejected": 0, "invalid": 0, "processed": 0}
+        self._workers = []
+
+    async def _receive(self, request):
+        token = request.headers.get("x-telegram-bot-api-secret-token", "")
+        if not hmac.compare_digest(token.encode(), self.secret.encode()):
+            self.stats["invalid"] += 1
+            return text_response(403, "forbidden")
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            self.stats["invalid"] += 1
+            return text_response(400, "invalid json")
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return text_response(429, "queue full")
+        self.stats["received"] += 1
+        return json_response(200, {"ok": True})
+
+    async def _work(self):
+        application = self.application
+        while True:
+            data = await self.queue.get()
+            try:
+                update = Update.de_json(data, application.bot)
+                await application.update_processor.process_update(update, application.process_update(update))
+                self.stats["processed"] += 1
+            except Exception as e:
+                print(f"❌ Gagal memproses update webhook: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def start(self):
+        workers = self.application.update_processor.max_concurrent_updates
+        self._workers = [asyncio.create_task(self._work()) for _ in range(workers)]
+        await self.server.start()
+
+    async def stop(self):
+        await self.server.stop()
+        await self.queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+async def run_webhook(application):
+    """Jalankan bot dalam mode webhook sampai SIGINT/SIGTERM"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        listener = WebhookListener(application)
+        await listener.start()
+        if WEBHOOK_URL:
+            await application.bot.set_webhook(
+                url=WEBHOOK_URL,
+                secret_token=listener.secret,
+                allowed_updates=compute_allowed_updates(application),
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+            )
+        print(f"🌐 Webhook listening on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+        try:
+            await stop_event.wait()
+        finally:
+            await listener.stop()
+            await application.stop()
+    if application.post_shutdown:
+        await application.post_shutdown(application)
+
+def replay(path, url=None):
+    """Kirim ulang update JSON hasil rekaman (satu per baris) ke webhook lokal"""
+    from urllib.request import Request, urlopen
+    url = url or f"http://127.0.0.1:{WEBHOOK_PORT}{WEBHOOK_PATH}"
+    headers = {"Content-Type": "application/json"}
+    if WEBHOOK_SECRET:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = WEBHOOK_SECRET
+    sent = 0
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                with urlopen(Request(url, data=line.strip().encode(), headers=headers)) as response:
+                    response.read()
+                sent += 1
+    print(f"✅ {sent} update dikirim ke {url}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "replay":
+        replay(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+    else:
+        print("Gunakan: python webhook.py replay updates.jsonl [url]")